@@ -0,0 +1,204 @@
+# backend/cache.py
+"""
+磁盘轨迹缓存（按内容寻址）。
+
+键是 (初始状态, 编译后的参数, ext_events, seed, 记录列, MODEL_VERSION) 的规范 JSON 的
+sha256，同一场景的不同步数放在同一个目录下：
+
+    <root>/<key>/<n_steps>.npz        Step + 记录列（列存，未压缩的 .npy），以及最终状态的
+                                      快照记录（backend.snapshot，含噪声流位置），用于续跑
+    <root>/points/<key>.json          参数扫描的单点汇总指标
+
+命中规则：已有 >= n_steps 的结果直接截取前 n_steps 行；只有更短的结果时，
+从它的最终状态和噪声流位置续跑剩余步数（与从头跑逐位相同），写入新条目并删掉旧的短条目。
+总大小超过 max_bytes 时按最近使用时间（mtime，命中时刷新）淘汰最旧的条目。
+总大小在内存里累计（第一次写入时遍历一次目录，之后每次写入 / 删除加减该文件的大小），
+只有超过 max_bytes 才遍历目录、淘汰并按实际大小重新对齐；多个进程共用一个目录时，
+各自只累计自己的写入，实际总大小可能暂时超出上限，直到某个进程触发淘汰。
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.events import compile_events
+from backend.fsutil import atomic_write, default_cache_dir
+from backend.model import MODEL_VERSION, compile_params
+from backend.oracle import PriceRing
+from backend.rng import NoiseStream
+from backend.runner import iter_simulation
+from backend.snapshot import SnapshotContext, restore_snapshot, take_snapshot
+from backend.trajectory import DASHBOARD_COLUMNS, TrajectoryRecorder
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_SKIP_KEYS = {"params", "ext_events", "luna_price_hist", "seed"}
+
+def canonical_state(state: Dict) -> Dict:
+    """参与哈希的状态：标量字段 + 参数 + 事件 + 预言机历史（与具体的存放形式无关）"""
+    out = {k: v for k, v in state.items()
+           if k not in _SKIP_KEYS and isinstance(v, (int, float, str, bool))}
+    hist = state.get("luna_price_hist")
+    out["luna_price_hist"] = hist.tolist() if isinstance(hist, PriceRing) else list(hist or [])
+    out["params"] = compile_params(state.get("params")).as_dict()
+    out["ext_events"] = list(compile_events(state.get("ext_events")))
+    return out
+
+def content_key(*parts) -> str:
+    blob = json.dumps([MODEL_VERSION, *parts], sort_keys=True, separators=(",", ":"),
+                      default=float)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def scenario_key(state: Dict, seed: int, columns: Dict[str, str]) -> str:
+    return content_key(canonical_state(state), int(seed), columns)
+
+class TrajectoryCache:
+    """
+    用法：
+        cache = TrajectoryCache()
+        rec = cache.run(get_preset("terra"), n_steps=500, seed=7)
+        rec.frame()
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self.hits = self.partial_hits = self.misses = 0
+        self._total: Optional[int] = None  # 累计大小（字节）；None 表示还没遍历过目录
+        os.makedirs(self.root, exist_ok=True)
+
+    # ----- 轨迹 -----
+
+    def _cached_steps(self, d: str) -> List[int]:
+        if not os.path.isdir(d):
+            return []
+        out = []
+        for name in os.listdir(d):
+            stem, ext = os.path.splitext(name)
+            if ext == ".npz" and stem.isdigit():
+                out.append(int(stem))
+        return sorted(out)
+
+    def _load(self, d: str, n: int) -> Tuple[Dict[str, np.ndarray], str]:
+        path = os.path.join(d, f"{n}.npz")
+        with np.load(path) as z:
+            data = {k: z[k] for k in z.files}
+        os.utime(path)
+        return data, path
+
+    def _store(self, d: str, rec: TrajectoryRecorder, final: Dict,
+               rng: NoiseStream) -> int:
+        """写入条目，返回文件大小"""
+        os.makedirs(d, exist_ok=True)
+        snap = take_snapshot(final, len(rec), rng)
+        path = os.path.join(d, f"{len(rec)}.npz")
+        atomic_write(path, lambda f: np.savez(f, __snapshot__=snap, **rec.raw_columns()))
+        return os.path.getsize(path)
+
+    def run(self, state: Dict, n_steps: int, seed: int,
+            columns: Optional[Dict[str, str]] = None) -> TrajectoryRecorder:
+        """
+        返回 n_steps 步的轨迹（TrajectoryRecorder，可继续 append）。
+        噪声流固定为 NoiseStream(seed, path=0)，与 runner.run_simulation 一致。
+        """
+        columns = dict(DASHBOARD_COLUMNS if columns is None else columns)
+        d = os.path.join(self.root, scenario_key(state, seed, columns))
+        cached = self._cached_steps(d)
+
+        longer = [n for n in cached if n >= n_steps]
+        if longer:
+            self.hits += 1
+            data, _ = self._load(d, longer[0])
+            data = {k: v[:n_steps] for k, v in data.items() if k != "__snapshot__"}
+            return TrajectoryRecorder.from_columns(data, columns, state)
+
+        if cached:
+            self.partial_hits += 1
+            n0 = cached[-1]
+            data, old = self._load(d, n0)
+            rec = TrajectoryRecorder.from_columns(data, columns, state, capacity=n_steps)
+            ctx = SnapshotContext.from_state(state, NoiseStream(seed))
+            last, n0, rng = restore_snapshot(data["__snapshot__"], ctx)
+            start = n0 + 1
+        else:
+            self.misses += 1
+            old = None
+            rec = TrajectoryRecorder(columns, state, capacity=n_steps)
+            rng = NoiseStream(seed)
+            start, last = 1, state
+
+        for step, s in iter_simulation(last, n_steps - start + 1, start, rng):
+            rec.append(step, s)
+            last = s
+        added = self._store(d, rec, last, rng)
+        # 新条目包含旧条目的全部内容
+        if old is not None:
+            added -= os.path.getsize(old)
+            os.remove(old)
+        self._account(added)
+        return rec
+
+    # ----- 扫描单点 -----
+
+    def memo(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        """小结果（JSON 可序列化的 dict）的缓存，例如 sweep.run_point 的汇总指标"""
+        path = os.path.join(self.root, "points", f"{key}.json")
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            with open(path) as f:
+                return json.load(f)
+        self.misses += 1
+        out = compute()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, lambda f: f.write(json.dumps(out).encode()))
+        self._account(os.path.getsize(path))
+        return out
+
+    # ----- 淘汰 -----
+
+    def _account(self, added: int) -> None:
+        """写入 / 删除之后更新累计大小；超过上限才遍历目录淘汰"""
+        if self._total is None:
+            self._total = self.size()  # 已包含刚写入的文件
+        else:
+            self._total += added
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(最近使用时间, 字节数, 路径)，每个文件是一个条目"""
+        out = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    path = os.path.join(dirpath, name)
+                    st = os.stat(path)
+                    out.append((st.st_mtime, st.st_size, path))
+        return out
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """按 LRU 删除条目直到总大小不超过 max_bytes，返回释放的字节数"""
+        limit = self.max_bytes if max_bytes is None else int(max_bytes)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in entries:
+            if total - freed <= limit:
+                break
+            os.remove(path)
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            freed += size
+        self._total = total - freed
+        return freed
+
+    def clear(self) -> None:
+        self.evict(0)
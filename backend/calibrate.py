@@ -0,0 +1,362 @@
+# backend/calibrate.py
+"""
+参数校准：让模拟轨迹贴合目标锚点或一段观测价格序列。
+
+  - 目标：若干 (step, 值) 锚点，例如 “第 120 步 UST ≈ 0.9、第 200 步 ≈ 0.3”，
+    或者一个 CSV / 轨迹文件（step 列 + 指标列）；
+  - 待定参数：default_params() 里任选若干键，各给一个取值范围（可选对数刻度）；
+  - 优化器：CMA-ES（无导数，每一代整批给出 popsize 组候选参数），
+    候选按块分发到进程池并行评估，进程池在各代之间复用；
+  - 评估：每组参数用批量引擎跑 n_paths 条路径，所有候选共用同一 seed 和路径编号
+    （共同随机数），取各锚点步上跨路径的中位数，与目标比较对数误差的均方。
+
+结果写成场景 JSON，load_scenario / --scenario / 前端的 SIM_SCENARIO 都能直接加载：
+
+    python -m backend.calibrate --anchor 120=0.9 --anchor 200=0.3 \\
+        --range redeem_alpha=0.02,0.08 --range bankrun_t0=100,250 \\
+        --range lfg_per_step_usd=1e8,1e9,log --out fitted.json
+    python -m backend.cli --scenario fitted.json --steps 500 --seed 0
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.ensemble import PATH_FIELDS, compute_new_state_batch, make_ensemble
+from backend.model import compile_params
+from backend.presets import PRESETS, load_scenario
+from backend.rng import EnsembleNoise
+from backend.sweep import _cast, _check_keys, apply_overrides
+
+Anchor = Tuple[int, float]
+
+# ---------- 目标 ----------
+
+def check_anchors(anchors: Sequence[Anchor]) -> List[Anchor]:
+    """规范化并排序锚点；模拟从第 1 步开始，更早的锚点永远取不到值"""
+    out = sorted((int(s), float(v)) for s, v in anchors)
+    bad = [s for s, _ in out if s < 1]
+    if bad:
+        raise ValueError(f"锚点的 step 必须 >= 1: {bad}")
+    return out
+
+def parse_anchors(items: Sequence[str]) -> List[Anchor]:
+    """["120=0.9", "200=0.3"] -> [(120, 0.9), (200, 0.3)]"""
+    out = []
+    for item in items:
+        step, _, val = item.partition("=")
+        out.append((int(step), float(val)))
+    return check_anchors(out)
+
+def load_series(path: str, metric: str = "ust_price", every: int = 1) -> List[Anchor]:
+    """
+    观测序列：CSV（表头含 step 和 metric 列，metric 列缺省时取第二列），
+    或 backend.cli 写出的 .npz / .parquet / .arrow 轨迹。every > 1 时隔行取样。
+    """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            raise ValueError(f"{path} 没有数据")
+        col = metric if metric in rows[0] else [k for k in rows[0] if k != "step"][0]
+        pairs = [(int(float(r["step"])), float(r[col])) for r in rows if r[col] != ""]
+    else:
+        from backend.trajectory import read_trajectory
+        data = read_trajectory(path)
+        pairs = list(zip(data["step"].tolist(), data[metric].tolist()))
+    return sorted(pairs)[::max(every, 1)]
+
+# ---------- 评估 ----------
+
+def simulate_at(state: Dict, steps: Sequence[int], metric: str = "ust_price",
+                n_paths: int = 16, seed: int = 0) -> np.ndarray:
+    """批量运行到 max(steps)，返回 (n_paths, len(steps)) 的指标值"""
+    if metric not in PATH_FIELDS:
+        raise ValueError(f"未知指标 {metric!r}，可选 {list(PATH_FIELDS)}")
+    if min(steps) < 1:
+        raise ValueError(f"step 必须 >= 1: {min(steps)}")
+    want: Dict[int, List[int]] = {}
+    for j, s in enumerate(steps):
+        want.setdefault(int(s), []).append(j)  # 同一步可以有多个锚点
+    # 没写到的位置保持 NaN，不会把未初始化的内存当成结果
+    out = np.full((n_paths, len(steps)), np.nan)
+    ens = make_ensemble(state, n_paths)
+    rng = EnsembleNoise(seed, paths=range(n_paths))
+    for step in range(1, max(steps) + 1):
+        ens = compute_new_state_batch(ens, step=step, rng=rng)
+        for j in want.get(step, ()):
+            out[:, j] = ens[metric]
+    return out
+
+def anchor_loss(sim: np.ndarray, targets: np.ndarray, log: bool = True) -> float:
+    """各锚点上跨路径中位数与目标的均方误差（log=True 时在对数空间比较）"""
+    med = np.median(sim, axis=0)
+    if log:
+        med, targets = np.log(np.maximum(med, 1e-12)), np.log(np.maximum(targets, 1e-12))
+    return float(np.mean((med - targets) ** 2))
+
+def evaluate(base_state: Dict, overrides: Dict, anchors: Sequence[Anchor],
+             metric: str = "ust_price", n_paths: int = 16, seed: int = 0,
+             log: bool = True) -> float:
+    steps = [s for s, _ in anchors]
+    targets = np.array([v for _, v in anchors])
+    sim = simulate_at(apply_overrides(base_state, overrides), steps, metric, n_paths, seed)
+    loss = anchor_loss(sim, targets, log)
+    return loss if math.isfinite(loss) else float("inf")
+
+def _eval_chunk(args):
+    base_state, chunk, anchors, metric, n_paths, seed, log = args
+    return [(i, evaluate(base_state, ov, anchors, metric, n_paths, seed, log)) for i, ov in chunk]
+
+# ---------- 参数空间 ----------
+
+class Space:
+    """
+    待定参数及范围：bounds = {键: (lo, hi)}，log_keys 中的键按对数刻度。
+    优化器只看到 [0, 1]^d 的归一化坐标。
+    """
+
+    def __init__(self, bounds: Dict[str, Tuple[float, float]], log_keys: Sequence[str] = ()):
+        _check_keys(bounds)
+        self.keys = list(bounds)
+        self.log = np.array([k in log_keys for k in self.keys])
+        lo = np.array([float(bounds[k][0]) for k in self.keys])
+        hi = np.array([float(bounds[k][1]) for k in self.keys])
+        if np.any(hi <= lo):
+            raise ValueError("范围必须满足 lo < hi")
+        if np.any(self.log & (lo <= 0)):
+            raise ValueError("对数刻度的范围必须为正")
+        self.lo = np.where(self.log, np.log(np.where(self.log, lo, 1.0)), lo)
+        self.hi = np.where(self.log, np.log(np.where(self.log, hi, 1.0)), hi)
+
+    def to_params(self, u: np.ndarray) -> Dict:
+        x = self.lo + (self.hi - self.lo) * np.clip(u, 0.0, 1.0)
+        x = np.where(self.log, np.exp(x), x)
+        return {k: _cast(k, x[j]) for j, k in enumerate(self.keys)}
+
+    def to_unit(self, params: Dict) -> np.ndarray:
+        x = np.array([float(params[k]) for k in self.keys])
+        x = np.where(self.log, np.log(np.maximum(x, 1e-300)), x)
+        return np.clip((x - self.lo) / (self.hi - self.lo), 0.0, 1.0)
+
+# ---------- CMA-ES ----------
+
+class CMAES:
+    """
+    (μ/μ_w, λ)-CMA-ES，标准参数取自 Hansen《The CMA Evolution Strategy: A Tutorial》。
+    在 [0, 1]^d 内搜索，越界的样本镜像回区间内再评估（更新也用镜像后的点）。
+    """
+
+    def __init__(self, x0: np.ndarray, sigma0: float = 0.3, popsize: Optional[int] = None,
+                 seed: int = 0):
+        d = len(x0)
+        self.d = d
+        self.lam = popsize or 4 + int(3 * math.log(d))
+        self.mu = self.lam // 2
+        w = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.w = w / w.sum()
+        self.mueff = 1.0 / float(np.sum(self.w ** 2))
+        self.cc = (4 + self.mueff / d) / (d + 4 + 2 * self.mueff / d)
+        self.cs = (self.mueff + 2) / (d + self.mueff + 5)
+        self.c1 = 2 / ((d + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1,
+                       2 * (self.mueff - 2 + 1 / self.mueff) / ((d + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, math.sqrt((self.mueff - 1) / (d + 1)) - 1) + self.cs
+        self.chi_n = math.sqrt(d) * (1 - 1 / (4 * d) + 1 / (21 * d * d))
+
+        self.mean = np.asarray(x0, dtype=float).copy()
+        self.sigma = float(sigma0)
+        self.C = np.eye(d)
+        self.B = np.eye(d)
+        self.D = np.ones(d)
+        self.pc = np.zeros(d)
+        self.ps = np.zeros(d)
+        self.gen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def ask(self) -> np.ndarray:
+        z = self._rng.standard_normal((self.lam, self.d))
+        x = self.mean + self.sigma * (z * self.D) @ self.B.T
+        # 镜像到 [0, 1]（周期 2 的三角波）
+        x = np.abs(x) % 2.0
+        return np.where(x > 1.0, 2.0 - x, x)
+
+    def tell(self, x: np.ndarray, f: np.ndarray) -> None:
+        order = np.argsort(f, kind="stable")
+        xs = x[order[:self.mu]]
+        old = self.mean
+        self.mean = self.w @ xs
+        y = (self.mean - old) / self.sigma
+
+        inv_sqrt_c = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = ((1 - self.cs) * self.ps
+                   + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * inv_sqrt_c @ y)
+        self.gen += 1
+        ps_norm = float(np.linalg.norm(self.ps))
+        hsig = ps_norm / math.sqrt(1 - (1 - self.cs) ** (2 * self.gen)) / self.chi_n \
+            < 1.4 + 2 / (self.d + 1)
+        self.pc = ((1 - self.cc) * self.pc
+                   + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * y)
+
+        art = (xs - old) / self.sigma
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc)
+                               + (not hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * (art.T * self.w) @ art)
+        self.sigma *= math.exp((self.cs / self.damps) * (ps_norm / self.chi_n - 1))
+
+        self.C = (self.C + self.C.T) / 2
+        d2, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(d2, 1e-20))
+
+    @property
+    def step_size(self) -> float:
+        """当前搜索步长（归一化坐标下最长主轴）"""
+        return self.sigma * float(self.D.max())
+
+# ---------- 主流程 ----------
+
+def calibrate(anchors: Sequence[Anchor], bounds: Dict[str, Tuple[float, float]],
+              base_state: Optional[Dict] = None, log_keys: Sequence[str] = (),
+              metric: str = "ust_price", n_paths: int = 16, seed: int = 0,
+              popsize: Optional[int] = None, generations: int = 100, sigma0: float = 0.3,
+              tol: float = 1e-3, workers: Optional[int] = None, log_loss: bool = True,
+              verbose: bool = True) -> Dict:
+    """
+    用 CMA-ES 拟合 bounds 中的参数，返回
+    {"params", "loss", "base_loss", "generations", "evaluations", "history", "fit"}。
+    起点为基准场景里的参数值；步长小于 tol（归一化坐标）时提前结束。
+    workers=1 时在当前进程内串行评估。
+    """
+    base_state = base_state or load_scenario("terra")
+    anchors = check_anchors(anchors)
+    if not anchors:
+        raise ValueError("至少需要一个锚点")
+    space = Space(bounds, log_keys)
+    x0 = space.to_unit(compile_params(base_state.get("params")).as_dict())
+    es = CMAES(x0, sigma0, popsize, seed)
+    workers = workers or os.cpu_count() or 1
+    cfg = (anchors, metric, n_paths, seed, log_loss)
+
+    base_loss = evaluate(base_state, {}, *cfg)
+    best = (base_loss, space.to_params(x0))
+    history, n_evals = [], 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        t0 = time.perf_counter()
+        for gen in range(1, generations + 1):
+            u = es.ask()
+            cands = [space.to_params(row) for row in u]
+            chunk = max(1, math.ceil(len(cands) / workers))
+            indexed = list(enumerate(cands))
+            tasks = [(base_state, indexed[i:i + chunk]) + cfg
+                     for i in range(0, len(indexed), chunk)]
+            results = pool.map(_eval_chunk, tasks) if pool else map(_eval_chunk, tasks)
+            f = np.empty(len(cands))
+            for part in results:
+                for i, loss in part:
+                    f[i] = loss
+            n_evals += len(cands)
+            es.tell(u, f)
+
+            i = int(np.argmin(f))
+            if f[i] < best[0]:
+                best = (float(f[i]), cands[i])
+            history.append({"generation": gen, "best_loss": best[0],
+                            "gen_loss": float(f[i]), "step_size": es.step_size})
+            if verbose:
+                print(f"gen {gen:>3}  best {best[0]:.5g}  this gen {f[i]:.5g}  "
+                      f"step {es.step_size:.3g}  ({n_evals} evals, {time.perf_counter() - t0:.1f}s)")
+            if es.step_size < tol:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    loss, params = best
+    steps = [s for s, _ in anchors]
+    sim = np.median(simulate_at(apply_overrides(base_state, params), steps, metric,
+                                n_paths, seed), axis=0)
+    return {"params": params, "loss": loss, "base_loss": base_loss,
+            "generations": len(history), "evaluations": n_evals, "history": history,
+            "fit": [(s, v, float(m)) for (s, v), m in zip(anchors, sim)]}
+
+def write_scenario(path: str, result: Dict, base: str = "terra", meta: Optional[Dict] = None) -> None:
+    """
+    把拟合结果写成场景 JSON（load_scenario 可直接加载）：
+    {"preset": ..., "params": {拟合出的键}, "meta": {损失、锚点等说明}}。
+    base 为场景文件时在它的基础上覆盖 params，其余内容（事件、初始状态）原样保留。
+    """
+    if base in PRESETS:
+        cfg = {"preset": base, "params": {}}
+    else:
+        with open(base) as f:
+            cfg = json.load(f)
+    cfg["params"] = {**(cfg.get("params") or {}), **result["params"]}
+    cfg["meta"] = {"loss": result["loss"], "base_loss": result["base_loss"],
+                   "fit": result["fit"], **(meta or {})}
+    with open(path, "w") as f:
+        json.dump(cfg, f, indent=2)
+
+# ---------- 命令行 ----------
+
+def _parse_ranges(items) -> Tuple[Dict[str, Tuple[float, float]], List[str]]:
+    bounds, log_keys = {}, []
+    for item in items or []:
+        key, _, spec = item.partition("=")
+        parts = [p.strip() for p in spec.split(",")]
+        bounds[key.strip()] = (float(parts[0]), float(parts[1]))
+        if len(parts) > 2 and parts[2] == "log":
+            log_keys.append(key.strip())
+    return bounds, log_keys
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="CMA-ES 参数校准（锚点 / 观测序列）")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    src.add_argument("--scenario", help="基准：预设名或 JSON 场景文件")
+    tgt = ap.add_mutually_exclusive_group(required=True)
+    tgt.add_argument("--anchor", action="append", metavar="STEP=VALUE", help="目标锚点，可重复")
+    tgt.add_argument("--series", help="观测序列：CSV（step + 指标列）或 .npz/.parquet/.arrow 轨迹")
+    ap.add_argument("--series-every", type=int, default=1, help="观测序列隔行取样")
+    ap.add_argument("--metric", default="ust_price")
+    ap.add_argument("--range", action="append", required=True, metavar="KEY=LO,HI[,log]",
+                    help="待定参数及范围，可重复")
+    ap.add_argument("--paths", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--popsize", type=int, default=None, help="每代候选数（默认 4+3ln(d)）")
+    ap.add_argument("--generations", type=int, default=100)
+    ap.add_argument("--sigma", type=float, default=0.3, help="初始步长（归一化坐标）")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--linear", action="store_true", help="在原始刻度上比较误差（默认对数）")
+    ap.add_argument("--out", default=None, help="拟合后的场景 JSON")
+    args = ap.parse_args(argv)
+
+    anchors = parse_anchors(args.anchor) if args.anchor else \
+        load_series(args.series, args.metric, args.series_every)
+    bounds, log_keys = _parse_ranges(args.range)
+    base = args.scenario or args.preset
+    result = calibrate(anchors, bounds, load_scenario(base), log_keys, args.metric,
+                       args.paths, args.seed, args.popsize, args.generations, args.sigma,
+                       workers=args.workers, log_loss=not args.linear)
+
+    print(f"✅ loss {result['base_loss']:.5g} -> {result['loss']:.5g}"
+          f"（{result['generations']} 代，{result['evaluations']} 次评估）")
+    for k, v in result["params"].items():
+        print(f"   {k} = {v!r}")
+    print(f"   {'step':>6} {'target':>10} {'fitted':>10}")
+    for s, v, m in result["fit"]:
+        print(f"   {s:>6} {v:>10.4g} {m:>10.4g}")
+    if args.out:
+        write_scenario(args.out, result, base,
+                       meta={"metric": args.metric, "paths": args.paths, "seed": args.seed})
+        print(f"   场景 -> {args.out}（--scenario {args.out} 或 SIM_SCENARIO={args.out}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# backend/cli.py
+"""
+无界面批量运行（不依赖 Streamlit）：
+
+    python -m backend.cli --preset terra --steps 1000000 --seed 7 \
+        --out runs/terra.parquet --metrics ust_price,luna_price,lfg_reserve_usd --every 10
+
+--scenario 可以是预设名，也可以是 JSON 场景文件（见 backend.presets.load_scenario）。
+输出格式由扩展名决定：.npz / .parquet / .arrow，按 --chunk 行一块流式写出。
+--cache-dir 打开磁盘轨迹缓存（backend.cache）：相同场景 + seed 直接读缓存，
+更长的运行从缓存里较短结果的最终状态续跑。缓存要求固定 seed。
+
+--checkpoint FILE --checkpoint-every K 每 K 步存一条状态快照（backend.snapshot）；
+--resume FILE [--from-step S] 从快照文件的第 S 步（默认最后一条）接着再跑 --steps 步。
+--profile 打印 compute_new_state 的分阶段耗时和分支命中（backend.profiling），
+--profile-trace FILE 另存 Chrome trace（Perfetto / speedscope）。
+--stop collapsed [--stop-patience K] 进入终态（见 backend.stopping）后提前结束，
+输出的最后一行即停止的那一步。
+两个记录点之间默认用 backend.fastforward 整段推进（结果逐位相同），--no-fast 逐步推进。
+"""
+import argparse
+import contextlib
+import time
+
+from backend.cache import DEFAULT_MAX_BYTES, TrajectoryCache
+from backend.presets import PRESETS, load_scenario
+from backend.profiling import profile
+from backend.runner import run_simulation
+from backend.snapshot import Checkpoints
+from backend.stopping import CONDITIONS, StopWhen
+from backend.trajectory import STATE_METRICS, ChunkedWriter
+
+def _run_cached(state, args, metrics, writer):
+    """经缓存取得轨迹，按 --every 抽行写出；返回最后一行"""
+    cache = TrajectoryCache(args.cache_dir, int(args.cache_max_mb * 2**20))
+    # 缓存里总是存全部指标，换一组 --metrics 也能命中
+    columns = {m: m for m in STATE_METRICS}
+    data = cache.run(state, args.steps, args.seed, columns).raw_columns()
+    every = max(args.every, 1)
+    steps = data["Step"]
+    if writer is not None:
+        for i in range(len(steps)):
+            if steps[i] % every == 0 or i == len(steps) - 1:
+                writer.append(int(steps[i]), {m: data[m][i] for m in metrics})
+    kind = "命中" if cache.hits else "续跑" if cache.partial_hits else "未命中"
+    print(f"   缓存{kind}：{cache.root}")
+    final = {m: float(data[m][-1]) for m in columns}
+    final["seed"] = args.seed
+    return final
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LUNA–UST 模拟：无界面批量运行")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    src.add_argument("--scenario", help="预设名或 JSON 场景文件")
+    ap.add_argument("--steps", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=None, help="不指定则随机生成并打印")
+    ap.add_argument("--out", default=None, help="输出文件（.npz / .parquet / .arrow）")
+    ap.add_argument("--metrics", default=",".join(STATE_METRICS),
+                    help="记录哪些字段，逗号分隔")
+    ap.add_argument("--every", type=int, default=1, help="每 k 步记录一行")
+    ap.add_argument("--chunk", type=int, default=65536, help="每块行数")
+    ap.add_argument("--cache-dir", default=None, help="磁盘轨迹缓存目录")
+    ap.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20,
+                    help="缓存总大小上限（MB），超出按 LRU 淘汰")
+    ap.add_argument("--checkpoint", default=None, help="检查点输出文件（.npz）")
+    ap.add_argument("--checkpoint-every", type=int, default=100, help="每 K 步一个检查点")
+    ap.add_argument("--resume", default=None, help="从检查点文件续跑")
+    ap.add_argument("--from-step", type=int, default=None, help="续跑起点（默认最后一个检查点）")
+    ap.add_argument("--stop", default=None, metavar="COND[,COND]",
+                    help=f"终态提前停止，可选 {', '.join(CONDITIONS)}")
+    ap.add_argument("--stop-patience", type=int, default=1, help="条件需连续成立的步数")
+    ap.add_argument("--no-fast", action="store_true", help="不用快进内核，逐步调用 compute_new_state")
+    ap.add_argument("--profile", action="store_true", help="打印分阶段耗时 / 分支命中")
+    ap.add_argument("--profile-trace", default=None, help="分阶段 Chrome trace 输出文件")
+    args = ap.parse_args(argv)
+    if args.cache_dir and args.seed is None:
+        ap.error("--cache-dir 需要同时指定 --seed")
+    if args.resume and args.cache_dir:
+        ap.error("--resume 不能与 --cache-dir 同时使用")
+    if args.stop and args.cache_dir:
+        ap.error("--stop 不能与 --cache-dir 同时使用")
+    try:
+        stop = StopWhen.parse(args.stop, args.stop_patience) if args.stop else None
+    except ValueError as e:
+        ap.error(str(e))
+
+    start_step, rng = 1, None
+    if args.resume:
+        ck = Checkpoints.load(args.resume)
+        state, rng = ck.restore(args.from_step)
+        start_step = (int(ck.steps[-1]) if args.from_step is None else args.from_step) + 1
+        print(f"   从 {args.resume} 第 {start_step - 1} 步续跑")
+    else:
+        state = load_scenario(args.scenario or args.preset)
+    checkpoints = Checkpoints(args.checkpoint_every) if args.checkpoint else None
+    metrics = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    writer = ChunkedWriter(args.out, metrics, args.chunk) if args.out else None
+
+    profiling = profile(trace=bool(args.profile_trace)) \
+        if args.profile or args.profile_trace else contextlib.nullcontext()
+    t0 = time.perf_counter()
+    try:
+        with profiling as prof:
+            if args.cache_dir:
+                final = _run_cached(state, args, metrics, writer)
+            else:
+                final = run_simulation(state, args.steps, start_step, seed=args.seed,
+                                       writer=writer, every=max(args.every, 1),
+                                       checkpoints=checkpoints, rng=rng, stop=stop,
+                                       fast=not args.no_fast)
+    finally:
+        if writer is not None:
+            writer.close()
+    dt = time.perf_counter() - t0
+    n_done = args.steps if stop is None or stop.step is None else stop.step - start_step + 1
+
+    print(f"✅ {n_done} 步完成，用时 {dt:.2f}s（{n_done / max(dt, 1e-9):,.0f} 步/秒），seed={final['seed']}")
+    if stop is not None and stop.step is not None:
+        print(f"   第 {stop.step} 步进入终态（{stop.reason}），提前停止")
+    print(f"   UST={final['ust_price']:.6f}  LUNA={final['luna_price']:.6g}  "
+          f"LFG={final['lfg_reserve_usd']:,.0f}")
+    if writer is not None:
+        print(f"   {writer.rows} 行 / {writer.chunks} 块 -> {args.out}")
+    if checkpoints is not None:
+        checkpoints.save(args.checkpoint)
+        print(f"   {len(checkpoints)} 个检查点 -> {args.checkpoint}")
+    if prof is not None:
+        print(prof.format())
+        if args.profile_trace:
+            prof.write_trace(args.profile_trace)
+            print(f"   trace -> {args.profile_trace}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,36 @@
 from backend.model import compute_new_state
-from backend.web3_api import w3, send_txn
+from backend import web3_api  # web3 只在真正发交易时才导入 / 连接
 
-def simulate_step(state, stable_contract, step=1, use_onchain=False):
-    """执行一步模拟"""
-    new_state = compute_new_state(state, step=step)
+def simulate_step(state, stable_contract, step=1, use_onchain=False, rng=None, pipeline=None,
+                  batcher=None, policy=None):
+    """
+    执行一步模拟；rng 为可选的 NoiseStream（固定 seed 可复现）。
+    链上模式下：
+      - batcher（web3_api.PriceBatcher）：价格攒批，一笔 setPrices 写入多步；
+      - pipeline（web3_api.TxPipeline）：每步一笔 setPrice，只提交、不等回执；
+      - 都不传：逐笔发送并等待上链。
+    policy（publish.DeadbandPolicy）决定这一步是否需要发布，不需要时不发交易。
+    policy 与 batcher 同时使用时，policy 放行的价格立即随批发出（flush）：价格在批里等待时
+    链上仍是旧值，deadband 的偏差上界就不成立了；被抑制的步照常不发交易。
+    """
+    new_state = compute_new_state(state, step=step, rng=rng)
     price_onchain = int(new_state["ust_price"] * 1e18)
 
-    if use_onchain:
-        tx_hash = send_txn(stable_contract.functions.setPrice, stable_contract, price_onchain)
+    if use_onchain and policy is not None and \
+            not policy.should_publish(step, new_state["ust_price"]):
+        pass
+    elif use_onchain and batcher is not None:
+        batcher.add(step, price_onchain)
+        if policy is not None:
+            batcher.flush()
+    elif use_onchain and pipeline is not None:
+        pipeline.submit(stable_contract.functions.setPrice(price_onchain))
+    elif use_onchain:
+        tx_hash = web3_api.send_txn(stable_contract.functions.setPrice, stable_contract, price_onchain)
         print(f"✅ [链上模式] setPrice 交易已发出: {tx_hash}")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        receipt = web3_api.get_w3().eth.wait_for_transaction_receipt(tx_hash)
         print(f"⛓️ 区块确认完成 — Block {receipt.blockNumber}")
     else:
         print(f"🧮 [本地] step={step}, price={price_onchain / 1e18:.4f} USD")
 
-    return new_state
\ No newline at end of file
+    return new_state
@@ -0,0 +1,381 @@
+# backend/ensemble.py
+"""
+批量（ensemble）推进引擎：一次推进 N 条相互独立的路径。
+
+每个状态字段存成长度为 N 的 NumPy 数组，分支用掩码处理，运算顺序与
+model.compute_new_state 逐行对应。给定相同的噪声抽样，逐路径结果与标量模型一致到
+PARITY_RTOL / PARITY_ATOL（np.isclose 意义下）：NumPy 的 exp / tanh / 幂运算与 math
+在末位舍入上不同，每步约 1 ulp，不是逐位相同。Terra 预设 500 步内所有字段都在容差内；
+更长的崩盘尾部里 last_trade_slippage（1 - 成交价/边际价，相减抵消）的相对误差会放大。
+"""
+import math
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from backend.events import compile_events
+from backend.model import ModelParams, compile_params
+from backend.oracle import PriceRing, PriceRingBatch
+from backend.rng import EnsembleNoise
+
+# 路径级字段（每条路径一个值）
+PATH_FIELDS = (
+    "ust_price", "luna_price", "ust_supply", "luna_supply",
+    "pool_ust", "pool_luna", "pool_k0",
+    "lfg_reserve_usd", "lfg_reserve0", "pending_luna_cex",
+    "amm_luna_price_ust", "amm_luna_price_usd", "last_trade_slippage",
+    "lfg_spent_usd", "spread_ust", "spread_luna",
+    "pool_k", "pool_k_rel", "pool_ust_share",
+)
+
+# 与标量模型的一致性容差（见模块说明；tests/test_determinism.py 按此检查）
+PARITY_RTOL = 1e-12
+PARITY_ATOL = 1e-12
+
+# ---------- 向量化工具 ----------
+
+def _clamp(x, lo, hi):
+    # 与 model.clamp 同序：max(lo, min(hi, x))
+    return np.maximum(lo, np.minimum(hi, x))
+
+def bounded_impact_asym_v(price: np.ndarray, net_usd, depth_usd: np.ndarray,
+                          coeff: float, max_up: float, max_dn: float) -> np.ndarray:
+    """bounded_impact_asym 的数组版本"""
+    ok = (price > 0) & (depth_usd > 0)
+    x = coeff * (net_usd / np.where(depth_usd > 0, depth_usd, 1.0))
+    log_move = np.where(x >= 0, max_up * np.tanh(x), -max_dn * np.tanh(-x))
+    moved = np.maximum(price * np.exp(log_move), 1e-12)
+    return np.where(ok, moved, np.maximum(price, 1e-12))
+
+def cpmm_swap_x_for_y_v(x_res: np.ndarray, y_res: np.ndarray, dx: np.ndarray,
+                        fee: float, max_trade_mult: float
+                        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """cpmm_swap_x_for_y 的数组版本，返回 (dy_out, new_x, new_y, effective_price, slippage_pct)"""
+    ok = (dx > 0) & (x_res > 0) & (y_res > 0)
+    dx_eff = np.minimum(dx * (1 - fee), max_trade_mult * x_res)
+    k = x_res * y_res
+    new_x = x_res + dx_eff
+    new_y = k / new_x
+    dy_out = np.maximum(y_res - new_y, 0.0)
+
+    pre_marginal = y_res / x_res
+    eff_price = np.where(dx > 0, dy_out / dx, 0.0)
+    slip = np.where(pre_marginal <= 0, 0.0, 1 - (eff_price / pre_marginal))
+
+    zero = np.zeros_like(x_res)
+    return (
+        np.where(ok, dy_out, zero),
+        np.maximum(np.where(ok, new_x, x_res), 1e-12),
+        np.maximum(np.where(ok, new_y, y_res), 1e-12),
+        np.where(ok, np.maximum(eff_price, 0.0), zero),
+        np.where(ok, np.maximum(slip, 0.0), zero),
+    )
+
+# ---------- 构造 / 拆分 ----------
+
+def make_ensemble(state: Dict, n_paths: int) -> Dict:
+    """把一个标量初始状态复制成 n_paths 条路径"""
+    P = compile_params(state.get("params"))
+    luna_price = float(state["luna_price"])
+    pool_ust = float(state.get("pool_ust", 5_000_000.0))
+    pool_luna = float(state.get("pool_luna", max(5_000_000.0 / max(luna_price, 1e-8), 1.0)))
+    lfg_reserve = float(state.get("lfg_reserve_usd", 0.0))
+    pool_k0 = state.get("pool_k0")
+    if pool_k0 is None:
+        pool_k0 = pool_ust * pool_luna
+
+    init = {
+        "ust_price": float(state["ust_price"]), "luna_price": luna_price,
+        "ust_supply": float(state["ust_supply"]), "luna_supply": float(state["luna_supply"]),
+        "pool_ust": pool_ust, "pool_luna": pool_luna, "pool_k0": float(pool_k0),
+        "lfg_reserve_usd": lfg_reserve,
+        "lfg_reserve0": float(state.get("lfg_reserve0", max(lfg_reserve, 1.0))),
+        "pending_luna_cex": float(state.get("pending_luna_cex", 0.0)),
+    }
+    ens = {k: np.full(n_paths, init.get(k, float(state.get(k, 0.0))), dtype=np.float64)
+           for k in PATH_FIELDS}
+
+    # 预言机历史：(N, cap) 环形缓冲，写入位置对所有路径相同
+    hist = state.get("luna_price_hist")
+    if isinstance(hist, PriceRing):
+        hist = hist.tolist()
+    ens["luna_price_hist"] = PriceRingBatch.from_values(
+        hist or [luna_price], n_paths, P.oracle_capacity
+    )
+
+    ens["params"] = P
+    ens["ext_events"] = compile_events(state.get("ext_events"))
+    ens["n_paths"] = n_paths
+    return ens
+
+def path_state(ens: Dict, i: int) -> Dict:
+    """取出第 i 条路径的标量状态（不含预言机历史）"""
+    out = {k: float(ens[k][i]) for k in PATH_FIELDS}
+    out["params"] = ens["params"]
+    out["ext_events"] = ens["ext_events"]
+    return out
+
+def take_paths(ens: Dict, idx) -> Dict:
+    """只保留部分路径（idx 为下标或布尔掩码；预言机缓冲复制一份）"""
+    out = {k: ens[k][idx] for k in PATH_FIELDS}
+    out["luna_price_hist"] = ens["luna_price_hist"].take(idx)
+    out["params"] = ens["params"]
+    out["ext_events"] = ens["ext_events"]
+    out["n_paths"] = len(out["ust_price"])
+    return out
+
+# ---------- 主循环（批量） ----------
+
+def compute_new_state_batch(ens: Dict, step: int = 1,
+                            noise: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                            rng: Optional[EnsembleNoise] = None) -> Dict:
+    """
+    批量推进一步，逻辑与 model.compute_new_state 一一对应（结果在 PARITY_RTOL 内一致）。
+    noise 为 (eps_ust, eps_luna) 数组；不传则从 rng 抽取（不传 rng 用一次性随机种子）。
+    预言机环形缓冲原地写入，返回的新状态与旧状态共享它。
+    """
+    P: ModelParams = ens["params"]
+    n = ens["n_paths"]
+
+    fee = P.amm_fee; max_trade_mult = P.max_trade_mult
+    alpha = P.redeem_alpha; max_frac = P.max_redeem_usd_frac
+    max_luna_mint_frac = P.max_luna_mint_frac_of_supply
+
+    bank_low = P.bankrun_low; bank_span = P.bank_span
+    t0 = P.bankrun_t0; inv_tau = P.inv_tau
+    bank_max = P.max_bankrun_frac
+
+    amm_frac = P.amm_frac
+    rel_rate = P.luna_cex_release_rate
+
+    depth_ust0 = P.cex_depth_ust; depth_luna0 = P.cex_depth_luna
+    inv_halflife = P.inv_halflife
+    coeff = P.impact_coeff
+    up_u, dn_u = P.max_log_up_ust, P.max_log_dn_ust
+    up_l, dn_l = P.max_log_up_luna, P.max_log_dn_luna
+
+    oracle_delay = P.oracle_delay
+
+    lfg_trigger = P.lfg_trigger
+    lfg_step = P.lfg_per_step_usd
+    lfg_eff = P.lfg_effectiveness
+    lfg_decay = P.lfg_effect_decay
+    lfg_cutoff = P.lfg_cutoff_depeg
+
+    drain_base = P.pool_drain_base; drain_slope = P.pool_drain_slope
+
+    ust_min = P.ust_min; ust_max = P.ust_max
+    luna_min = P.luna_min; luna_max = P.luna_max
+
+    ust_price = ens["ust_price"]; luna_price = ens["luna_price"]
+    ust_supply = ens["ust_supply"]; luna_supply = ens["luna_supply"]
+    pool_ust = ens["pool_ust"]; pool_luna = ens["pool_luna"]
+    lfg_reserve = ens["lfg_reserve_usd"]; lfg_reserve0 = ens["lfg_reserve0"]
+    pending_luna = ens["pending_luna_cex"]
+    pool_k0 = ens["pool_k0"]
+
+    # 预言机（环形缓冲）
+    ring = ens["luna_price_hist"]
+    ring.push(luna_price)
+    oracle_luna_price = ring.oracle(oracle_delay, P.oracle_mode, P.oracle_window, luna_price)
+
+    # 外部事件（所有路径共享同一张预编译事件表）
+    ext_events = ens["ext_events"]
+    ust_net_flow_usd, luna_net_flow_usd = ext_events.flows(step)
+
+    if noise is None:
+        noise = (rng or EnsembleNoise(paths=range(n))).draw()
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # 噪声
+        ust_price = ust_price * (1 + noise[0])
+        luna_price = luna_price * (1 + noise[1])
+
+        # 有效深度
+        time_decay = 0.5 ** (step * inv_halflife)
+        depeg_now = _clamp(1.0 - ust_price, 0.0, 1.0)
+        depeg_decay = 0.7 + 0.3 * np.exp(-depeg_now / 0.15)
+        depth_ust = np.maximum(1e5, depth_ust0 * time_decay * depeg_decay)
+        depth_luna = np.maximum(1e5, depth_luna0 * time_decay * depeg_decay)
+
+        # 银行挤兑
+        bank_alpha = bank_low + bank_span * (
+            1.0 / (1.0 + math.exp(-(step - t0) * inv_tau))
+        )
+        m = ust_price < 1.0
+        bank_usd = _clamp(bank_alpha * depeg_now * ust_supply, 0.0, bank_max * ust_supply)
+        ust_price = np.where(
+            m, bounded_impact_asym_v(ust_price, -bank_usd, depth_ust, coeff, up_u, dn_u), ust_price
+        )
+
+        # 赎回/增发
+        lfg_spent = np.zeros(n)
+        last_slip = np.zeros(n)
+        max_step_usd = max_frac * ust_supply
+        max_mint_usd = P.max_mint_usd_frac * ust_supply
+
+        # 赎回分支：UST < 1
+        redeem_usd = _clamp(alpha * depeg_now * ust_supply, 0.0, max_step_usd)
+        m_red = (ust_price < 1.0) & (redeem_usd > 0.0) & (oracle_luna_price > 0.0)
+        minted_luna = np.minimum(redeem_usd / oracle_luna_price,
+                                 max_luna_mint_frac * np.maximum(luna_supply, 1.0))
+        dx_amm = amm_frac * minted_luna
+        m_amm = m_red & (dx_amm > 0)
+        dx_amm = np.where(dx_amm > 0, np.minimum(dx_amm, pool_luna * 0.95), dx_amm)
+        _, new_luna, new_ust, _, slip = cpmm_swap_x_for_y_v(
+            pool_luna, pool_ust, dx_amm, fee=fee, max_trade_mult=max_trade_mult
+        )
+        red_ust_supply = ust_supply - redeem_usd
+        red_luna_supply = luna_supply + minted_luna
+        red_pending = pending_luna + np.maximum(minted_luna - dx_amm, 0.0)
+
+        # 增发分支：UST > 1
+        overpeg = _clamp(ust_price - 1.0, 0.0, 1.0)
+        mint_usd = _clamp(alpha * overpeg * ust_supply, 0.0, max_mint_usd)
+        m_mint = (ust_price > 1.0) & (mint_usd > 0.0) & (oracle_luna_price > 0.0)
+        burn_luna = np.minimum(mint_usd / oracle_luna_price, luna_supply * 0.06)
+        dx = np.minimum(mint_usd, pool_ust * 0.95)
+        _, m_new_ust, m_new_luna, _, m_slip = cpmm_swap_x_for_y_v(
+            pool_ust, pool_luna, dx, fee=fee, max_trade_mult=max_trade_mult
+        )
+
+        ust_supply = np.where(m_red, red_ust_supply,
+                              np.where(m_mint, ust_supply + mint_usd, ust_supply))
+        luna_supply = np.where(m_red, red_luna_supply,
+                               np.where(m_mint, luna_supply - burn_luna, luna_supply))
+        pending_luna = np.where(m_red, red_pending, pending_luna)
+        pool_luna, pool_ust, last_slip = (
+            np.where(m_amm, new_luna, np.where(m_mint, m_new_luna, pool_luna)),
+            np.where(m_amm, new_ust, np.where(m_mint, m_new_ust, pool_ust)),
+            np.where(m_amm, slip, np.where(m_mint, m_slip, last_slip)),
+        )
+
+        # LFG
+        depeg = depeg_now
+        front_mult = _clamp(1.0 + 3.0 * (depeg / 0.25) ** 1.2, 1.0, 4.0)
+        spend = np.minimum(lfg_step * front_mult, lfg_reserve)
+        m_lfg = ((ust_price < lfg_trigger) & (lfg_reserve > 0.0)
+                 & (depeg < lfg_cutoff) & (spend > 0))
+        lfg_reserve = np.where(m_lfg, lfg_reserve - spend, lfg_reserve)
+        lfg_spent = np.where(m_lfg, spend, lfg_spent)
+        eff = lfg_eff * ((lfg_reserve / lfg_reserve0) ** lfg_decay)
+        ust_price = np.where(
+            m_lfg, bounded_impact_asym_v(ust_price, eff * spend, depth_ust, coeff, up_u, dn_u),
+            ust_price,
+        )
+
+        # CEX 抛压队列释放
+        m_cex = pending_luna > 0
+        sell_qty = rel_rate * pending_luna
+        luna_price = np.where(
+            m_cex,
+            bounded_impact_asym_v(luna_price, -(sell_qty * luna_price), depth_luna,
+                                  coeff, up_l, dn_l),
+            luna_price,
+        )
+        pending_luna = np.where(m_cex, pending_luna - sell_qty, pending_luna)
+
+        # 外部事件
+        if ust_net_flow_usd:
+            ust_price = bounded_impact_asym_v(ust_price, ust_net_flow_usd, depth_ust,
+                                              coeff, up_u, dn_u)
+        if luna_net_flow_usd:
+            luna_price = bounded_impact_asym_v(luna_price, luna_net_flow_usd, depth_luna,
+                                               coeff, up_l, dn_l)
+
+        # 撤池
+        m_drain = ust_price < 1.0
+        drain = _clamp(drain_base + drain_slope * depeg_now, 0.0, 0.25)
+        pool_ust = np.where(m_drain, pool_ust * (1 - drain), pool_ust)
+        pool_luna = np.where(m_drain, pool_luna * (1 - drain), pool_luna)
+
+        # 硬边界
+        ust_price = _clamp(ust_price, ust_min, ust_max)
+        luna_price = _clamp(luna_price, luna_min, luna_max)
+
+        # 指标
+        amm_luna_price_ust = np.where(pool_luna > 0, pool_ust / pool_luna, np.inf)
+        amm_luna_price_usd = amm_luna_price_ust * ust_price
+        spread_ust = ust_price - 1.0
+        spread_luna = luna_price - amm_luna_price_usd
+
+        pool_k = pool_ust * pool_luna
+        pool_k_rel = np.where(pool_k0 > 0, pool_k / pool_k0, 1.0)
+        total_ust_equiv = pool_ust + pool_luna * amm_luna_price_ust
+        pool_ust_share = np.where(total_ust_equiv > 0, pool_ust / total_ust_equiv, 0.5)
+
+    return {
+        "ust_price": ust_price, "luna_price": luna_price,
+        "ust_supply": np.maximum(ust_supply, 0.0), "luna_supply": np.maximum(luna_supply, 0.0),
+
+        "pool_ust": pool_ust, "pool_luna": pool_luna, "pool_k0": pool_k0,
+        "lfg_reserve_usd": lfg_reserve, "lfg_reserve0": lfg_reserve0,
+        "luna_price_hist": ring,
+        "pending_luna_cex": np.maximum(pending_luna, 0.0),
+
+        "amm_luna_price_ust": amm_luna_price_ust,
+        "amm_luna_price_usd": amm_luna_price_usd,
+        "last_trade_slippage": last_slip,
+        "lfg_spent_usd": lfg_spent,
+        "spread_ust": spread_ust, "spread_luna": spread_luna,
+        "pool_k": pool_k, "pool_k_rel": pool_k_rel, "pool_ust_share": pool_ust_share,
+
+        "params": P, "ext_events": ext_events, "n_paths": n,
+    }
+
+def iter_ensemble(ens: Dict, n_steps: int, start_step: int = 1,
+                  rng: Optional[EnsembleNoise] = None, stop=None
+                  ) -> Iterator[Tuple[int, Dict, np.ndarray, Optional[np.ndarray]]]:
+    """
+    逐步产出 (step, ens, active, done)。active 为当前批次各路径在初始批次里的下标。
+    给出 stop（backend.stopping.StopWhen）时，done 是本步刚满足停止条件的掩码：
+    这些路径产出之后移出批次（噪声流、预言机缓冲一起裁剪），其余路径的结果与
+    不停止时逐位相同；全部停止后提前结束。不给 stop 时 done 为 None。
+    """
+    active = np.arange(ens["n_paths"])
+    if stop is not None:
+        rng = rng or EnsembleNoise(paths=active)
+        stop.reset(len(active))
+    for step in range(start_step, start_step + n_steps):
+        ens = compute_new_state_batch(ens, step=step, rng=rng)
+        done = None if stop is None else stop.mask(step, ens)
+        yield step, ens, active, done
+        if done is not None and done.any():
+            keep = ~done
+            if not keep.any():
+                return
+            ens = take_paths(ens, keep)
+            rng = rng.take(keep)
+            stop.retain(keep)
+            active = active[keep]
+
+def run_ensemble(state: Dict, n_paths: int, n_steps: int, start_step: int = 1,
+                 seed: Optional[int] = None, path_offset: int = 0, stop=None) -> Dict:
+    """
+    从标量初始状态出发，批量推进 n_steps 步，返回最终的批量状态。
+    路径 i 使用全局编号 path_offset + i 的噪声流，切分到多个进程时结果不变。
+
+    给出 stop 时已进入终态的路径提前退出批次：返回的字段是各路径停止那一步的值，
+    另附 "stop_step"（未停止为 inf），不含预言机缓冲。
+    """
+    rng = EnsembleNoise(seed, paths=range(path_offset, path_offset + n_paths))
+    ens = make_ensemble(state, n_paths)
+    if stop is None:
+        for step in range(start_step, start_step + n_steps):
+            ens = compute_new_state_batch(ens, step=step, rng=rng)
+        ens["seed"] = rng.seed
+        return ens
+
+    out = {k: ens[k].copy() for k in PATH_FIELDS}
+    stop_step = np.full(n_paths, np.inf)
+    cur, active = ens, np.arange(n_paths)
+    for step, cur, active, done in iter_ensemble(ens, n_steps, start_step, rng, stop):
+        if done.any():
+            stop_step[active[done]] = step
+            for k in PATH_FIELDS:
+                out[k][active[done]] = cur[k][done]
+    for k in PATH_FIELDS:
+        out[k][active] = cur[k]
+    out.update(params=ens["params"], ext_events=ens["ext_events"], n_paths=n_paths,
+               stop_step=stop_step, seed=rng.seed)
+    return out
@@ -0,0 +1,63 @@
+# backend/events.py
+"""
+外部事件表：把 ext_events 列表一次性编译成「触发步 -> 净流量」索引。
+
+每步查询 O(1)，与事件数量无关；编译结果只读，可在多条路径 / 批量引擎之间复用。
+"""
+import warnings
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+EVENT_TYPES = ("ust_sell", "ust_buy", "luna_sell", "luna_buy")
+
+_NO_FLOW = (0.0, 0.0)
+
+class EventSchedule:
+    """
+    flows(step) 返回 (ust_net_flow_usd, luna_net_flow_usd)，
+    同一步的多个事件按原列表顺序累加（与逐条扫描的结果逐位一致）。
+    type 不在 EVENT_TYPES 里的事件与原先逐条扫描时一样不产生流量，编译时给出一次警告。
+    """
+    __slots__ = ("events", "steps", "_flows")
+
+    def __init__(self, ext_events: Optional[Iterable[Dict]] = None):
+        self.events = tuple(dict(ev) for ev in (ext_events or ()))
+        acc: Dict[int, list] = {}
+        for ev in self.events:
+            typ = ev.get("type")
+            if typ not in EVENT_TYPES:
+                warnings.warn(f"忽略未知事件类型 {typ!r}（可选 {EVENT_TYPES}）", stacklevel=2)
+                continue
+            trigger = int(ev.get("step", -1)) + int(ev.get("latency", 0))
+            usd = float(ev.get("usd", 0.0))
+            flow = acc.setdefault(trigger, [0.0, 0.0])
+            if   typ == "ust_sell":  flow[0] -= usd
+            elif typ == "ust_buy":   flow[0] += usd
+            elif typ == "luna_sell": flow[1] -= usd
+            elif typ == "luna_buy":  flow[1] += usd
+        self._flows = {s: (f[0], f[1]) for s, f in acc.items()}
+        # 有非零净流量的触发步（升序），供「下一个事件」查询
+        self.steps = tuple(sorted(s for s, f in self._flows.items() if f[0] or f[1]))
+
+    def flows(self, step: int) -> Tuple[float, float]:
+        return self._flows.get(step, _NO_FLOW)
+
+    def next_step(self, step: int) -> Optional[int]:
+        """>= step 的第一个触发步，没有则返回 None"""
+        i = bisect_left(self.steps, step)
+        return self.steps[i] if i < len(self.steps) else None
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __repr__(self) -> str:
+        return f"EventSchedule({len(self.events)} events, {len(self.steps)} trigger steps)"
+
+def compile_events(ext_events: Union[None, Iterable[Dict], EventSchedule]) -> EventSchedule:
+    """已编译的事件表原样返回"""
+    if isinstance(ext_events, EventSchedule):
+        return ext_events
+    return EventSchedule(ext_events)
@@ -0,0 +1,154 @@
+# backend/fastforward.py
+"""
+无事件区间的快进内核。
+
+compute_new_state 每步都要解包参数、读写状态 dict、查事件表、单独抽一次噪声、
+组装结果 dict，这些固定开销占了单步耗时的一大半。两个外部事件之间
+（边界由编译好的事件表 EventSchedule.next_step 给出）没有事件冲击，这里：
+
+  - 一次从噪声流里抽出整段区间的噪声（批量抽取，流的位置同步前进）；
+  - 参数只解包一次（编译参数时建好的 P.kernel，见 model.step_kernel），
+    状态、预言机缓冲的写指针放在局部变量里逐步递推；
+  - 只在区间末尾组装一次状态 dict（model.pack_state，各项指标只依赖最终状态）。
+
+每步的运算就是 compute_new_state 调用的同一个 step_kernel，这里不另写一份模型。
+事件触发步、以及状态还没规范化（params 未编译 / 预言机还是 list）的第一步仍交给
+compute_new_state。结果与逐步调用 compute_new_state 逐位相同（tests/test_fastforward.py），
+之后可以接着逐步跑、存检查点或续跑。
+
+模型在锚定附近没有可以整段解析跳过的静止区间：UST 只要被噪声推离 1，
+增发（> 1）或挤兑 / 赎回 / 撤池（< 1）就有一支生效，状态随之变化。
+所以快进省掉的是每步的固定开销，步数本身仍要逐步递推。
+
+    state = advance(get_preset("terra"), 1_000_000, rng=NoiseStream(0))
+    python -m backend.fastforward --steps 1000000 --check 10000
+"""
+import argparse
+import time
+from typing import Dict, Optional
+
+from backend import model
+from backend.events import EventSchedule
+from backend.model import ModelParams, compute_new_state, fork_state, pack_state
+from backend.oracle import PriceRing
+from backend.rng import LUNA_NOISE, UST_NOISE, NoiseStream
+
+# 短于该步数的区间直接逐步推进（批量抽噪声和组装状态的准备开销约合几步）
+MIN_WINDOW = 4
+
+def _normalized(state: Dict) -> bool:
+    """params / 预言机 / 事件表都已是 compute_new_state 的输出形态"""
+    P = state.get("params")
+    hist = state.get("luna_price_hist")
+    return (isinstance(P, ModelParams) and isinstance(state.get("ext_events"), EventSchedule)
+            and isinstance(hist, PriceRing) and hist.cap >= P.oracle_capacity
+            and "pool_k0" in state and "lfg_reserve0" in state)
+
+def advance(state: Dict, n_steps: int, start_step: int = 1,
+            rng: Optional[NoiseStream] = None) -> Dict:
+    """
+    等价于从 start_step 起连续调用 n_steps 次 compute_new_state(state, step, rng=rng)，
+    返回最终状态。与 compute_new_state 一样原地推进预言机缓冲（需要保留输入时先 fork_state）。
+    打开了 backend.profiling 的计时器时退回逐步推进，以便按阶段计时。
+    """
+    rng = rng if rng is not None else NoiseStream()
+    step, end = start_step, start_step + n_steps
+    while step < end:
+        if model._profiler is None and _normalized(state):
+            nxt = state["ext_events"].next_step(step)
+            stop = end if nxt is None else min(nxt, end)
+            if stop - step >= MIN_WINDOW:
+                state = _quiet(state, step, stop, rng)
+                step = stop
+                continue
+        state = compute_new_state(state, step=step, rng=rng)
+        step += 1
+    return state
+
+def _quiet(state: Dict, start: int, end: int, rng: NoiseStream) -> Dict:
+    """推进 [start, end) 这段没有外部事件的步；逐步运算与 compute_new_state 共用 P.kernel"""
+    P: ModelParams = state["params"]
+    kernel = P.kernel
+
+    ust_price = float(state["ust_price"]); luna_price = float(state["luna_price"])
+    ust_supply = float(state["ust_supply"]); luna_supply = float(state["luna_supply"])
+    pool_ust = float(state["pool_ust"]); pool_luna = float(state["pool_luna"])
+    lfg_reserve = float(state["lfg_reserve_usd"])
+    lfg_reserve0 = float(state["lfg_reserve0"])
+    pending_luna = float(state.get("pending_luna_cex", 0.0))
+
+    # 预言机：写指针放在局部变量里，spot 模式直接按下标读
+    hist: PriceRing = state["luna_price_hist"]
+    buf, cap, head, count = hist.buf, hist.cap, hist.head, hist.count
+    delay = P.oracle_delay
+    spot = P.oracle_mode == "spot" or P.oracle_window <= 1
+    oracle_mode, oracle_window = P.oracle_mode, P.oracle_window
+
+    # 整段噪声一次抽出（与 noise_from_uniform 同一公式、同样的运算顺序）
+    u = rng.uniforms(2 * (end - start))
+    eps_ust = (-UST_NOISE + 2 * UST_NOISE * u[0::2]).tolist()
+    eps_luna = (-LUNA_NOISE + 2 * LUNA_NOISE * u[1::2]).tolist()
+
+    lfg_spent = 0.0; last_slip = 0.0
+    for i, step in enumerate(range(start, end)):
+        buf[head] = luna_price
+        head = (head + 1) % cap
+        count += 1
+        if count <= delay:
+            oracle_luna_price = luna_price
+        elif spot:
+            oracle_luna_price = buf[(head - 1 - delay) % cap]
+        else:
+            hist.head, hist.count = head, count
+            oracle_luna_price = hist.oracle(delay, oracle_mode, oracle_window, luna_price)
+
+        (ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+         lfg_reserve, pending_luna, lfg_spent, last_slip) = kernel(
+            step, ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+            lfg_reserve, lfg_reserve0, pending_luna, oracle_luna_price,
+            eps_ust[i], eps_luna[i], 0.0, 0.0)
+
+    hist.head, hist.count = head, count
+    return pack_state(P, state["ext_events"], hist, state["pool_k0"], lfg_reserve0,
+                      ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+                      lfg_reserve, pending_luna, lfg_spent, last_slip)
+
+def main(argv=None):
+    from backend.presets import PRESETS, load_scenario
+
+    ap = argparse.ArgumentParser(description="快进内核：计时并与逐步推进逐位对比")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    src.add_argument("--scenario", help="预设名或 JSON 场景文件")
+    ap.add_argument("--steps", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--check", type=int, default=0, metavar="N",
+                    help="另用 compute_new_state 逐步跑前 N 步，核对结果逐位相同")
+    args = ap.parse_args(argv)
+    init = load_scenario(args.scenario or args.preset)
+
+    t0 = time.perf_counter()
+    advance(fork_state(init), args.steps, rng=NoiseStream(args.seed))
+    dt = time.perf_counter() - t0
+    print(f"advance: {args.steps} 步 {dt:.2f}s（{dt / max(args.steps, 1) * 1e6:.2f} µs/步）")
+
+    if args.check:
+        rng_a, rng_b = NoiseStream(args.seed), NoiseStream(args.seed)
+        a = advance(fork_state(init), args.check, rng=rng_a)
+        b = fork_state(init)
+        t0 = time.perf_counter()
+        for step in range(1, args.check + 1):
+            b = compute_new_state(b, step=step, rng=rng_b)
+        dt = time.perf_counter() - t0
+        print(f"逐步:    {args.check} 步 {dt:.2f}s（{dt / args.check * 1e6:.2f} µs/步）")
+        diff = [k for k, v in b.items() if isinstance(v, float) and a[k] != v and v == v]
+        if a["luna_price_hist"].tolist() != b["luna_price_hist"].tolist():
+            diff.append("luna_price_hist")
+        if rng_a.position != rng_b.position:
+            diff.append("rng.position")
+        print("✅ 逐位相同" if not diff else f"❌ 不一致: {diff}")
+        return 1 if diff else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+# backend/fsutil.py
+"""
+磁盘缓存共用的小工具（只依赖标准库）：缓存根目录与原子写入。
+轨迹缓存（backend.cache）和 Solidity 编译缓存（backend.solbuild）都用它，
+后者因此不必导入 NumPy / 模型。
+"""
+import os
+import tempfile
+from typing import Callable
+
+def default_cache_dir() -> str:
+    """SIM_CACHE_DIR，未设置时为 ~/.cache/luna-ust-sim"""
+    return os.environ.get("SIM_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "luna-ust-sim")
+
+def atomic_write(path: str, write: Callable) -> None:
+    """write(f) 写入同目录下的临时文件，成功后再 os.replace 到 path（读者不会看到半个文件）"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,276 @@
+# backend/localchain.py
+"""
+本地链后端：不依赖公共测试网，也能完整运行链上模式并压测 setPrice / mint / redeem。
+
+  - tester：进程内的 eth-tester（py-evm），每笔交易自动出块，不需要任何外部程序；
+  - anvil：启动一个 anvil 子进程（Foundry），可按 block_time 出块，更接近真实节点。
+
+启动后编译并部署 MyToken（充当 LUNA）+ AlgoStableV2，部署账户即 owner：
+
+    with LocalChain.start("tester") as chain:
+        state, stats = run_onchain(chain, get_preset("terra"), 200, seed=7)
+
+设置环境变量 CHAIN_BACKEND=tester（或 anvil）后，web3_api.get_w3() 和前端的链上模式
+都改用进程内共享的本地链（shared_chain），不再连接 Infura。
+
+    python -m backend.localchain --backend tester --steps 200 --seed 7 --window 16
+"""
+import argparse
+import atexit
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKENDS = ("tester", "anvil")
+
+DEPLOY_GAS = 3_000_000
+TX_GAS = 200_000
+
+# anvil / hardhat 默认的开发助记词（公开，仅用于本地链），前 10 个账户已预充值
+DEV_MNEMONIC = "test test test test test test test test test test test junk"
+# eth-tester 默认账户的私钥为 1, 2, 3, ...
+TESTER_KEYS = tuple("0x" + f"{i:064x}" for i in range(1, 11))
+
+def dev_keys(n: int = 10) -> Tuple[str, ...]:
+    """anvil 默认账户的私钥（由 DEV_MNEMONIC 派生）"""
+    from eth_account import Account
+    Account.enable_unaudited_hdwallet_features()
+    return tuple(
+        Account.from_mnemonic(DEV_MNEMONIC, account_path=f"m/44'/60'/0'/0/{i}").key.to_0x_hex()
+        for i in range(n))
+
+def compile_contracts(files: Iterable[str] = ("MyToken.sol", "AlgoStableV2.sol")
+                      ) -> Dict[str, Tuple[list, str]]:
+    """编译 contracts/ 下的源文件（backend.solbuild，按源码哈希缓存），返回 {合约名: (abi, bytecode)}"""
+    from backend.solbuild import build
+    return {name: (out["abi"], out["bin"]) for name, out in build(files).items()}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wei(x: float) -> int:
+    return int(x * 1e18)
+
+class LocalChain:
+    """一条本地链 + 部署好的合约；keys[0] 为部署账户（合约 owner）"""
+
+    def __init__(self, w3, keys: Sequence[str], proc: Optional[subprocess.Popen] = None):
+        self.w3 = w3
+        self.keys = tuple(keys)
+        self.proc = proc
+        self.owner = w3.eth.account.from_key(self.keys[0]).address
+        self.luna = None
+        self.stable = None
+
+    @classmethod
+    def start(cls, backend: str = "tester", deploy: bool = True, port: Optional[int] = None,
+              block_time: Optional[float] = None) -> "LocalChain":
+        """启动本地链；deploy=True 时顺带编译并部署 MyToken + AlgoStableV2"""
+        if backend == "tester":
+            from web3 import EthereumTesterProvider, Web3
+            chain = cls(Web3(EthereumTesterProvider()), TESTER_KEYS)
+        elif backend == "anvil":
+            chain = cls._start_anvil(port, block_time)
+        else:
+            raise ValueError(f"未知的本地链后端 {backend!r}（可选 {', '.join(BACKENDS)}）")
+        if deploy:
+            try:
+                chain.deploy()
+            except BaseException:
+                chain.close()
+                raise
+        return chain
+
+    @classmethod
+    def _start_anvil(cls, port, block_time) -> "LocalChain":
+        exe = shutil.which("anvil")
+        if exe is None:
+            raise RuntimeError("找不到 anvil（安装 Foundry：https://getfoundry.sh），或改用 tester 后端")
+        port = port or _free_port()
+        cmd = [exe, "--port", str(port), "--silent"]
+        if block_time:
+            cmd += ["--block-time", str(block_time)]
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        from web3 import Web3
+        w3 = Web3(Web3.HTTPProvider(f"http://127.0.0.1:{port}", request_kwargs={"timeout": 10}))
+        deadline = time.monotonic() + 10
+        while not w3.is_connected():
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError(f"anvil 启动失败（端口 {port}）")
+            time.sleep(0.05)
+        return cls(w3, dev_keys(), proc)
+
+    # ----- 部署 / 同步交易 -----
+
+    def transact(self, call, key: Optional[str] = None, gas: int = TX_GAS):
+        """用 key（默认 owner）发送一笔交易并等待回执；执行失败时抛出 RuntimeError"""
+        acct = self.w3.eth.account.from_key(key or self.keys[0])
+        txn = call.build_transaction({
+            "from": acct.address,
+            "nonce": self.w3.eth.get_transaction_count(acct.address, "pending"),
+            "gas": gas,
+            "gasPrice": self.w3.eth.gas_price,
+            "chainId": self.w3.eth.chain_id,
+        })
+        signed = acct.sign_transaction(txn)
+        receipt = self.w3.eth.wait_for_transaction_receipt(
+            self.w3.eth.send_raw_transaction(signed.raw_transaction))
+        if receipt.status != 1:
+            raise RuntimeError(f"交易执行失败: {receipt.transactionHash.to_0x_hex()}")
+        return receipt
+
+    def _deploy(self, abi, bytecode, *args):
+        factory = self.w3.eth.contract(abi=abi, bytecode=bytecode)
+        receipt = self.transact(factory.constructor(*args), gas=DEPLOY_GAS)
+        return self.w3.eth.contract(address=receipt.contractAddress, abi=abi)
+
+    def deploy(self, artifacts: Optional[Dict[str, Tuple[list, str]]] = None):
+        """部署 MyToken 和以它为 LUNA 的 AlgoStableV2，返回 (luna, stable)"""
+        artifacts = artifacts or compile_contracts()
+        self.luna = self._deploy(*artifacts["MyToken"])
+        self.stable = self._deploy(*artifacts["AlgoStableV2"], self.luna.address)
+        return self.luna, self.stable
+
+    def authorize(self, keys: Iterable[str]) -> None:
+        """把这些账户设为 AlgoStableV2 的操作员（多账户并发提交前调用）"""
+        for k in keys:
+            addr = self.w3.eth.account.from_key(k).address
+            if addr != self.owner:
+                self.transact(self.stable.functions.setOperator(addr, True))
+
+    def pipeline(self, key: Optional[str] = None, **kw):
+        """key（默认 owner）账户的 TxPipeline"""
+        from backend.web3_api import TxPipeline
+        key = key or self.keys[0]
+        return TxPipeline(self.w3, self.w3.eth.account.from_key(key).address, key, **kw)
+
+    def close(self) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------- 进程内共享（web3_api / 前端用） ----------
+
+_shared: Dict[str, LocalChain] = {}
+_shared_lock = threading.Lock()
+
+def shared_chain(backend: str = "tester") -> LocalChain:
+    """同一进程内只启动并部署一次的本地链，进程退出时关闭"""
+    with _shared_lock:
+        if backend not in _shared:
+            _shared[backend] = LocalChain.start(backend)
+            atexit.register(_shared[backend].close)
+        return _shared[backend]
+
+# ---------- 链上模式主循环 ----------
+
+def run_onchain(chain: LocalChain, state: Dict, n_steps: int, seed: Optional[int] = None,
+                window: int = 16, batch: int = 1, policy=None,
+                mirror_supply: bool = False) -> Tuple[Dict, Dict]:
+    """
+    在 chain 上跑与前端链上模式相同的循环：每步 simulate_step，价格经 TxPipeline 提交
+    （batch > 1 时经 PriceBatcher 攒批，policy 为可选的 DeadbandPolicy）。
+    mirror_supply=True 时再把每步 UST 供应量的变化同步为 mint / redeem 交易。
+    返回 (最终状态, 统计)；统计里的延迟为单笔交易从提交到确认的时间。
+    """
+    from backend.controller import simulate_step
+    from backend.rng import NoiseStream
+    from backend.web3_api import PriceBatcher
+
+    stable = chain.stable
+    rng = NoiseStream(seed)
+    onchain_supply = 0
+    if mirror_supply:
+        onchain_supply = _wei(state["ust_supply"])
+        chain.transact(stable.functions.mint(chain.owner, onchain_supply))
+    pipe = chain.pipeline(window=window)
+    batcher = PriceBatcher(stable, pipe, max_steps=batch) if batch > 1 else None
+    loop_times = []
+
+    t0 = time.perf_counter()
+    try:
+        for step in range(1, n_steps + 1):
+            s0 = time.perf_counter()
+            prev = state
+            state = simulate_step(state, stable, step=step, use_onchain=True, rng=rng,
+                                  pipeline=pipe, batcher=batcher, policy=policy)
+            if mirror_supply:
+                # 按 wei 整数跟踪链上余额，浮点舍入不会让 redeem 超出余额
+                target = _wei(state["ust_supply"])
+                if target > onchain_supply:
+                    pipe.submit(stable.functions.mint(chain.owner, target - onchain_supply))
+                elif target < onchain_supply:
+                    luna = max(_wei(state["luna_supply"]) - _wei(prev["luna_supply"]), 0)
+                    pipe.submit(stable.functions.redeem(chain.owner, onchain_supply - target, luna))
+                onchain_supply = target
+            loop_times.append(time.perf_counter() - s0)
+        if batcher is not None:
+            batcher.flush()
+        pipe.flush()
+    finally:
+        pipe.close()
+    elapsed = time.perf_counter() - t0
+
+    lat = np.asarray(pipe.latencies) * 1e3
+    stats = {
+        **pipe.stats(),
+        "steps": n_steps,
+        "seconds": elapsed,
+        "tx_per_s": pipe.confirmed / elapsed if elapsed else 0.0,
+        "steps_per_s": n_steps / elapsed if elapsed else 0.0,
+        "step_ms": 1e3 * float(np.mean(loop_times)) if loop_times else 0.0,
+        "latency_p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+        "latency_p95_ms": float(np.percentile(lat, 95)) if len(lat) else 0.0,
+    }
+    if mirror_supply:
+        stats["ust_balance_ok"] = stable.functions.balanceOf(chain.owner).call() == onchain_supply
+    return state, stats
+
+def main(argv=None):
+    from backend.presets import PRESETS, load_scenario
+    from backend.publish import DeadbandPolicy
+
+    ap = argparse.ArgumentParser(description="在本地链上运行链上模式")
+    ap.add_argument("--backend", choices=BACKENDS, default="tester")
+    ap.add_argument("--block-time", type=float, default=None, help="anvil 出块间隔（秒）")
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    ap.add_argument("--steps", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--window", type=int, default=16)
+    ap.add_argument("--batch", type=int, default=1, help="每笔 setPrices 的步数（1 = 逐步 setPrice）")
+    ap.add_argument("--deadband", type=float, default=0.0)
+    ap.add_argument("--heartbeat", type=int, default=100)
+    ap.add_argument("--mirror-supply", action="store_true", help="同时把供应量变化发成 mint / redeem")
+    args = ap.parse_args(argv)
+
+    policy = DeadbandPolicy(args.deadband, args.heartbeat) if args.deadband > 0 else None
+    with LocalChain.start(args.backend, block_time=args.block_time) as chain:
+        print(f"⛓️ {args.backend}: MyToken {chain.luna.address}, AlgoStableV2 {chain.stable.address}")
+        state, stats = run_onchain(chain, load_scenario(args.preset), args.steps, args.seed,
+                                   args.window, args.batch, policy, args.mirror_supply)
+        price = chain.stable.functions.price().call() / 1e18
+    print(f"✅ {stats['steps']} 步 / {stats['confirmed']} 笔交易，{stats['seconds']:.2f}s，"
+          f"{stats['tx_per_s']:.1f} tx/s，每步 {stats['step_ms']:.1f} ms，"
+          f"确认延迟 p50 {stats['latency_p50_ms']:.0f} ms / p95 {stats['latency_p95_ms']:.0f} ms")
+    print(f"   链上价格 {price:.6f}，模拟价格 {state['ust_price']:.6f}，统计: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
 # backend/model.py
+import ast
+import inspect
 import math
 import random
-from typing import List, Dict, Tuple
+import textwrap
+from dataclasses import dataclass, field, fields
+from typing import List, Dict, Tuple, Optional, Union
+
+from backend.events import EventSchedule, compile_events
+from backend.oracle import ORACLE_MODES, PriceRing, ring_capacity
+from backend.rng import LUNA_NOISE, UST_NOISE, NoiseStream
+
+# 模型版本：改变 compute_new_state 的数值结果时递增，磁盘缓存以此区分新旧结果
+MODEL_VERSION = 1
+
+# 可选的分阶段计时器（backend.profiling.profile() 设置）；为 None 时走不带计时的版本
+_profiler = None
 
 # ---------- 工具 ----------
 
@@ -76,8 +90,10 @@ def default_params() -> Dict:
         "max_log_up_luna": 0.22,
         "max_log_dn_luna": 0.40,
 
-        # 预言机延迟
+        # 预言机：延迟 + 取价方式（spot / twap / median，窗口单位为步）
         "oracle_delay": 10,
+        "oracle_mode": "spot",
+        "oracle_window": 1,
 
         # LFG：前 100 多步会明显用钱；深度脱锚才会停
         "lfg_trigger": 0.997,
@@ -98,175 +114,348 @@ def default_params() -> Dict:
 def default_ext_events() -> list:
     return []
 
-# ---------- 主循环 ----------
-
-def compute_new_state(state: Dict, step: int = 1) -> Dict:
-    P = {**default_params(), **(state.get("params") or {})}
-
-    # 取参
-    fee = float(P["amm_fee"]); max_trade_mult = float(P["max_trade_mult"])
-    alpha = float(P["redeem_alpha"]); max_frac = float(P["max_redeem_usd_frac"])
-    max_luna_mint_frac = float(P["max_luna_mint_frac_of_supply"])
-
-    bank_low = float(P["bankrun_low"]); bank_high = float(P["bankrun_high"])
-    t0 = float(P["bankrun_t0"]); tau = float(P["bankrun_tau"])
-    bank_max = float(P["max_bankrun_frac"])
-
-    beta_cex = float(P["arbitrage_to_cex_beta"])
-    rel_rate = float(P["luna_cex_release_rate"])
-
-    depth_ust0 = float(P["cex_depth_ust"]); depth_luna0 = float(P["cex_depth_luna"])
-    halflife = max(1.0, float(P["depth_halflife_steps"]))
-    coeff = float(P["impact_coeff"])
-    up_u, dn_u = float(P["max_log_up_ust"]), float(P["max_log_dn_ust"])
-    up_l, dn_l = float(P["max_log_up_luna"]), float(P["max_log_dn_luna"])
-
-    oracle_delay = int(P["oracle_delay"])
-
-    lfg_trigger = float(P["lfg_trigger"])
-    lfg_step = float(P["lfg_per_step_usd"])
-    lfg_eff = float(P["lfg_effectiveness"])
-    lfg_decay = float(P["lfg_effect_decay"])
-    lfg_cutoff = float(P["lfg_cutoff_depeg"])
-
-    drain_base = float(P["pool_drain_base"]); drain_slope = float(P["pool_drain_slope"])
-
-    ust_min = float(P["ust_min"]); ust_max = float(P["ust_max"])
-    luna_min = float(P["luna_min"]); luna_max = float(P["luna_max"])
-
-    # 状态
-    ust_price = float(state["ust_price"]); luna_price = float(state["luna_price"])
-    ust_supply = float(state["ust_supply"]); luna_supply = float(state["luna_supply"])
-    pool_ust = float(state.get("pool_ust", 5_000_000.0))
-    pool_luna = float(state.get("pool_luna", max(5_000_000.0 / max(luna_price, 1e-8), 1.0)))
+# ---------- 编译后的参数（只读） ----------
 
-    lfg_reserve = float(state.get("lfg_reserve_usd", 0.0))
-    lfg_reserve0 = float(state.get("lfg_reserve0", max(lfg_reserve, 1.0)))
+@dataclass(frozen=True)
+class ModelParams:
+    """
+    default_params() 合并、校验、类型转换后的只读参数对象。
+    每条路径只编译一次，之后每步直接复用；派生常数在这里预先算好。
+    """
+    amm_fee: float
+    max_trade_mult: float
+    redeem_alpha: float
+    max_redeem_usd_frac: float
+    max_luna_mint_frac_of_supply: float
+    bankrun_low: float
+    bankrun_high: float
+    bankrun_t0: float
+    bankrun_tau: float
+    max_bankrun_frac: float
+    luna_cex_release_rate: float
+    arbitrage_to_cex_beta: float
+    cex_depth_ust: float
+    cex_depth_luna: float
+    depth_halflife_steps: float
+    impact_coeff: float
+    max_log_up_ust: float
+    max_log_dn_ust: float
+    max_log_up_luna: float
+    max_log_dn_luna: float
+    oracle_delay: int
+    oracle_mode: str
+    oracle_window: int
+    lfg_trigger: float
+    lfg_per_step_usd: float
+    lfg_effectiveness: float
+    lfg_effect_decay: float
+    lfg_cutoff_depeg: float
+    pool_drain_base: float
+    pool_drain_slope: float
+    ust_min: float
+    ust_max: float
+    luna_min: float
+    luna_max: float
+
+    # 派生常数
+    inv_halflife: float = field(init=False, repr=False)
+    inv_tau: float = field(init=False, repr=False)
+    bank_span: float = field(init=False, repr=False)
+    max_mint_usd_frac: float = field(init=False, repr=False)
+    amm_frac: float = field(init=False, repr=False)
+    oracle_capacity: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        for f in fields(self):
+            if not f.init:
+                continue
+            cast = f.type if f.type in (int, str) else float
+            try:
+                v = cast(getattr(self, f.name))
+            except (TypeError, ValueError):
+                raise ValueError(f"参数 {f.name} 不是数值: {getattr(self, f.name)!r}")
+            if cast is float and math.isnan(v):
+                raise ValueError(f"参数 {f.name} 为 NaN")
+            object.__setattr__(self, f.name, v)
+        if self.oracle_delay < 0:
+            raise ValueError("oracle_delay 不能为负")
+        if self.oracle_mode not in ORACLE_MODES:
+            raise ValueError(f"oracle_mode 只能是 {ORACLE_MODES}")
+        if self.oracle_window < 1:
+            raise ValueError("oracle_window 至少为 1")
+        if self.ust_min > self.ust_max or self.luna_min > self.luna_max:
+            raise ValueError("价格硬边界 min > max")
+
+        derived = {
+            "inv_halflife": 1.0 / max(1.0, self.depth_halflife_steps),
+            "inv_tau": 1.0 / max(self.bankrun_tau, 1e-6),
+            "bank_span": self.bankrun_high - self.bankrun_low,
+            # 赎回单步上限 = max_redeem_usd_frac * 供应；增发为其 40%
+            "max_mint_usd_frac": 0.4 * self.max_redeem_usd_frac,
+            # 铸出的 LUNA 直接打 AMM 的比例
+            "amm_frac": 1 - self.arbitrage_to_cex_beta,
+            "oracle_capacity": ring_capacity(self.oracle_delay, self.oracle_window),
+        }
+        for k, v in derived.items():
+            object.__setattr__(self, k, v)
+        # 单步内核（闭包）随参数编译一次，compute_new_state 与快进内核每步直接复用
+        object.__setattr__(self, "kernel", step_kernel(self))
+
+    # 闭包不能 pickle（进程池会发送参数）：只发送字段，接收端重建内核
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != "kernel"}
+
+    def __setstate__(self, d):
+        self.__dict__.update(d)
+        object.__setattr__(self, "kernel", step_kernel(self))
+
+    def as_dict(self) -> Dict:
+        """只返回可输入的参数（与 default_params() 同键）"""
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+def compile_params(params: Union[None, Dict, ModelParams] = None) -> ModelParams:
+    """把参数字典（可只含部分键）与默认值合并并编译；已编译的对象原样返回"""
+    if isinstance(params, ModelParams):
+        return params
+    merged = {**default_params(), **(params or {})}
+    unknown = set(merged) - {f.name for f in fields(ModelParams) if f.init}
+    if unknown:
+        raise ValueError(f"未知参数: {sorted(unknown)}")
+    return ModelParams(**merged)
+
+def fork_state(state: Dict) -> Dict:
+    """
+    复制一份可独立推进的状态。compute_new_state 会原地推进预言机环形缓冲，
+    需要保留旧状态（快照、分叉）时先 fork；只复制定长缓冲，代价 O(oracle_delay)。
+    """
+    out = dict(state)
+    hist = out.get("luna_price_hist")
+    if isinstance(hist, PriceRing):
+        out["luna_price_hist"] = hist.copy()
+    elif hist is not None:
+        out["luna_price_hist"] = list(hist)
+    return out
 
-    # 抛压延迟队列（LUNA 数量）
-    pending_luna = float(state.get("pending_luna_cex", 0.0))
+# ---------- 主循环 ----------
 
-    # k0
-    pool_k0 = state.get("pool_k0")
-    if pool_k0 is None:
-        pool_k0 = pool_ust * pool_luna
+# ---------- 计时：同一份源码编译出带计时 / 不带计时两个版本 ----------
+#
+# 下面的 _profiled_* 函数用 lap(阶段) / hit(分支) 给计时器打点（lap, hit 取自 prof）。
+# 默认路径用的是 _without_profiling 从同一份源码删掉所有涉及 prof / lap / hit 的语句后
+# 重新编译的版本：运算逐行相同，但一条计时判断都不剩；只有打开计时器时才走带计时的版本。
+
+_PROFILING_NAMES = frozenset({"prof", "lap", "hit"})
+
+def _uses_profiler(node: ast.AST) -> bool:
+    return any(isinstance(n, ast.Name) and n.id in _PROFILING_NAMES for n in ast.walk(node))
+
+def _strip_profiling(stmts: List[ast.stmt]) -> List[ast.stmt]:
+    out = []
+    for st in stmts:
+        if isinstance(st, ast.If) and not _uses_profiler(st.test):
+            st.body, st.orelse = _strip_profiling(st.body), _strip_profiling(st.orelse)
+            if not st.body:
+                if not st.orelse:
+                    continue  # 只为计数而设的分支（条件都无副作用）
+                st.body = [ast.Pass()]
+        elif isinstance(st, (ast.FunctionDef, ast.For, ast.While, ast.With)):
+            st.body = _strip_profiling(st.body)
+        elif _uses_profiler(st):
+            continue
+        out.append(st)
+    return out
+
+def _without_profiling(fn, name: str):
+    """重新编译 fn：去掉计时语句，行号保持与源文件一致（报错栈指向原行）"""
+    lines, first = inspect.getsourcelines(fn)
+    tree = ast.parse(textwrap.dedent("".join(lines)))
+    ast.increment_lineno(tree, first - 1)
+    fdef = tree.body[0]
+    fdef.name = name
+    fdef.body = _strip_profiling(fdef.body)
+    ast.fix_missing_locations(tree)
+    ns: Dict = {}
+    exec(compile(tree, inspect.getsourcefile(fn), "exec"), fn.__globals__, ns)
+    return ns[name]
 
-    # 预言机
-    hist = state.get("luna_price_hist") or [luna_price]
-    hist.append(luna_price)
-    if len(hist) > 1024:
-        hist = hist[-1024:]
-    oracle_luna_price = hist[-(oracle_delay + 1)] if len(hist) > oracle_delay else luna_price
-
-    # 外部事件
-    ext_events = state.get("ext_events") or default_ext_events()
-    ust_net_flow_usd = 0.0; luna_net_flow_usd = 0.0
-    for ev in ext_events:
-        if step == int(ev.get("step", -1)) + int(ev.get("latency", 0)):
-            usd = float(ev.get("usd", 0.0)); typ = ev.get("type")
-            if   typ == "ust_sell":  ust_net_flow_usd  -= usd
-            elif typ == "ust_buy":   ust_net_flow_usd  += usd
-            elif typ == "luna_sell": luna_net_flow_usd -= usd
-            elif typ == "luna_buy":  luna_net_flow_usd += usd
+# ---------- 主循环 ----------
 
-    # 噪声
-    ust_price *= 1 + random.uniform(-0.001, 0.001)
-    luna_price *= 1 + random.uniform(-0.006, 0.006)
-
-    # 有效深度（时间衰减 + 脱锚衰减）
-    time_decay = 0.5 ** (step / halflife)
-    depeg_now = clamp(1.0 - ust_price, 0.0, 1.0)
-    depeg_decay = 0.7 + 0.3 * math.exp(-depeg_now / 0.15)  # 小脱锚时深度更高
-    depth_ust = max(1e5, depth_ust0 * time_decay * depeg_decay)
-    depth_luna = max(1e5, depth_luna0 * time_decay * depeg_decay)
-
-    # 银行挤兑强度（随时间拉升的 sigmoid）
-    bank_alpha = bank_low + (bank_high - bank_low) * (
-        1.0 / (1.0 + math.exp(-(step - t0) / max(tau, 1e-6)))
-    )
-    if ust_price < 1.0:
-        bank_usd = clamp(bank_alpha * depeg_now * ust_supply, 0.0, bank_max * ust_supply)
-        ust_price = bounded_impact_asym(ust_price, -bank_usd, depth_ust, coeff, up_u, dn_u)
-
-    # 赎回/增发
-    lfg_spent = 0.0; last_slip = 0.0
-    max_step_usd = max_frac * ust_supply
-
-    if ust_price < 1.0:
-        redeem_usd = clamp(alpha * depeg_now * ust_supply, 0.0, max_step_usd)
-        if redeem_usd > 0.0 and oracle_luna_price > 0.0:
-            ust_supply -= redeem_usd
-            minted_luna = min(redeem_usd / oracle_luna_price,
-                              max_luna_mint_frac * max(luna_supply, 1.0))
-            luna_supply += minted_luna
-
-            # 一部分打 AMM
-            dx_amm = (1 - beta_cex) * minted_luna
-            if dx_amm > 0:
-                dx_amm = min(dx_amm, pool_luna * 0.95)
-                _, new_luna, new_ust, _, slip = cpmm_swap_x_for_y(
-                    pool_luna, pool_ust, dx_amm, fee=fee, max_trade_mult=max_trade_mult
-                )
-                pool_luna, pool_ust = new_luna, new_ust
-                last_slip = slip
-
-            # 其余排队去 CEX
-            pending_luna += max(minted_luna - dx_amm, 0.0)
-
-    elif ust_price > 1.0:
-        overpeg = clamp(ust_price - 1.0, 0.0, 1.0)
-        mint_usd = clamp(alpha * overpeg * ust_supply, 0.0, 0.4 * max_step_usd)
-        if mint_usd > 0.0 and oracle_luna_price > 0.0:
-            burn_luna = min(mint_usd / oracle_luna_price, luna_supply * 0.06)
-            luna_supply -= burn_luna
-            ust_supply += mint_usd
-            dx = min(mint_usd, pool_ust * 0.95)
-            _, new_ust, new_luna, _, slip = cpmm_swap_x_for_y(
-                pool_ust, pool_luna, dx, fee=fee, max_trade_mult=max_trade_mult
-            )
-            pool_ust, pool_luna = new_ust, new_luna
-            last_slip = slip
-
-    # LFG：小〜中等脱锚时出手力度大；深度脱锚停止
-    if ust_price < lfg_trigger and lfg_reserve > 0.0:
-        depeg = depeg_now
-        if depeg < lfg_cutoff:
-            # depeg 越大，front_mult 越大（但封顶）
-            front_mult = 1.0 + 3.0 * (depeg / 0.25) ** 1.2
-            front_mult = clamp(front_mult, 1.0, 4.0)
-            spend = min(lfg_step * front_mult, lfg_reserve)
-            if spend > 0:
-                lfg_reserve -= spend
-                lfg_spent = spend
-                eff = lfg_eff * ((lfg_reserve / lfg_reserve0) ** lfg_decay)
-                ust_price = bounded_impact_asym(
-                    ust_price, eff * spend, depth_ust, coeff, up_u, dn_u
+def step_kernel(P: ModelParams, prof=None):
+    """
+    返回 P 下单步递推的内核 step(...)，compute_new_state 与快进内核
+    （backend.fastforward）共用，两条路径的逐步运算因此逐位相同。
+    ModelParams 编译时建一次不带计时的版本存为 P.kernel，不要每步重建；
+    prof 为计时器时返回带计时的版本（PhaseProfiler.kernel 按参数缓存）。
+
+    step(step, ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+         lfg_reserve, lfg_reserve0, pending_luna, oracle_luna_price,
+         eps_ust, eps_luna, ust_flow, luna_flow)
+    从施加噪声算到硬边界，返回 (ust_price, luna_price, ust_supply, luna_supply,
+    pool_ust, pool_luna, lfg_reserve, pending_luna, lfg_spent, last_slip)，
+    供应量与 CEX 队列已截到非负。参数只在这里解包一次，闭包里按局部量读取。
+    """
+    if prof is None:
+        return _plain_step_kernel(P, None)
+    return _profiled_step_kernel(P, prof)
+
+def _profiled_step_kernel(P: ModelParams, prof):
+    """step_kernel 的源码（带计时）；_plain_step_kernel 由它去掉计时语句编译而来"""
+    lap, hit = prof.lap, prof.hit
+
+    fee = P.amm_fee; max_trade_mult = P.max_trade_mult
+    alpha = P.redeem_alpha; max_frac = P.max_redeem_usd_frac
+    max_luna_mint_frac = P.max_luna_mint_frac_of_supply
+    max_mint_frac = P.max_mint_usd_frac
+
+    bank_low = P.bankrun_low; bank_span = P.bank_span
+    t0 = P.bankrun_t0; inv_tau = P.inv_tau
+    bank_max = P.max_bankrun_frac
+
+    amm_frac = P.amm_frac
+    rel_rate = P.luna_cex_release_rate
+
+    depth_ust0 = P.cex_depth_ust; depth_luna0 = P.cex_depth_luna
+    inv_halflife = P.inv_halflife
+    coeff = P.impact_coeff
+    up_u, dn_u = P.max_log_up_ust, P.max_log_dn_ust
+    up_l, dn_l = P.max_log_up_luna, P.max_log_dn_luna
+
+    lfg_trigger = P.lfg_trigger
+    lfg_step = P.lfg_per_step_usd
+    lfg_eff = P.lfg_effectiveness
+    lfg_decay = P.lfg_effect_decay
+    lfg_cutoff = P.lfg_cutoff_depeg
+
+    drain_base = P.pool_drain_base; drain_slope = P.pool_drain_slope
+
+    ust_min = P.ust_min; ust_max = P.ust_max
+    luna_min = P.luna_min; luna_max = P.luna_max
+
+    exp = math.exp
+    impact = bounded_impact_asym
+    swap = cpmm_swap_x_for_y
+
+    def step_fn(step, ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+                lfg_reserve, lfg_reserve0, pending_luna, oracle_luna_price,
+                eps_ust, eps_luna, ust_flow, luna_flow):
+        # 噪声
+        ust_price *= 1 + eps_ust
+        luna_price *= 1 + eps_luna
+        lap("noise")
+
+        # 有效深度（时间衰减 + 脱锚衰减）
+        time_decay = 0.5 ** (step * inv_halflife)
+        depeg_now = max(0.0, min(1.0, 1.0 - ust_price))
+        depeg_decay = 0.7 + 0.3 * exp(-depeg_now / 0.15)  # 小脱锚时深度更高
+        depth_ust = max(1e5, depth_ust0 * time_decay * depeg_decay)
+        depth_luna = max(1e5, depth_luna0 * time_decay * depeg_decay)
+        lap("depth")
+
+        # 银行挤兑强度（随时间拉升的 sigmoid）
+        bank_alpha = bank_low + bank_span * (
+            1.0 / (1.0 + exp(-(step - t0) * inv_tau))
+        )
+        if ust_price < 1.0:
+            bank_usd = max(0.0, min(bank_max * ust_supply, bank_alpha * depeg_now * ust_supply))
+            ust_price = impact(ust_price, -bank_usd, depth_ust, coeff, up_u, dn_u)
+            hit("bank_run")
+        lap("bank_run")
+
+        # 赎回/增发
+        lfg_spent = 0.0; last_slip = 0.0
+        if ust_price < 1.0:
+            redeem_usd = max(0.0, min(max_frac * ust_supply, alpha * depeg_now * ust_supply))
+            if redeem_usd > 0.0 and oracle_luna_price > 0.0:
+                hit("redeem")
+                ust_supply -= redeem_usd
+                minted_luna = min(redeem_usd / oracle_luna_price,
+                                  max_luna_mint_frac * max(luna_supply, 1.0))
+                luna_supply += minted_luna
+
+                # 一部分打 AMM
+                dx_amm = amm_frac * minted_luna
+                if dx_amm > 0:
+                    dx_amm = min(dx_amm, pool_luna * 0.95)
+                    _, pool_luna, pool_ust, _, last_slip = swap(
+                        pool_luna, pool_ust, dx_amm, fee=fee, max_trade_mult=max_trade_mult
+                    )
+                    hit("amm_swap")
+
+                # 其余排队去 CEX
+                pending_luna += max(minted_luna - dx_amm, 0.0)
+
+        elif ust_price > 1.0:
+            overpeg = max(0.0, min(1.0, ust_price - 1.0))
+            mint_usd = max(0.0, min(max_mint_frac * ust_supply, alpha * overpeg * ust_supply))
+            if mint_usd > 0.0 and oracle_luna_price > 0.0:
+                hit("mint")
+                hit("amm_swap")
+                burn_luna = min(mint_usd / oracle_luna_price, luna_supply * 0.06)
+                luna_supply -= burn_luna
+                ust_supply += mint_usd
+                dx = min(mint_usd, pool_ust * 0.95)
+                _, pool_ust, pool_luna, _, last_slip = swap(
+                    pool_ust, pool_luna, dx, fee=fee, max_trade_mult=max_trade_mult
                 )
+        lap("redeem_mint")
+
+        # LFG：小〜中等脱锚时出手力度大；深度脱锚停止
+        if ust_price < lfg_trigger and lfg_reserve > 0.0:
+            depeg = depeg_now
+            if depeg < lfg_cutoff:
+                # depeg 越大，front_mult 越大（但封顶）
+                front_mult = 1.0 + 3.0 * (depeg / 0.25) ** 1.2
+                front_mult = max(1.0, min(4.0, front_mult))
+                spend = min(lfg_step * front_mult, lfg_reserve)
+                if spend > 0:
+                    lfg_reserve -= spend
+                    lfg_spent = spend
+                    eff = lfg_eff * ((lfg_reserve / lfg_reserve0) ** lfg_decay)
+                    ust_price = impact(ust_price, eff * spend, depth_ust, coeff, up_u, dn_u)
+                    hit("lfg")
+        lap("lfg")
+
+        # CEX 抛压队列释放
+        if pending_luna > 0:
+            sell_qty = rel_rate * pending_luna
+            pending_luna -= sell_qty
+            luna_price = impact(luna_price, -(sell_qty * luna_price), depth_luna, coeff, up_l, dn_l)
+            hit("cex_release")
+        lap("cex_release")
+
+        # 外部事件
+        if ust_flow:
+            ust_price = impact(ust_price, ust_flow, depth_ust, coeff, up_u, dn_u)
+        if luna_flow:
+            luna_price = impact(luna_price, luna_flow, depth_luna, coeff, up_l, dn_l)
+        if ust_flow or luna_flow:
+            hit("event_impact")
+        lap("event_impact")
+
+        # 撤池：UST < 1 时逐步撤流动性
+        if ust_price < 1.0:
+            drain = max(0.0, min(0.25, drain_base + drain_slope * depeg_now))
+            pool_ust *= (1 - drain); pool_luna *= (1 - drain)
+            hit("drain")
+        lap("drain")
 
-    # CEX 抛压队列释放
-    if pending_luna > 0:
-        sell_qty = rel_rate * pending_luna
-        pending_luna -= sell_qty
-        luna_price = bounded_impact_asym(
-            luna_price, -(sell_qty * luna_price), depth_luna, coeff, up_l, dn_l
-        )
+        # 硬边界
+        ust_price = max(ust_min, min(ust_max, ust_price))
+        luna_price = max(luna_min, min(luna_max, luna_price))
 
-    # 外部事件
-    if ust_net_flow_usd:
-        ust_price = bounded_impact_asym(ust_price, ust_net_flow_usd, depth_ust, coeff, up_u, dn_u)
-    if luna_net_flow_usd:
-        luna_price = bounded_impact_asym(luna_price, luna_net_flow_usd, depth_luna, coeff, up_l, dn_l)
+        return (ust_price, luna_price, max(ust_supply, 0.0), max(luna_supply, 0.0),
+                pool_ust, pool_luna, lfg_reserve, max(pending_luna, 0.0), lfg_spent, last_slip)
 
-    # 撤池：UST < 1 时逐步撤流动性
-    if ust_price < 1.0:
-        drain = clamp(drain_base + drain_slope * depeg_now, 0.0, 0.25)
-        pool_ust *= (1 - drain); pool_luna *= (1 - drain)
+    return step_fn
 
-    # 硬边界
-    ust_price = clamp(ust_price, ust_min, ust_max)
-    luna_price = clamp(luna_price, luna_min, luna_max)
+_plain_step_kernel = _without_profiling(_profiled_step_kernel, "_plain_step_kernel")
 
-    # 指标
+def pack_state(P: ModelParams, ext_events: EventSchedule, hist: PriceRing,
+               pool_k0: float, lfg_reserve0: float,
+               ust_price: float, luna_price: float, ust_supply: float, luna_supply: float,
+               pool_ust: float, pool_luna: float, lfg_reserve: float, pending_luna: float,
+               lfg_spent: float, last_slip: float) -> Dict:
+    """由 step_kernel 的输出组装状态 dict，并计算各项指标（只依赖该步末的状态）"""
     amm_luna_price_ust = pool_ust / pool_luna if pool_luna > 0 else float("inf")
     amm_luna_price_usd = amm_luna_price_ust * ust_price
     spread_ust = ust_price - 1.0
@@ -279,12 +468,12 @@ def compute_new_state(state: Dict, step: int = 1) -> Dict:
 
     return {
         "ust_price": ust_price, "luna_price": luna_price,
-        "ust_supply": max(ust_supply, 0.0), "luna_supply": max(luna_supply, 0.0),
+        "ust_supply": ust_supply, "luna_supply": luna_supply,
 
         "pool_ust": pool_ust, "pool_luna": pool_luna, "pool_k0": pool_k0,
         "lfg_reserve_usd": lfg_reserve, "lfg_reserve0": lfg_reserve0,
         "luna_price_hist": hist,
-        "pending_luna_cex": max(pending_luna, 0.0),
+        "pending_luna_cex": pending_luna,
 
         "amm_luna_price_ust": amm_luna_price_ust,
         "amm_luna_price_usd": amm_luna_price_usd,
@@ -294,4 +483,87 @@ def compute_new_state(state: Dict, step: int = 1) -> Dict:
         "pool_k": pool_k, "pool_k_rel": pool_k_rel, "pool_ust_share": pool_ust_share,
 
         "params": P, "ext_events": ext_events,
-    }
\ No newline at end of file
+    }
+
+def compute_new_state(state: Dict, step: int = 1,
+                      noise: Optional[Tuple[float, float]] = None,
+                      rng: Optional[NoiseStream] = None) -> Dict:
+    """
+    推进一步。noise = (eps_ust, eps_luna) 为本步的相对价格噪声；
+    不传时从 rng（可复现的 NoiseStream）抽取，两者都不传则用全局 random，
+    按 U(-0.1%, 0.1%) / U(-0.6%, 0.6%) 抽取。
+
+    注意：预言机环形缓冲（luna_price_hist 为 PriceRing 时）原地推进，返回的状态与输入状态
+    共用同一个缓冲，调用后输入状态就不能再用于推进或读取预言机历史。
+    需要保留输入状态（快照、分叉、同一状态试多组参数）时先 fork_state(state)。
+    """
+    if _profiler is not None:
+        return _profiled_compute_new_state(state, step, noise, rng, _profiler)
+    return _compute_new_state(state, step, noise, rng, None)
+
+def _profiled_compute_new_state(state: Dict, step: int, noise: Optional[Tuple[float, float]],
+                                rng: Optional[NoiseStream], prof) -> Dict:
+    """compute_new_state 的源码（带计时）；_compute_new_state 由它去掉计时语句编译而来"""
+    lap, hit = prof.lap, prof.hit
+    prof.begin(step)
+
+    P = state.get("params")
+    if not isinstance(P, ModelParams):
+        P = compile_params(P)
+        hit("params_compiled")
+    kernel = P.kernel
+    kernel = prof.kernel(P)  # 带计时的内核（按参数缓存）；默认版本里这一行被删掉
+
+    # 状态
+    ust_price = float(state["ust_price"]); luna_price = float(state["luna_price"])
+    ust_supply = float(state["ust_supply"]); luna_supply = float(state["luna_supply"])
+    pool_ust = float(state.get("pool_ust", 5_000_000.0))
+    pool_luna = float(state.get("pool_luna", max(5_000_000.0 / max(luna_price, 1e-8), 1.0)))
+
+    lfg_reserve = float(state.get("lfg_reserve_usd", 0.0))
+    lfg_reserve0 = float(state.get("lfg_reserve0", max(lfg_reserve, 1.0)))
+
+    # 抛压延迟队列（LUNA 数量）
+    pending_luna = float(state.get("pending_luna_cex", 0.0))
+
+    # k0
+    pool_k0 = state.get("pool_k0")
+    if pool_k0 is None:
+        pool_k0 = pool_ust * pool_luna
+    lap("params")
+
+    # 预言机（环形缓冲：原地 O(1) 写入，旧版 list 只读取、不修改）
+    hist = state.get("luna_price_hist")
+    if not isinstance(hist, PriceRing) or hist.cap < P.oracle_capacity:
+        prev = hist.tolist() if isinstance(hist, PriceRing) else hist
+        hist = PriceRing.from_values(prev or [luna_price], P.oracle_capacity)
+        hit("oracle_rebuilt")
+    hist.push(luna_price)
+    oracle_luna_price = hist.oracle(P.oracle_delay, P.oracle_mode, P.oracle_window, luna_price)
+    lap("oracle")
+
+    # 外部事件（预编译的触发步索引，O(1) 查询）
+    ext_events = state.get("ext_events")
+    if not isinstance(ext_events, EventSchedule):
+        ext_events = compile_events(ext_events)
+        hit("events_compiled")
+    ust_net_flow_usd, luna_net_flow_usd = ext_events.flows(step)
+    lap("events")
+
+    # 噪声
+    if noise is None:
+        if rng is not None:
+            noise = rng.next_pair()
+        else:
+            noise = (random.uniform(-UST_NOISE, UST_NOISE),
+                     random.uniform(-LUNA_NOISE, LUNA_NOISE))
+
+    # 噪声 → 深度 → 挤兑 → 赎回/增发 → LFG → CEX 释放 → 事件冲击 → 撤池 → 硬边界
+    out = pack_state(P, ext_events, hist, pool_k0, lfg_reserve0, *kernel(
+        step, ust_price, luna_price, ust_supply, luna_supply, pool_ust, pool_luna,
+        lfg_reserve, lfg_reserve0, pending_luna, oracle_luna_price,
+        noise[0], noise[1], ust_net_flow_usd, luna_net_flow_usd))
+    prof.end()
+    return out
+
+_compute_new_state = _without_profiling(_profiled_compute_new_state, "_compute_new_state")
\ No newline at end of file
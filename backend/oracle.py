@@ -0,0 +1,127 @@
+# backend/oracle.py
+"""
+预言机价格历史：预分配的定长环形缓冲。
+
+push / 延迟查询均为 O(1)，从不复制历史；TWAP / 中位数只读窗口内的样本。
+PriceRing 用于单条路径（array 存储），PriceRingBatch 用于批量引擎（N×cap 数组）。
+"""
+from array import array
+from statistics import median
+from typing import Iterable
+
+import numpy as np
+
+ORACLE_MODES = ("spot", "twap", "median")
+
+def ring_capacity(oracle_delay: int, oracle_window: int = 1) -> int:
+    """延迟 d、窗口 w 的预言机需要保留的样本数"""
+    return max(int(oracle_delay), 0) + max(int(oracle_window), 1)
+
+class PriceRing:
+    """单路径环形缓冲：count 为累计写入次数，head 为下一次写入位置"""
+    __slots__ = ("buf", "cap", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.cap = max(int(capacity), 1)
+        self.buf = array("d", bytes(8 * self.cap))
+        self.head = 0
+        self.count = 0
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], capacity: int) -> "PriceRing":
+        """用已有历史（旧版 list）初始化，只保留最后 capacity 个，不改动原 list"""
+        ring = cls(capacity)
+        values = list(values)
+        for v in values[-ring.cap:]:
+            ring.push(v)
+        ring.count = len(values)
+        return ring
+
+    def push(self, x: float) -> None:
+        self.buf[self.head] = x
+        self.head = (self.head + 1) % self.cap
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.cap)
+
+    def lag(self, k: int) -> float:
+        """k 步之前的值（k=0 为最新）；调用方保证 k < len(self)"""
+        return self.buf[(self.head - 1 - k) % self.cap]
+
+    def oracle(self, delay: int, mode: str = "spot", window: int = 1,
+               fallback: float = 0.0) -> float:
+        """
+        延迟 delay 步的预言机价格。历史不足 delay+1 个样本时返回 fallback；
+        twap / median 取 [delay, delay+window) 区间内已有的样本。
+        """
+        if self.count <= delay:
+            return fallback
+        if mode == "spot" or window <= 1:
+            return self.lag(delay)
+        n = min(window, len(self) - delay)
+        buf, cap, base = self.buf, self.cap, self.head - 1 - delay
+        if mode == "twap":
+            s = 0.0
+            for i in range(n):
+                s += buf[(base - i) % cap]
+            return s / n
+        return median(buf[(base - i) % cap] for i in range(n))
+
+    def copy(self) -> "PriceRing":
+        out = PriceRing.__new__(PriceRing)
+        out.buf = array("d", self.buf)
+        out.cap, out.head, out.count = self.cap, self.head, self.count
+        return out
+
+    def tolist(self):
+        """按时间顺序（旧 -> 新）导出"""
+        return [self.lag(k) for k in range(len(self) - 1, -1, -1)]
+
+class PriceRingBatch:
+    """批量引擎用：(n_paths, cap) 环形缓冲，所有路径共享 head / count"""
+    __slots__ = ("buf", "cap", "head", "count")
+
+    def __init__(self, n_paths: int, capacity: int):
+        self.cap = max(int(capacity), 1)
+        self.buf = np.zeros((n_paths, self.cap), dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], n_paths: int,
+                    capacity: int) -> "PriceRingBatch":
+        ring = cls(n_paths, capacity)
+        values = list(values)
+        for v in values[-ring.cap:]:
+            ring.push(v)
+        ring.count = len(values)
+        return ring
+
+    def push(self, x) -> None:
+        self.buf[:, self.head] = x
+        self.head = (self.head + 1) % self.cap
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.cap)
+
+    def oracle(self, delay: int, mode: str = "spot", window: int = 1, fallback=None):
+        if self.count <= delay:
+            return fallback
+        if mode == "spot" or window <= 1:
+            return self.buf[:, (self.head - 1 - delay) % self.cap]
+        n = min(window, len(self) - delay)
+        idx = (self.head - 1 - delay - np.arange(n)) % self.cap
+        win = self.buf[:, idx]
+        return win.mean(axis=1) if mode == "twap" else np.median(win, axis=1)
+
+    def take(self, idx) -> "PriceRingBatch":
+        """取出部分路径（返回副本）"""
+        out = PriceRingBatch.__new__(PriceRingBatch)
+        out.buf = self.buf[idx].copy()
+        out.cap, out.head, out.count = self.cap, self.head, self.count
+        return out
+
+    def copy(self) -> "PriceRingBatch":
+        return self.take(slice(None))
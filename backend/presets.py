@@ -0,0 +1,112 @@
+# backend/presets.py
+"""
+预设场景：初始状态 + 外部事件 + 参数。前端、命令行和批量工具共用。
+"""
+import json
+import os
+from typing import Callable, Dict
+
+from backend.model import compile_params
+
+# ================= Terra May 2022 preset (v4 params) =================
+def terra_may_2022_preset() -> dict:
+    state = {
+        "ust_supply": 18_000_000_000.0,
+        "luna_supply": 350_000_000.0,
+        "ust_price": 1.0,
+        "luna_price": 80.0,
+        # AMM pool: initial marginal price ≈ CEX
+        "pool_ust": 800_000_000.0,
+        "pool_luna": 800_000_000.0 / 80.0,
+        # LFG reserve
+        "lfg_reserve_usd": 2_000_000_000.0,
+        "lfg_reserve0": 2_000_000_000.0,
+        "luna_price_hist": [80.0],
+        # External shocks: moderate, mainly to trigger de-peg
+        "ext_events": [
+            {"step": 20, "type": "ust_sell", "usd": 250_000_000, "latency": 0},
+            {"step": 28, "type": "ust_sell", "usd": 300_000_000, "latency": 0},
+            {"step": 36, "type": "luna_sell", "usd": 200_000_000, "latency": 0},
+            {"step": 48, "type": "ust_sell", "usd": 600_000_000, "latency": 0},
+            {"step": 60, "type": "ust_sell", "usd": 900_000_000, "latency": 0},
+            {"step": 80, "type": "luna_sell", "usd": 300_000_000, "latency": 0},
+            {"step": 110, "type": "ust_sell", "usd": 1_500_000_000, "latency": 0},
+        ],
+        # v4 parameters (must be in sync with backend.model.default_params);
+        # compiled once into a read-only ModelParams reused by every step
+        "params": compile_params({
+            "amm_fee": 0.003,
+            "max_trade_mult": 8.0,
+            # Redemption / expansion: conservative, slows LUNA supply explosion
+            "redeem_alpha": 0.04,
+            "max_redeem_usd_frac": 0.03,
+            "max_luna_mint_frac_of_supply": 0.30,
+            # Bank run (strength increases over time)
+            "bankrun_low": 0.0,
+            "bankrun_high": 0.06,
+            "bankrun_t0": 150,
+            "bankrun_tau": 45,
+            "max_bankrun_frac": 0.04,
+            # Delayed sell queue (LUNA -> CEX)
+            "luna_cex_release_rate": 0.25,
+            "arbitrage_to_cex_beta": 0.80,
+            # CEX depth & impact limits
+            "cex_depth_ust": 80_000_000.0,
+            "cex_depth_luna": 80_000_000.0,
+            "depth_halflife_steps": 800,
+            "impact_coeff": 0.8,
+            "max_log_up_ust": 0.12,
+            "max_log_dn_ust": 0.18,
+            "max_log_up_luna": 0.22,
+            "max_log_dn_luna": 0.40,
+            # Oracle delay / pricing (spot | twap | median over oracle_window)
+            "oracle_delay": 10,
+            "oracle_mode": "spot",
+            "oracle_window": 1,
+            # LFG: intervenes on small/mid depegs, stops on deep depeg
+            "lfg_trigger": 0.997,
+            "lfg_per_step_usd": 400_000_000.0,
+            "lfg_effectiveness": 0.35,
+            "lfg_effect_decay": 0.6,
+            "lfg_cutoff_depeg": 0.45,
+            # LP withdrawal
+            "pool_drain_base": 0.002,
+            "pool_drain_slope": 0.020,
+            # Hard bounds
+            "ust_min": 1e-3,
+            "ust_max": 1.02,
+            "luna_min": 1e-8,
+            "luna_max": 5e4,
+        }),
+    }
+    return state
+
+PRESETS: Dict[str, Callable[[], dict]] = {
+    "terra": terra_may_2022_preset,
+}
+
+def get_preset(name: str) -> dict:
+    try:
+        return PRESETS[name]()
+    except KeyError:
+        raise ValueError(f"未知预设: {name!r}，可选 {sorted(PRESETS)}")
+
+def load_scenario(spec: str) -> dict:
+    """
+    预设名或 JSON 场景文件。文件格式：
+        {"preset": "terra", "params": {...部分参数...}, "ext_events": [...], 其余键覆盖初始状态}
+    params 在所选预设的参数之上覆盖；省略 preset 时以 terra 为基准。
+    meta 只是说明信息（例如 backend.calibrate 记录的拟合误差），不进入状态。
+    """
+    if spec in PRESETS:
+        return get_preset(spec)
+    if not os.path.exists(spec):
+        raise ValueError(f"既不是预设名也不是文件: {spec!r}")
+    with open(spec) as f:
+        cfg = json.load(f)
+    cfg.pop("meta", None)
+    state = get_preset(cfg.pop("preset", "terra"))
+    overrides = cfg.pop("params", None) or {}
+    state.update(cfg)
+    state["params"] = compile_params({**compile_params(state.get("params")).as_dict(), **overrides})
+    return state
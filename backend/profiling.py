@@ -0,0 +1,163 @@
+# backend/profiling.py
+"""
+compute_new_state 的分阶段计时与分支计数（可选，默认关闭）。
+
+关闭时 compute_new_state 走去掉了计时语句的版本（model._without_profiling），没有任何开销；
+打开后改走带计时的版本，记录：
+  - 每个阶段的累计耗时（perf_counter_ns）；
+  - 分支命中次数：赎回 / 增发、AMM 成交、LFG 出手、CEX 释放、外部事件冲击、撤池等；
+  - 一次性分配：参数 / 事件表临时编译、预言机缓冲重建；allocations=True 时
+    再按阶段统计新增的内存块数（sys.getallocatedblocks 差值，每阶段约 0.4 µs 额外开销）。
+
+    with profile(trace=True) as prof:
+        run_simulation(get_preset("terra"), 10_000, seed=0)
+    print(prof.format())
+    prof.write_trace("trace.json")   # Chrome trace 格式，Perfetto / speedscope 可直接打开
+
+    python -m backend.profiling --steps 10000 --seed 0 --trace trace.json
+
+计时器是进程内全局的（进程池里的 worker 各自独立），不要在多个线程里同时打开。
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from backend import model
+
+PHASES = ("params", "oracle", "events", "noise", "depth", "bank_run", "redeem_mint",
+          "lfg", "cex_release", "event_impact", "drain", "metrics")
+
+class PhaseProfiler:
+    """由 compute_new_state 调用：begin(step)，每个阶段结束时 lap(阶段)，分支里 hit(名称)"""
+
+    def __init__(self, allocations: bool = False, trace: bool = False):
+        self.allocations = allocations
+        self.time_ns: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.blocks: Dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.steps = 0
+        # (阶段, 开始 ns, 时长 ns, step)；阶段为 None 表示整步
+        self.events: Optional[List[Tuple[Optional[str], int, int, int]]] = [] if trace else None
+        self._t = self._start = 0
+        self._b = 0
+        self._step = 0
+        self._kernels: Dict[int, Tuple[model.ModelParams, object]] = {}
+
+    def kernel(self, P: "model.ModelParams"):
+        """P 的带计时单步内核；每组参数只建一次（同时持有 P，id 不会被复用）"""
+        entry = self._kernels.get(id(P))
+        if entry is None:
+            entry = self._kernels[id(P)] = (P, model.step_kernel(P, self))
+        return entry[1]
+
+    def begin(self, step: int) -> None:
+        self._step = step
+        if self.allocations:
+            self._b = sys.getallocatedblocks()
+        self._t = self._start = time.perf_counter_ns()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter_ns()
+        self.time_ns[phase] += now - self._t
+        if self.events is not None:
+            self.events.append((phase, self._t, now - self._t, self._step))
+        if self.allocations:
+            b = sys.getallocatedblocks()
+            self.blocks[phase] += b - self._b
+            self._b = b
+        self._t = time.perf_counter_ns() if self.allocations else now
+
+    def hit(self, name: str) -> None:
+        self.counts[name] += 1
+
+    def end(self) -> None:
+        """最后一个阶段（metrics）结束，记一整步"""
+        self.lap("metrics")
+        self.steps += 1
+        if self.events is not None:
+            self.events.append((None, self._start, self._t - self._start, self._step))
+
+    # ----- 结果 -----
+
+    def report(self) -> Dict:
+        total = sum(self.time_ns.values())
+        n = max(self.steps, 1)
+        phases = {p: {"total_s": t / 1e9, "per_step_us": t / 1e3 / n,
+                      "share": t / total if total else 0.0}
+                  for p, t in self.time_ns.items()}
+        if self.allocations:
+            for p in PHASES:
+                phases[p]["alloc_blocks_per_step"] = self.blocks[p] / n
+        return {"steps": self.steps, "total_s": total / 1e9,
+                "per_step_us": total / 1e3 / n, "phases": phases,
+                "counts": dict(sorted(self.counts.items())),
+                "rates": {k: v / n for k, v in sorted(self.counts.items())}}
+
+    def format(self) -> str:
+        r = self.report()
+        alloc = self.allocations
+        lines = [f"{r['steps']} 步，合计 {r['total_s'] * 1e3:.1f} ms，每步 {r['per_step_us']:.2f} µs",
+                 f"{'phase':<14}{'µs/step':>9}{'share':>8}" + (f"{'blocks/step':>13}" if alloc else "")]
+        for p, d in sorted(r["phases"].items(), key=lambda kv: -kv[1]["total_s"]):
+            lines.append(f"{p:<14}{d['per_step_us']:>9.3f}{d['share']:>8.1%}"
+                         + (f"{d['alloc_blocks_per_step']:>13.2f}" if alloc else ""))
+        lines.append(f"{'branch':<14}{'hits':>9}{'rate':>8}")
+        for k, v in r["counts"].items():
+            lines.append(f"{k:<14}{v:>9}{r['rates'][k]:>8.1%}")
+        return "\n".join(lines)
+
+    def trace_events(self) -> List[Dict]:
+        """Chrome trace 事件（"X" 完整事件，微秒）；整步为外层，阶段嵌套在内"""
+        if self.events is None:
+            raise ValueError("创建时没有打开 trace")
+        t0 = self.events[0][1] if self.events else 0
+        return [{"name": phase or "compute_new_state", "cat": "step" if phase is None else "phase",
+                 "ph": "X", "ts": (start - t0) / 1e3, "dur": dur / 1e3, "pid": 1, "tid": 1,
+                 "args": {"step": step}}
+                for phase, start, dur, step in self.events]
+
+    def write_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ns"}, f)
+
+@contextlib.contextmanager
+def profile(allocations: bool = False, trace: bool = False) -> Iterator[PhaseProfiler]:
+    """在 with 块内给 compute_new_state 挂上计时器，退出时恢复原状"""
+    prof = PhaseProfiler(allocations, trace)
+    prev, model._profiler = model._profiler, prof
+    try:
+        yield prof
+    finally:
+        model._profiler = prev
+
+def main(argv=None):
+    from backend.presets import PRESETS, load_scenario
+    from backend.runner import run_simulation
+
+    ap = argparse.ArgumentParser(description="compute_new_state 分阶段计时 / 分支计数")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    src.add_argument("--scenario", help="预设名或 JSON 场景文件")
+    ap.add_argument("--steps", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--allocations", action="store_true", help="按阶段统计新增内存块")
+    ap.add_argument("--trace", default=None, help="Chrome trace JSON（Perfetto / speedscope）")
+    ap.add_argument("--json", default=None, help="把结构化报告写入该文件")
+    args = ap.parse_args(argv)
+
+    with profile(args.allocations, trace=bool(args.trace)) as prof:
+        run_simulation(load_scenario(args.scenario or args.preset), args.steps, seed=args.seed)
+    print(prof.format())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(prof.report(), f, indent=2)
+    if args.trace:
+        prof.write_trace(args.trace)
+        print(f"✅ trace 已写入 {args.trace}（{len(prof.events)} 个事件）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# backend/publish.py
+"""
+链上价格发布策略（与真实预言机喂价一样）：只有价格相对上次发布值偏离超过 deadband，
+或距上次发布已满 heartbeat 步时才发送，其余步只计数不发交易。
+
+被抑制的步里链上价格（上次发布值）与模拟价格的相对偏差都不超过 deadband。
+
+    python -m backend.publish --deadband 0.005 --heartbeat 100 --steps 500 --seed 7
+"""
+import argparse
+from typing import Iterable, Optional, Tuple
+
+class DeadbandPolicy:
+    """
+    deadband 为相对偏离阈值（0.005 = 0.5%），0 表示价格有任何变化就发送；
+    heartbeat 为最长发布间隔（步），None 表示不强制。
+    """
+
+    def __init__(self, deadband: float = 0.005, heartbeat: Optional[int] = 100):
+        if deadband < 0:
+            raise ValueError("deadband 不能为负")
+        if heartbeat is not None and heartbeat < 1:
+            raise ValueError("heartbeat 至少为 1 步")
+        self.deadband = float(deadband)
+        self.heartbeat = heartbeat
+        self.last_price: Optional[float] = None
+        self.last_step: Optional[int] = None
+        self.sent = 0
+        self.suppressed = 0
+        self.by_deviation = 0
+        self.by_heartbeat = 0
+        self.max_deviation = 0.0  # 被抑制的步里链上价格的最大相对偏差
+
+    def deviation(self, price: float) -> float:
+        if self.last_price is None:
+            return float("inf")
+        if self.last_price == 0.0:
+            return 0.0 if price == 0.0 else float("inf")
+        return abs(price - self.last_price) / abs(self.last_price)
+
+    def should_publish(self, step: int, price: float) -> bool:
+        """判断第 step 步的价格是否发送；返回 True 时视为已发布并更新基准"""
+        dev = self.deviation(price)
+        if dev > self.deadband:
+            self.by_deviation += 1
+        elif self.heartbeat is not None and step - self.last_step >= self.heartbeat:
+            self.by_heartbeat += 1
+        else:
+            self.suppressed += 1
+            self.max_deviation = max(self.max_deviation, dev)
+            return False
+        self.last_price = price
+        self.last_step = step
+        self.sent += 1
+        return True
+
+    def stats(self) -> dict:
+        total = self.sent + self.suppressed
+        return {"sent": self.sent, "suppressed": self.suppressed,
+                "by_deviation": self.by_deviation, "by_heartbeat": self.by_heartbeat,
+                "send_ratio": self.sent / total if total else 0.0,
+                "max_deviation": self.max_deviation}
+
+def replay(prices: Iterable[Tuple[int, float]], policy: DeadbandPolicy) -> DeadbandPolicy:
+    """离线回放一段 (step, price) 序列，返回计数后的策略"""
+    for step, price in prices:
+        policy.should_publish(step, price)
+    return policy
+
+def main(argv=None):
+    from backend.presets import PRESETS, load_scenario
+    from backend.rng import NoiseStream
+    from backend.runner import iter_simulation
+
+    ap = argparse.ArgumentParser(description="deadband / heartbeat 发布策略的离线评估")
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    ap.add_argument("--steps", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--deadband", type=float, default=0.005)
+    ap.add_argument("--heartbeat", type=int, default=100)
+    ap.add_argument("--split", type=int, default=None,
+                    help="分段统计：第 split 步之前 / 之后（如危机前的平稳期）")
+    args = ap.parse_args(argv)
+
+    prices = [(step, s["ust_price"]) for step, s in
+              iter_simulation(load_scenario(args.preset), args.steps, rng=NoiseStream(args.seed))]
+    segments = [("全程", prices)]
+    if args.split:
+        segments += [(f"< {args.split}", [p for p in prices if p[0] < args.split]),
+                     (f">= {args.split}", [p for p in prices if p[0] >= args.split])]
+    for name, seg in segments:
+        st = replay(seg, DeadbandPolicy(args.deadband, args.heartbeat)).stats()
+        print(f"{name:>8}: {len(seg)} 步，发送 {st['sent']}（偏离 {st['by_deviation']}，"
+              f"心跳 {st['by_heartbeat']}），抑制 {st['suppressed']}，"
+              f"最大偏差 {st['max_deviation']:.3%}")
+
+if __name__ == "__main__":
+    main()
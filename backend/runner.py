@@ -0,0 +1,77 @@
+# backend/runner.py
+"""
+无界面的单路径运行器：逐步推进 compute_new_state，可选地把指标流式写盘。
+不需要逐步观察状态时，run_simulation 用 backend.fastforward 整段推进，只在要记录的步上停下。
+"""
+from typing import Dict, Iterator, Optional, Tuple
+
+from backend.fastforward import advance
+from backend.model import compute_new_state, fork_state
+from backend.rng import NoiseStream
+from backend.snapshot import Checkpoints
+from backend.stopping import StopWhen
+from backend.trajectory import ChunkedWriter
+
+def iter_simulation(state: Dict, n_steps: int, start_step: int = 1,
+                    rng: Optional[NoiseStream] = None,
+                    stop: Optional[StopWhen] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    逐步产出 (step, state)；输入状态不会被修改。
+    给出 stop 时，触发停止条件的那一步产出后结束（stop.step / stop.reason 记录原因）。
+    """
+    state = fork_state(state)
+    if stop is not None:
+        stop.reset()
+    for step in range(start_step, start_step + n_steps):
+        state = compute_new_state(state, step=step, rng=rng)
+        done = stop is not None and stop(step, state)
+        yield step, state
+        if done:
+            return
+
+def run_simulation(state: Dict, n_steps: int, start_step: int = 1,
+                   seed: Optional[int] = None, writer: Optional[ChunkedWriter] = None,
+                   every: int = 1, checkpoints: Optional[Checkpoints] = None,
+                   rng: Optional[NoiseStream] = None, stop: Optional[StopWhen] = None,
+                   fast: bool = True) -> Dict:
+    """
+    跑完整段模拟，返回最终状态（附带 seed）。
+    writer 不为空时每 every 步记录一行（step % every == 0，以及最后一步）；
+    checkpoints 不为空时记录起点、最后一步，并每 checkpoints.every 步存一条快照。
+    rng 用于接着已有的噪声流继续跑（例如从检查点恢复），此时忽略 seed。
+    stop 见 backend.stopping：提前停止时“最后一步”指停止的那一步。
+    fast=True 且没有 stop 时，两个记录点之间用 fastforward.advance 推进（结果逐位相同）。
+    """
+    rng = rng or NoiseStream(seed)
+    last = start_step + n_steps - 1
+    if checkpoints is not None:
+        checkpoints.start(state, rng, start_step - 1)
+    for step, state in _iter_records(state, n_steps, start_step, rng, stop, fast,
+                                     every if writer is not None else None,
+                                     checkpoints.every if checkpoints is not None else None):
+        if stop is not None and stop.step == step:
+            last = step
+        if writer is not None and (step % every == 0 or step == last):
+            writer.append(step, state)
+        if checkpoints is not None:
+            checkpoints.record(step, state, rng)
+    if checkpoints is not None and n_steps > 0 and last % checkpoints.every:
+        checkpoints.add(last, state, rng)  # 最后一步总是保留，便于续跑
+    state["seed"] = rng.seed
+    return state
+
+def _iter_records(state, n_steps, start_step, rng, stop, fast, *strides):
+    """
+    产出 (step, state)。逐步模式每步一个；快进模式只产出 strides（记录间隔，None 表示不需要）
+    的倍数步和最后一步，其间用 advance 整段推进。
+    """
+    if not fast or stop is not None:
+        yield from iter_simulation(state, n_steps, start_step, rng, stop)
+        return
+    state = fork_state(state)
+    step, last = start_step, start_step + n_steps - 1
+    while step <= last:
+        nxt = min([last] + [step + (-step) % k for k in strides if k])
+        state = advance(state, nxt - step + 1, step, rng)
+        yield nxt, state
+        step = nxt + 1
@@ -0,0 +1,214 @@
+# backend/snapshot.py
+"""
+紧凑状态快照。
+
+模型状态拆成两部分：
+  - 不随步数变化的上下文（编译后的参数、事件表、噪声流的 seed / path），整段运行只存一份；
+  - 每步变化的部分：标量字段 + 预言机环形缓冲 + 步数 + 噪声流位置，打包成一条定长
+    NumPy 记录（structured dtype），复制一条记录只是一次 memcpy。
+
+快照精确往返（float64 原样保存，噪声流按 position 恢复），从快照续跑与不中断的运行逐位相同。
+Checkpoints 每 k 步存一条记录，可以恢复 / 分叉到任意一步：
+
+    ck = Checkpoints(every=50)
+    final = run_simulation(state, 500, seed=7, checkpoints=ck)
+    s, rng = ck.fork(59, params={**params, "lfg_per_step_usd": 2 * lfg})
+    for step, s in iter_simulation(s, 441, start_step=60, rng=rng): ...
+"""
+import json
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from backend.events import EventSchedule, compile_events
+from backend.model import MODEL_VERSION, ModelParams, compile_params, compute_new_state
+from backend.oracle import PriceRing
+from backend.rng import NoiseStream
+
+# 快照保存的标量字段（与 compute_new_state 返回的键一致）；缺失的字段用 present 位掩码标记
+SNAPSHOT_FIELDS = (
+    "ust_price", "luna_price", "ust_supply", "luna_supply",
+    "pool_ust", "pool_luna", "pool_k0", "lfg_reserve_usd", "lfg_reserve0",
+    "pending_luna_cex", "amm_luna_price_ust", "amm_luna_price_usd",
+    "last_trade_slippage", "lfg_spent_usd", "spread_ust", "spread_luna",
+    "pool_k", "pool_k_rel", "pool_ust_share",
+)
+
+def snapshot_dtype(capacity: int) -> np.dtype:
+    return np.dtype([
+        ("step", np.int64), ("rng_position", np.int64), ("present", np.uint32),
+        *((name, np.float64) for name in SNAPSHOT_FIELDS),
+        ("hist_head", np.int64), ("hist_count", np.int64),
+        ("hist", np.float64, (int(capacity),)),
+    ])
+
+def _ring(state: Dict, params: ModelParams) -> PriceRing:
+    """状态里的预言机历史；旧版 list 按 compute_new_state 的规则转换（不修改原状态）"""
+    hist = state.get("luna_price_hist")
+    if isinstance(hist, PriceRing) and hist.cap >= params.oracle_capacity:
+        return hist
+    prev = hist.tolist() if isinstance(hist, PriceRing) else hist
+    return PriceRing.from_values(prev or [float(state["luna_price"])], params.oracle_capacity)
+
+class SnapshotContext:
+    """快照之外、整段运行共用的部分"""
+    __slots__ = ("params", "events", "seed", "path")
+
+    def __init__(self, params: Union[None, Dict, ModelParams] = None,
+                 events: Union[None, Iterable[Dict], EventSchedule] = None,
+                 seed: Optional[int] = None, path: int = 0):
+        self.params = compile_params(params)
+        self.events = compile_events(events)
+        self.seed = None if seed is None else int(seed)
+        self.path = int(path)
+
+    @classmethod
+    def from_state(cls, state: Dict, rng: Optional[NoiseStream] = None) -> "SnapshotContext":
+        return cls(state.get("params"), state.get("ext_events"),
+                   None if rng is None else rng.seed, 0 if rng is None else rng.path)
+
+    def to_json(self) -> str:
+        return json.dumps({"model_version": MODEL_VERSION, "params": self.params.as_dict(),
+                           "ext_events": list(self.events), "seed": self.seed,
+                           "path": self.path})
+
+    @classmethod
+    def from_json(cls, text: str) -> "SnapshotContext":
+        d = json.loads(text)
+        if d.get("model_version") != MODEL_VERSION:
+            raise ValueError(f"快照的模型版本 {d.get('model_version')} 与当前 {MODEL_VERSION} 不一致")
+        return cls(d["params"], d["ext_events"], d["seed"], d["path"])
+
+def take_snapshot(state: Dict, step: int, rng: Optional[NoiseStream] = None,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    把 step 步结束时的状态写进一条记录（out 为结构化数组中的一行，不传则新建）。
+    rng 为之后继续使用的噪声流，记录其当前位置。
+    """
+    params = compile_params(state.get("params"))
+    ring = _ring(state, params)
+    if out is None:
+        out = np.zeros((), dtype=snapshot_dtype(ring.cap))
+    present = 0
+    for i, name in enumerate(SNAPSHOT_FIELDS):
+        v = state.get(name)
+        if v is not None:
+            out[name] = v
+            present |= 1 << i
+    out["present"] = present
+    out["step"] = step
+    out["rng_position"] = -1 if rng is None else rng.position
+    out["hist_head"] = ring.head
+    out["hist_count"] = ring.count
+    out["hist"] = np.frombuffer(ring.buf, dtype=np.float64)
+    return out
+
+def restore_snapshot(rec: np.ndarray, ctx: SnapshotContext
+                     ) -> Tuple[Dict, int, Optional[NoiseStream]]:
+    """记录 -> (状态, 步数, 噪声流)；没有记录噪声流（或上下文没有 seed）时返回 None"""
+    present = int(rec["present"])
+    state = {name: float(rec[name]) for i, name in enumerate(SNAPSHOT_FIELDS)
+             if present >> i & 1}
+    ring = PriceRing.__new__(PriceRing)
+    ring.buf = array("d", rec["hist"].tobytes())
+    ring.cap = len(ring.buf)
+    ring.head = int(rec["hist_head"])
+    ring.count = int(rec["hist_count"])
+    state["luna_price_hist"] = ring
+    state["params"] = ctx.params
+    state["ext_events"] = ctx.events
+    pos = int(rec["rng_position"])
+    rng = NoiseStream(ctx.seed, ctx.path, pos) if pos >= 0 and ctx.seed is not None else None
+    return state, int(rec["step"]), rng
+
+class Checkpoints:
+    """
+    一段运行的检查点：每 every 步一条快照记录，存放在按倍数扩容的结构化数组里。
+    start() 绑定初始状态和噪声流，record() 由运行循环逐步调用。
+    """
+
+    def __init__(self, every: int = 1, capacity: int = 64):
+        self.every = max(int(every), 1)
+        self._capacity = max(int(capacity), 1)
+        self.ctx: Optional[SnapshotContext] = None
+        self._rec: Optional[np.ndarray] = None
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def steps(self) -> np.ndarray:
+        return self._rec["step"][:self._n] if self._n else np.empty(0, dtype=np.int64)
+
+    @property
+    def records(self) -> np.ndarray:
+        return self._rec[:self._n]
+
+    def start(self, state: Dict, rng: NoiseStream, step: int = 0) -> None:
+        """记录运行起点（第 step 步结束时的状态，默认为初始状态）"""
+        self.ctx = SnapshotContext.from_state(state, rng)
+        first = take_snapshot(state, step, rng)
+        self._rec = np.empty(self._capacity, dtype=first.dtype)
+        self._rec[0] = first
+        self._n = 1
+
+    def add(self, step: int, state: Dict, rng: Optional[NoiseStream] = None) -> None:
+        if self._n == len(self._rec):
+            self._rec = np.resize(self._rec, 2 * len(self._rec))
+        take_snapshot(state, step, rng, out=self._rec[self._n])
+        self._n += 1
+
+    def record(self, step: int, state: Dict, rng: Optional[NoiseStream] = None) -> None:
+        if step % self.every == 0:
+            self.add(step, state, rng)
+
+    def nearest(self, step: int) -> int:
+        """第 step 步及之前最近一条记录的下标"""
+        i = int(np.searchsorted(self.steps, step, side="right")) - 1
+        if i < 0:
+            raise ValueError(f"第 {step} 步之前没有检查点")
+        return i
+
+    def restore(self, step: Optional[int] = None) -> Tuple[Dict, NoiseStream]:
+        """
+        第 step 步结束时的 (状态, 噪声流)；不指定则取最后一条记录。
+        从最近的检查点起补算中间几步（最多 every - 1 步）。
+        """
+        i = self._n - 1 if step is None else self.nearest(step)
+        state, at, rng = restore_snapshot(self._rec[i], self.ctx)
+        if rng is None:
+            raise ValueError("检查点没有记录噪声流，无法续跑")
+        for s in range(at + 1, (at if step is None else step) + 1):
+            state = compute_new_state(state, step=s, rng=rng)
+        return state, rng
+
+    def fork(self, step: int, params: Union[None, Dict, ModelParams] = None,
+             ext_events: Union[None, Iterable[Dict], EventSchedule] = None
+             ) -> Tuple[Dict, NoiseStream]:
+        """
+        从第 step 步分叉：前 step 步沿用原运行，之后换用新的 params / ext_events
+        （不传则保持不变）。返回的状态从 step + 1 继续推进。
+        """
+        state, rng = self.restore(step)
+        if params is not None:
+            base = self.ctx.params.as_dict()
+            state["params"] = compile_params(
+                params if isinstance(params, ModelParams) else {**base, **params})
+        if ext_events is not None:
+            state["ext_events"] = compile_events(ext_events)
+        return state, rng
+
+    def save(self, path: str) -> None:
+        np.savez(path, records=self.records, context=np.array(self.ctx.to_json()),
+                 every=np.int64(self.every))
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoints":
+        with np.load(path) as z:
+            out = cls(int(z["every"]))
+            out.ctx = SnapshotContext.from_json(str(z["context"]))
+            out._rec = z["records"].copy()
+        out._n = len(out._rec)
+        return out
@@ -0,0 +1,131 @@
+# backend/solbuild.py
+"""
+Solidity 编译缓存：部署脚本和本地链共用的构建步骤。
+
+键是 (solc 版本, remappings, 输出项, 入口文件及其全部 import 闭包的路径和 sha256) 的 sha256，
+产物（每个合约的 abi + bytecode）存为 <缓存目录>/solc/<key>.json。
+源码、OpenZeppelin 依赖、remapping 或编译器版本任何一项不变时直接读 JSON，
+不导入 solcx、不安装也不调用 solc；未命中时才编译，且 solc 已安装就不再 install_solc。
+
+    python -m backend.solbuild AlgoStableV2.sol --abi backend/AlgoStableV2_abi.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from backend.fsutil import atomic_write, default_cache_dir
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACTS_DIR = os.path.join(ROOT, "contracts")
+SOLC_VERSION = "0.8.20"
+REMAPPINGS = ("@openzeppelin=node_modules/@openzeppelin",)
+OUTPUT_VALUES = ("abi", "bin")
+
+_IMPORT_RE = re.compile(r'^\s*import\s+(?:[^"\';]*?\s+from\s+)?["\']([^"\']+)["\']', re.M)
+
+def _resolve(path: str, importer: str, base_dir: str, remappings: Sequence[str]) -> str:
+    """按 solc 的规则把 import 路径解析成 base_dir 下的相对路径"""
+    if path.startswith("."):
+        return os.path.normpath(os.path.join(os.path.dirname(importer), path))
+    best = ""
+    for m in remappings:
+        prefix, target = m.split("=", 1)
+        if path.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+            resolved = target + path[len(prefix):]
+    if best and os.path.exists(os.path.join(base_dir, resolved)):
+        return os.path.normpath(resolved)
+    return os.path.normpath(path)
+
+def source_closure(files: Iterable[str], base_dir: str = CONTRACTS_DIR,
+                   remappings: Sequence[str] = REMAPPINGS) -> Dict[str, str]:
+    """入口文件及其递归 import 的全部源文件：{相对 base_dir 的路径: 内容 sha256}"""
+    out: Dict[str, str] = {}
+    todo = [os.path.normpath(f) for f in files]
+    while todo:
+        rel = todo.pop()
+        if rel in out:
+            continue
+        with open(os.path.join(base_dir, rel), "rb") as f:
+            src = f.read()
+        out[rel] = hashlib.sha256(src).hexdigest()
+        todo += [_resolve(p, rel, base_dir, remappings)
+                 for p in _IMPORT_RE.findall(src.decode("utf-8", "replace"))]
+    return out
+
+def build_key(files: Iterable[str], base_dir: str = CONTRACTS_DIR,
+              solc_version: str = SOLC_VERSION, remappings: Sequence[str] = REMAPPINGS) -> str:
+    files = sorted(os.path.normpath(f) for f in files)
+    blob = json.dumps({"solc": solc_version, "remappings": sorted(remappings),
+                       "outputs": list(OUTPUT_VALUES), "files": files,
+                       "sources": source_closure(files, base_dir, remappings)},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def ensure_solc(version: str = SOLC_VERSION) -> None:
+    """solc 未安装时才安装（install_solc 每次都会联网检查）"""
+    from solcx import get_installed_solc_versions, install_solc
+    if version not in {str(v) for v in get_installed_solc_versions()}:
+        install_solc(version)
+
+def _compile(files: List[str], base_dir: str, solc_version: str,
+             remappings: Sequence[str]) -> Dict[str, Dict]:
+    from solcx import compile_files
+    ensure_solc(solc_version)
+    cwd = os.getcwd()
+    os.chdir(base_dir)
+    try:
+        compiled = compile_files(files, output_values=list(OUTPUT_VALUES),
+                                 solc_version=solc_version, import_remappings=list(remappings))
+    finally:
+        os.chdir(cwd)
+    # 只保留入口文件里定义的合约（OpenZeppelin 的基类不需要）
+    return {key.rsplit(":", 1)[1]: {v: out[v] for v in OUTPUT_VALUES}
+            for key, out in compiled.items()
+            if os.path.normpath(key.rsplit(":", 1)[0]) in files}
+
+def build(files: Iterable[str] = ("MyToken.sol", "AlgoStableV2.sol"),
+          base_dir: str = CONTRACTS_DIR, solc_version: str = SOLC_VERSION,
+          remappings: Sequence[str] = REMAPPINGS, cache_dir: Optional[str] = None
+          ) -> Dict[str, Dict]:
+    """
+    编译 base_dir 下的 files（带缓存），返回 {合约名: {"abi": [...], "bin": "..."}}。
+    cache_dir 默认为 <SIM_CACHE_DIR 或 ~/.cache/luna-ust-sim>/solc。
+    """
+    files = sorted(os.path.normpath(f) for f in files)
+    cache_dir = cache_dir or os.path.join(default_cache_dir(), "solc")
+    path = os.path.join(cache_dir, build_key(files, base_dir, solc_version, remappings) + ".json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["contracts"]
+
+    contracts = _compile(files, base_dir, solc_version, remappings)
+    os.makedirs(cache_dir, exist_ok=True)
+    blob = json.dumps({"solc": solc_version, "files": files, "contracts": contracts})
+    atomic_write(path, lambda f: f.write(blob.encode()))
+    return contracts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="编译 contracts/ 下的合约（按源码哈希缓存）")
+    ap.add_argument("files", nargs="*", default=["MyToken.sol", "AlgoStableV2.sol"])
+    ap.add_argument("--abi", default=None, help="把 AlgoStableV2 的 ABI 导出到该文件")
+    ap.add_argument("--cache-dir", default=None)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    contracts = build(args.files, cache_dir=args.cache_dir)
+    dt = time.perf_counter() - t0
+    for name, out in contracts.items():
+        print(f"{name}: bytecode {len(out['bin']) // 2} bytes, {len(out['abi'])} ABI entries")
+    print(f"✅ {dt * 1e3:.0f} ms")
+    if args.abi:
+        with open(args.abi, "w") as f:
+            json.dump(contracts["AlgoStableV2"]["abi"], f)
+        print(f"ABI 已导出到 {args.abi}")
+
+if __name__ == "__main__":
+    main()
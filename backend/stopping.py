@@ -0,0 +1,144 @@
+# backend/stopping.py
+"""
+停止条件：用户自定义谓词 + 内置的吸收态检测。
+
+谓词签名为 pred(step, state) -> bool；state 可以是单路径状态，也可以是批量（ensemble）状态，
+后者返回每条路径一个布尔值的数组。内置检测器对两种状态都适用：
+
+  ust_floor   UST 贴在 ust_min（含 FLOOR_TOL 的噪声余量）
+  luna_floor  LUNA 贴在 luna_min
+  lfg_empty   LFG 储备耗尽（只减不增）
+  pool_dust   AMM 池被撤到尘埃（k/k0 <= POOL_DUST）
+  collapsed   ust_floor 且 lfg_empty：挂钩的防线都已失效，UST 不会再回到锚定
+
+    stop = StopWhen("collapsed", patience=5)
+    final = run_simulation(state, 1_000_000, seed=0, stop=stop)
+    stop.step, stop.reason      # 停在哪一步、因为哪个条件（未触发为 None）
+
+吸收态之后的尾部并非完全静止（供应、池子仍按几何速度衰减），提前停止时这些字段
+停在触发那一步的值上。
+"""
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# UST / LUNA 被硬边界截断后，下一步的噪声会把价格轻微抬离下限（Terra 预设里不超过 5%）
+FLOOR_TOL = 0.1
+POOL_DUST = 1e-6
+
+Predicate = Callable[[int, Dict], object]
+
+def ust_floor(step: int, state: Dict):
+    return state["ust_price"] <= state["params"].ust_min * (1 + FLOOR_TOL)
+
+def luna_floor(step: int, state: Dict):
+    return state["luna_price"] <= state["params"].luna_min * (1 + FLOOR_TOL)
+
+def lfg_empty(step: int, state: Dict):
+    return state["lfg_reserve_usd"] <= 0.0
+
+def pool_dust(step: int, state: Dict):
+    return state["pool_k_rel"] <= POOL_DUST
+
+def collapsed(step: int, state: Dict):
+    return ust_floor(step, state) & lfg_empty(step, state)
+
+CONDITIONS: Dict[str, Predicate] = {
+    "ust_floor": ust_floor, "luna_floor": luna_floor, "lfg_empty": lfg_empty,
+    "pool_dust": pool_dust, "collapsed": collapsed,
+}
+
+class StopWhen:
+    """
+    conditions 中任一条件连续 patience 步成立即停止；条件可以是内置名称或谓词。
+    单路径：runner 每步调用 stop(step, state)，触发后 step / reason 记录停止的步和条件名。
+    批量：mask(step, ens) 返回本步刚满足停止条件的路径掩码，retain(keep) 随批次裁剪。
+    每次运行开始时由 runner 调用 reset()，同一个对象可以重复使用。
+    """
+
+    def __init__(self, *conditions, patience: int = 1):
+        if not conditions:
+            raise ValueError("至少需要一个停止条件")
+        if patience < 1:
+            raise ValueError("patience 必须 >= 1")
+        self.names: List[str] = []
+        self.preds: List[Predicate] = []
+        for c in conditions:
+            if isinstance(c, str):
+                if c not in CONDITIONS:
+                    raise ValueError(f"未知停止条件 {c!r}，可选 {sorted(CONDITIONS)}")
+                self.names.append(c)
+                self.preds.append(CONDITIONS[c])
+            else:
+                self.names.append(getattr(c, "__name__", repr(c)))
+                self.preds.append(c)
+        self.patience = int(patience)
+        self.reset()
+
+    @classmethod
+    def parse(cls, spec: str, patience: int = 1) -> "StopWhen":
+        """命令行写法："collapsed" 或 "ust_floor,pool_dust" """
+        return cls(*[s.strip() for s in spec.split(",") if s.strip()], patience=patience)
+
+    def key(self) -> Dict:
+        """缓存键的一部分；自定义谓词无法可靠哈希，不能用于缓存"""
+        if any(n not in CONDITIONS or p is not CONDITIONS[n]
+               for n, p in zip(self.names, self.preds)):
+            raise ValueError("自定义停止谓词不能与缓存一起使用")
+        return {"stop": self.names, "patience": self.patience}
+
+    def reset(self, n_paths: Optional[int] = None) -> None:
+        self.step: Optional[int] = None
+        self.reason: Optional[str] = None
+        self._streak = 0 if n_paths is None else np.zeros(n_paths, dtype=np.int64)
+
+    # ----- 单路径 -----
+
+    def __call__(self, step: int, state: Dict) -> bool:
+        for name, pred in zip(self.names, self.preds):
+            if pred(step, state):
+                break
+        else:
+            self._streak = 0
+            return False
+        self._streak += 1
+        if self._streak < self.patience:
+            return False
+        self.step, self.reason = step, name
+        return True
+
+    # ----- 批量 -----
+
+    def mask(self, step: int, ens: Dict) -> np.ndarray:
+        hit = np.zeros(ens["n_paths"], dtype=bool)
+        for pred in self.preds:
+            hit |= np.asarray(pred(step, ens), dtype=bool)
+        self._streak = np.where(hit, self._streak + 1, 0)
+        return self._streak >= self.patience
+
+    def retain(self, keep) -> None:
+        self._streak = self._streak[keep]
+
+    # ----- 已记录的轨迹 -----
+
+    def scan(self, steps: np.ndarray, series: Dict[str, np.ndarray], params) -> Optional[int]:
+        """
+        在已算好的单路径轨迹上找停止点：series 为 {状态字段: 逐步数组}，steps 为对应步号。
+        返回停止那一行的下标（并设置 step / reason），未触发返回 None。
+        """
+        self.reset()
+        state = dict(series, params=params)
+        hits = [np.asarray(pred(steps, state), dtype=bool) for pred in self.preds]
+        hit = np.logical_or.reduce(hits)
+        # 行 i 之前（含）连续 patience 行成立
+        run = np.convolve(hit.astype(np.int64), np.ones(self.patience, dtype=np.int64), "valid") >= self.patience
+        idx = np.flatnonzero(run)
+        if not idx.size:
+            return None
+        i = int(idx[0]) + self.patience - 1
+        self.step = int(steps[i])
+        self.reason = next(n for n, h in zip(self.names, hits) if h[i])
+        return i
+
+    def __repr__(self) -> str:
+        return f"StopWhen({', '.join(self.names)}, patience={self.patience})"
@@ -0,0 +1,282 @@
+# backend/sweep.py
+"""
+参数扫描：在 default_params() 的任意键上做网格 / 随机 / 拉丁超立方设计，
+按块分发到进程池，每个参数点用批量引擎跑 n_paths 条路径，返回结果指标表。
+
+    python -m backend.sweep --design lhs --n 64 \\
+        --range redeem_alpha=0.02,0.08 --range bankrun_t0=100,200 --out sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.cache import TrajectoryCache, canonical_state, content_key
+from backend.ensemble import compute_new_state_batch, iter_ensemble, make_ensemble
+from backend.model import ModelParams, compile_params, default_params
+from backend.presets import get_preset
+from backend.rng import EnsembleNoise
+from backend.stopping import StopWhen
+
+DEPEG_LEVELS = (0.99, 0.9, 0.5)
+
+# 参数键 -> 类型（float / int / str），命令行和抽样的取值按它转换
+_PARAM_TYPES = {f.name: f.type for f in fields(ModelParams) if f.init}
+
+# ---------- 实验设计 ----------
+
+def _check_keys(keys):
+    unknown = set(keys) - set(default_params())
+    if unknown:
+        raise ValueError(f"未知参数: {sorted(unknown)}")
+
+def _cast(key: str, v):
+    """按参数的类型转换取值；v 可以是数值或命令行里的原始字符串"""
+    typ = _PARAM_TYPES.get(key, float)
+    if typ is str:
+        return str(v).strip()
+    if typ is int:
+        return int(round(float(v)))
+    return float(v)
+
+def grid_design(space: Dict[str, Sequence]) -> List[Dict]:
+    """笛卡尔积网格：{"redeem_alpha": [0.02, 0.04], ...}"""
+    _check_keys(space)
+    keys = list(space)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(space[k] for k in keys))]
+
+def random_design(bounds: Dict[str, Tuple[float, float]], n: int, seed: int = 0) -> List[Dict]:
+    """各维独立均匀抽样"""
+    _check_keys(bounds)
+    rng = np.random.default_rng(seed)
+    u = rng.random((n, len(bounds)))
+    return _scale(bounds, u)
+
+def lhs_design(bounds: Dict[str, Tuple[float, float]], n: int, seed: int = 0) -> List[Dict]:
+    """拉丁超立方：每一维的 n 个分层各落一个点"""
+    _check_keys(bounds)
+    rng = np.random.default_rng(seed)
+    d = len(bounds)
+    u = (rng.random((n, d)) + np.arange(n)[:, None]) / n
+    for j in range(d):
+        u[:, j] = u[rng.permutation(n), j]
+    return _scale(bounds, u)
+
+def _scale(bounds, u) -> List[Dict]:
+    keys = list(bounds)
+    text = [k for k in keys if _PARAM_TYPES.get(k) is str]
+    if text:
+        raise ValueError(f"非数值参数只能用网格取值: {text}")
+    lo = np.array([bounds[k][0] for k in keys], dtype=float)
+    hi = np.array([bounds[k][1] for k in keys], dtype=float)
+    x = lo + (hi - lo) * u
+    return [{k: _cast(k, row[j]) for j, k in enumerate(keys)} for row in x]
+
+# ---------- 结果指标 ----------
+
+class OutcomeTracker:
+    """
+    逐步更新的路径级结果指标（首次脱锚步、LFG 耗尽步、k/k0 最小值等）。
+    track_stop=True 时另记每条路径的停止步（t_stopped，未停止为 inf）。
+    """
+
+    def __init__(self, ens: Dict, levels: Sequence[float] = DEPEG_LEVELS,
+                 track_stop: bool = False):
+        n = ens["n_paths"]
+        self.levels = tuple(levels)
+        self.first_below = {lv: np.full(n, np.inf) for lv in self.levels}
+        self.lfg_exhausted = np.full(n, np.inf)
+        self.min_k_rel = np.full(n, np.inf)
+        self.luna_supply0 = ens["luna_supply"].copy()
+        self.final_luna_supply = ens["luna_supply"].copy()
+        self.final_ust_price = ens["ust_price"].copy()
+        self.stopped = np.full(n, np.inf) if track_stop else None
+
+    def update(self, ens: Dict, step: int, idx: Optional[np.ndarray] = None) -> None:
+        """idx 为 ens 中各路径的下标（部分路径已提前停止时）；已停止的路径保持停止时的值"""
+        sel = slice(None) if idx is None else idx
+        ust = ens["ust_price"]
+        for lv, first in self.first_below.items():
+            f = first[sel]
+            first[sel] = np.where((ust < lv) & np.isinf(f), step, f)
+        f = self.lfg_exhausted[sel]
+        self.lfg_exhausted[sel] = np.where((ens["lfg_reserve_usd"] <= 0.0) & np.isinf(f), step, f)
+        self.min_k_rel[sel] = np.minimum(self.min_k_rel[sel], ens["pool_k_rel"])
+        self.final_luna_supply[sel] = ens["luna_supply"]
+        self.final_ust_price[sel] = ens["ust_price"]
+
+    def retire(self, idx: np.ndarray, step: int) -> None:
+        if self.stopped is not None:
+            self.stopped[idx] = step
+
+    def per_path(self) -> Dict[str, np.ndarray]:
+        out = {f"t_ust_lt_{lv}": v for lv, v in self.first_below.items()}
+        out["t_lfg_exhausted"] = self.lfg_exhausted
+        if self.stopped is not None:
+            out["t_stopped"] = self.stopped
+        out["luna_supply_mult"] = self.final_luna_supply / self.luna_supply0
+        out["min_k_rel"] = self.min_k_rel
+        out["final_ust_price"] = self.final_ust_price
+        return out
+
+    def summary(self) -> Dict[str, float]:
+        """
+        跨路径汇总：步数类指标取中位数（多数路径未发生则为 NaN），并给出发生比例；
+        其余取均值。
+        """
+        out = {}
+        for k, v in self.per_path().items():
+            if k.startswith("t_"):
+                med = float(np.median(v))
+                out[k] = med if math.isfinite(med) else float("nan")
+                out["p_" + k[2:]] = float(np.mean(np.isfinite(v)))
+            else:
+                out[k] = float(np.mean(v))
+        return out
+
+# ---------- 单点 / 扫描 ----------
+
+def apply_overrides(base_state: Dict, overrides: Dict) -> Dict:
+    """在基准场景上覆盖部分参数（返回新状态，基准不变）"""
+    state = dict(base_state)
+    base = compile_params(base_state.get("params")).as_dict()
+    state["params"] = compile_params({**base, **overrides})
+    return state
+
+def run_point(base_state: Dict, overrides: Dict, n_steps: int = 500,
+              n_paths: int = 16, seed: int = 0,
+              stop: Optional[StopWhen] = None) -> Dict[str, float]:
+    """
+    单个参数点：n_paths 条路径的批量运行 + 指标汇总。
+    所有参数点用同一个 seed 和路径编号（共同随机数），差异只来自参数。
+    给出 stop 时进入终态的路径移出批次，指标停在停止那一步（见 backend.stopping）。
+    """
+    ens = make_ensemble(apply_overrides(base_state, overrides), n_paths)
+    rng = EnsembleNoise(seed, paths=range(n_paths))
+    tracker = OutcomeTracker(ens, track_stop=stop is not None)
+    if stop is None:
+        for step in range(1, n_steps + 1):
+            ens = compute_new_state_batch(ens, step=step, rng=rng)
+            tracker.update(ens, step)
+        return tracker.summary()
+    for step, ens, active, done in iter_ensemble(ens, n_steps, 1, rng, stop):
+        tracker.update(ens, step, active)
+        if done.any():
+            tracker.retire(active[done], step)
+    return tracker.summary()
+
+def cached_run_point(cache: TrajectoryCache, base_state: Dict, overrides: Dict,
+                     n_steps: int = 500, n_paths: int = 16, seed: int = 0,
+                     stop: Optional[StopWhen] = None) -> Dict[str, float]:
+    """run_point 的磁盘缓存版本：键为 (场景 + 覆盖后的参数, 步数, 路径数, seed[, 停止条件])"""
+    parts = [canonical_state(apply_overrides(base_state, overrides)), n_steps, n_paths, seed]
+    if stop is not None:
+        parts.append(stop.key())
+    return cache.memo(content_key("point", *parts),
+                      lambda: run_point(base_state, overrides, n_steps, n_paths, seed, stop))
+
+def _run_chunk(args):
+    base_state, chunk, n_steps, n_paths, seed, cache_dir, stop = args
+    if cache_dir is None:
+        return [(i, run_point(base_state, ov, n_steps, n_paths, seed, stop)) for i, ov in chunk]
+    cache = TrajectoryCache(cache_dir)
+    return [(i, cached_run_point(cache, base_state, ov, n_steps, n_paths, seed, stop))
+            for i, ov in chunk]
+
+def run_sweep(points: List[Dict], base_state: Optional[Dict] = None, n_steps: int = 500,
+              n_paths: int = 16, seed: int = 0, workers: Optional[int] = None,
+              chunk_size: Optional[int] = None, cache_dir: Optional[str] = None,
+              stop: Optional[StopWhen] = None) -> List[Dict]:
+    """
+    把参数点按块分发到进程池，返回每个点一行（参数 + 指标），顺序与 points 一致。
+    workers=1 时在当前进程内串行执行；给出 cache_dir 时已算过的点直接读缓存。
+    stop 会被发送到子进程，多进程时自定义谓词必须可 pickle（模块级函数）。
+    """
+    base_state = base_state or get_preset("terra")
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(points) / (workers * 4)))
+    indexed = list(enumerate(points))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    tasks = [(base_state, c, n_steps, n_paths, seed, cache_dir, stop) for c in chunks]
+
+    if workers == 1:
+        results = map(_run_chunk, tasks)
+        rows = [r for chunk in results for r in chunk]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = [r for chunk in pool.map(_run_chunk, tasks) for r in chunk]
+    rows.sort(key=lambda r: r[0])
+    return [{**points[i], **metrics} for i, metrics in rows]
+
+def to_frame(rows: List[Dict]):
+    import pandas as pd
+    return pd.DataFrame(rows)
+
+def write_csv(rows: List[Dict], path) -> None:
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+# ---------- 命令行 ----------
+
+def _parse_kv(items, parse_value):
+    out = {}
+    for item in items or []:
+        key, _, val = item.partition("=")
+        out[key.strip()] = parse_value(key.strip(), val)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="多进程参数扫描")
+    ap.add_argument("--preset", default="terra")
+    ap.add_argument("--design", choices=("grid", "random", "lhs"), default="grid")
+    ap.add_argument("--grid", action="append", metavar="KEY=V1,V2,...",
+                    help="网格取值（design=grid）")
+    ap.add_argument("--range", action="append", metavar="KEY=LO,HI",
+                    help="取值范围（design=random/lhs）")
+    ap.add_argument("--n", type=int, default=32, help="random/lhs 的点数")
+    ap.add_argument("--steps", type=int, default=500)
+    ap.add_argument("--paths", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk", type=int, default=None)
+    ap.add_argument("--out", default=None, help="CSV 输出路径（默认打印到 stdout）")
+    ap.add_argument("--cache-dir", default=None, help="磁盘缓存目录，重跑时跳过已算过的点")
+    ap.add_argument("--stop", default=None, metavar="COND[,COND]",
+                    help="终态提前停止：ust_floor / luna_floor / lfg_empty / pool_dust / collapsed")
+    ap.add_argument("--stop-patience", type=int, default=1, help="条件需连续成立的步数")
+    args = ap.parse_args(argv)
+
+    if args.design == "grid":
+        space = _parse_kv(args.grid, lambda k, v: [_cast(k, x) for x in v.split(",")])
+        points = grid_design(space)
+    else:
+        bounds = _parse_kv(args.range, lambda k, v: tuple(float(x) for x in v.split(",")))
+        design = random_design if args.design == "random" else lhs_design
+        points = design(bounds, args.n, seed=args.seed)
+
+    rows = run_sweep(points, get_preset(args.preset), n_steps=args.steps, n_paths=args.paths,
+                     seed=args.seed, workers=args.workers, chunk_size=args.chunk,
+                     cache_dir=args.cache_dir,
+                     stop=StopWhen.parse(args.stop, args.stop_patience) if args.stop else None)
+    if args.out:
+        write_csv(rows, args.out)
+        print(f"✅ {len(rows)} 个参数点 -> {args.out}")
+    else:
+        w = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]) if rows else [])
+        w.writeheader()
+        w.writerows(rows)
+
+if __name__ == "__main__":
+    main()
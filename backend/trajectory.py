@@ -0,0 +1,276 @@
+# backend/trajectory.py
+"""
+轨迹记录：按列存放每步指标。
+
+TrajectoryRecorder 在内存里用预分配、按倍数扩容的 NumPy 列记录整段轨迹；
+ChunkedWriter 把逐步记录攒成定长块后写盘（.npz / .parquet / .arrow），
+内存占用只与块大小有关，与总步数无关。
+"""
+import os
+import zipfile
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 可记录的标量状态字段（与 compute_new_state 返回的键一致）
+STATE_METRICS = (
+    "ust_price", "luna_price", "ust_supply", "luna_supply",
+    "pool_ust", "pool_luna", "lfg_reserve_usd", "pending_luna_cex",
+    "amm_luna_price_ust", "amm_luna_price_usd", "last_trade_slippage",
+    "lfg_spent_usd", "spread_ust", "spread_luna",
+    "pool_k", "pool_k_rel", "pool_ust_share",
+)
+
+# 仪表盘列名 -> 状态字段（供前端绘图）；Minted / Burned 列在读取时由供应量差分得到
+DASHBOARD_COLUMNS = {
+    "UST Price": "ust_price",
+    "LUNA Price": "luna_price",
+    "LUNA Supply": "luna_supply",
+    "UST Supply": "ust_supply",
+    "AMM LUNA Price (USD)": "amm_luna_price_usd",
+    "AMM LUNA Price (UST)": "amm_luna_price_ust",
+    "Pool UST": "pool_ust",
+    "Pool LUNA": "pool_luna",
+    "Slippage": "last_trade_slippage",
+    "LFG Reserve": "lfg_reserve_usd",
+    "LFG Spent": "lfg_spent_usd",
+    "Spread UST": "spread_ust",
+    "Spread LUNA": "spread_luna",
+    "Pool K": "pool_k",
+    "Pool K Rel": "pool_k_rel",
+    "Pool UST Share": "pool_ust_share",
+}
+
+# 派生列：(列名, 供应量列, 方向)
+SUPPLY_DELTAS = (
+    ("LUNA Minted", "LUNA Supply", 1), ("LUNA Burned", "LUNA Supply", -1),
+    ("UST Minted", "UST Supply", 1), ("UST Burned", "UST Supply", -1),
+)
+
+FORMATS = (".npz", ".parquet", ".arrow")
+
+def check_metrics(metrics: Iterable[str]) -> List[str]:
+    metrics = list(metrics)
+    unknown = set(metrics) - set(STATE_METRICS)
+    if unknown:
+        raise ValueError(f"未知指标: {sorted(unknown)}，可选 {list(STATE_METRICS)}")
+    return metrics
+
+class TrajectoryRecorder:
+    """
+    内存中的列存轨迹。每列一个预分配的 float64 数组，写满后容量翻倍（均摊 O(1)）；
+    只有在需要画图时才通过 columns_dict() / frame() / arrow() 取出视图。
+    """
+
+    def __init__(self, columns: Optional[Dict[str, str]] = None,
+                 initial_state: Optional[Dict] = None, capacity: int = 1024):
+        self.columns = dict(DASHBOARD_COLUMNS if columns is None else columns)
+        cap = max(int(capacity), 1)
+        self._steps = np.empty(cap, dtype=np.int64)
+        self._cols = {name: np.empty(cap, dtype=np.float64) for name in self.columns}
+        self._n = 0
+        # 第一步的 mint/burn 以初始供应量为基准
+        self._base = {name: float(initial_state[key]) for name, key in self.columns.items()
+                      if initial_state is not None and key in initial_state}
+
+    @classmethod
+    def from_columns(cls, data: Dict[str, np.ndarray], columns: Optional[Dict[str, str]] = None,
+                     initial_state: Optional[Dict] = None,
+                     capacity: int = 1024) -> "TrajectoryRecorder":
+        """由 raw_columns() 的结果重建（例如从缓存读回），之后可以继续 append"""
+        n = len(data["Step"])
+        rec = cls(columns, initial_state, max(capacity, n))
+        rec._steps[:n] = data["Step"]
+        for name, col in rec._cols.items():
+            col[:n] = data[name]
+        rec._n = n
+        return rec
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _grow(self):
+        cap = 2 * len(self._steps)
+        self._steps = np.resize(self._steps, cap)
+        for name, col in self._cols.items():
+            self._cols[name] = np.resize(col, cap)
+
+    def append(self, step: int, state: Dict) -> None:
+        if self._n == len(self._steps):
+            self._grow()
+        i = self._n
+        self._steps[i] = step
+        for name, key in self.columns.items():
+            v = state.get(key)
+            self._cols[name][i] = np.nan if v is None else v
+        self._n = i + 1
+
+    def column(self, name: str, start: int = 0) -> np.ndarray:
+        """单列视图 [start:]（不复制）；派生的 Minted / Burned 列按需计算"""
+        if name == "Step":
+            return self._steps[start:self._n]
+        if name in self._cols:
+            return self._cols[name][start:self._n]
+        for col, supply, sign in SUPPLY_DELTAS:
+            if col == name and supply in self._cols:
+                s = self._cols[supply][:self._n]
+                if start > 0:
+                    prev = s[start - 1]
+                else:
+                    prev = self._base.get(supply, s[0] if len(s) else 0.0)
+                return np.maximum(sign * np.diff(s[start:], prepend=prev), 0.0)
+        raise KeyError(name)
+
+    def raw_columns(self) -> Dict[str, np.ndarray]:
+        """Step 与记录列的视图，不含派生列"""
+        return {name: self.column(name) for name in ("Step", *self.columns)}
+
+    def columns_dict(self) -> Dict[str, np.ndarray]:
+        names = ["Step", *self.columns]
+        names += [c for c, supply, _ in SUPPLY_DELTAS if supply in self._cols]
+        return {name: self.column(name) for name in names}
+
+    def frame(self):
+        """pandas DataFrame（列直接引用内部数组，不逐行构造）"""
+        import pandas as pd
+        return pd.DataFrame(self.columns_dict(), copy=False)
+
+    def arrow(self):
+        """pyarrow Table（float64 列零拷贝）"""
+        import pyarrow as pa
+        return pa.table(self.columns_dict())
+
+class TrajectoryView:
+    """
+    只读的列存轨迹（例如预先算好 / 缓存的结果）。cursor 控制当前可见的步数，
+    接口与 TrajectoryRecorder 相同，回放时逐步推进 cursor 即可。
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self._cols = columns
+        self.n_steps = len(columns["Step"])
+        self.cursor = self.n_steps
+
+    def __len__(self) -> int:
+        return self.cursor
+
+    def column(self, name: str, start: int = 0) -> np.ndarray:
+        return self._cols[name][start:self.cursor]
+
+    def columns_dict(self) -> Dict[str, np.ndarray]:
+        return {name: self.column(name) for name in self._cols}
+
+    def frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns_dict(), copy=False)
+
+class ChunkedWriter:
+    """
+    流式列存写入器。每列一个定长 float64 缓冲，写满 chunk_size 行就落盘一次；
+    第一列固定为 step（int64）。用作上下文管理器，退出时写出剩余数据。
+    """
+
+    def __init__(self, path: str, metrics: Sequence[str] = STATE_METRICS,
+                 chunk_size: int = 65536):
+        self.path = path
+        self.metrics = check_metrics(metrics)
+        self.chunk_size = int(chunk_size)
+        self.fmt = os.path.splitext(path)[1].lower()
+        if self.fmt not in FORMATS:
+            raise ValueError(f"不支持的输出格式 {self.fmt!r}，可选 {FORMATS}")
+
+        self._steps = np.empty(self.chunk_size, dtype=np.int64)
+        self._cols = {m: np.empty(self.chunk_size, dtype=np.float64) for m in self.metrics}
+        self._n = 0
+        self.rows = 0
+        self.chunks = 0
+        self._open()
+
+    # ----- 后端 -----
+
+    def _open(self):
+        if self.fmt == ".npz":
+            self._zip = zipfile.ZipFile(self.path, "w", allowZip64=True)
+            return
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(f"写 {self.fmt} 需要 pyarrow（pip install pyarrow），或改用 .npz")
+        self._pa = pa
+        fields = [pa.field("step", pa.int64())] + [pa.field(m, pa.float64()) for m in self.metrics]
+        self._schema = pa.schema(fields)
+        if self.fmt == ".parquet":
+            import pyarrow.parquet as pq
+            self._sink = pq.ParquetWriter(self.path, self._schema)
+        else:
+            self._sink = pa.ipc.new_file(self.path, self._schema)
+
+    def _write(self, steps: np.ndarray, cols: Dict[str, np.ndarray]):
+        if self.fmt == ".npz":
+            prefix = f"chunk{self.chunks:06d}"
+            for name, arr in (("step", steps), *cols.items()):
+                with self._zip.open(f"{prefix}/{name}.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.ascontiguousarray(arr))
+            return
+        pa = self._pa
+        arrays = [pa.array(steps)] + [pa.array(cols[m]) for m in self.metrics]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self._schema)
+        if self.fmt == ".parquet":
+            self._sink.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._sink.write_batch(batch)
+
+    # ----- 写入 -----
+
+    def append(self, step: int, state: Dict) -> None:
+        i = self._n
+        self._steps[i] = step
+        for m, col in self._cols.items():
+            col[i] = state[m]
+        self._n = i + 1
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._n:
+            return
+        n = self._n
+        self._write(self._steps[:n], {m: c[:n] for m, c in self._cols.items()})
+        self.rows += n
+        self.chunks += 1
+        self._n = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self.fmt == ".npz":
+            self._zip.close()
+        else:
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_trajectory(path: str, metrics: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    """读回 ChunkedWriter 写出的文件，返回 {列名: 数组}（含 step）"""
+    fmt = os.path.splitext(path)[1].lower()
+    if fmt == ".npz":
+        parts: Dict[str, list] = {}
+        with np.load(path) as z:
+            for key in sorted(z.files):
+                name = key.split("/", 1)[1]
+                if metrics is None or name == "step" or name in metrics:
+                    parts.setdefault(name, []).append(z[key])
+        return {k: np.concatenate(v) for k, v in parts.items()}
+    import pyarrow as pa
+    if fmt == ".parquet":
+        import pyarrow.parquet as pq
+        cols = None if metrics is None else ["step", *metrics]
+        table = pq.read_table(path, columns=cols)
+    else:
+        with pa.memory_map(path) as src:
+            table = pa.ipc.open_file(src).read_all()
+    return {name: table.column(name).to_numpy() for name in table.column_names
+            if metrics is None or name == "step" or name in metrics}
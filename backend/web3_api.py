@@ -1,31 +1,574 @@
-from web3 import Web3
 import os
+import time
+import threading
+import zlib
+from collections import deque
 from dotenv import load_dotenv
 load_dotenv()
-import random
 
+# web3 本身导入就要 1 秒多：本模块只在第一次真正连链时才导入它，
+# 本地模式、离线工具和基准脚本 import 本模块时不付这笔开销，也不会建立连接。
 INFURA_URL = f"https://sepolia.infura.io/v3/{os.getenv('INFURA_KEY')}"
-w3 = Web3(Web3.HTTPProvider(INFURA_URL))
+RPC_URL = os.getenv("WEB3_PROVIDER_URL") or INFURA_URL
+RPC_TIMEOUT = 10        # 单次 RPC 超时（秒）
+RPC_POOL_SIZE = 32      # HTTP 连接池大小（多账户 / 多线程并发发送时复用连接）
+# rpc：连接 RPC_URL；tester / anvil：进程内启动并部署的本地链（见 backend/localchain.py）
+CHAIN_BACKEND = os.getenv("CHAIN_BACKEND", "rpc")
 
 LUNA_ADDR = os.getenv("LUNA_ADDR")
 STABLE_ADDR = os.getenv("STABLE_ADDR")
-ACCOUNT_ADDRESS = os.getenv("ACCOUNT_ADDRESS")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-ACCOUNT_ADDRESS = w3.to_checksum_address(os.getenv("ACCOUNT_ADDRESS"))
-
-def send_txn(fn, contract, *args):
-    nonce = w3.eth.get_transaction_count(ACCOUNT_ADDRESS)
-    # 基于当前链上gas price，自动＋随机微调避免重复
-    base_gas_price = w3.eth.gas_price
-    gas_price = int(base_gas_price * (1 + random.uniform(0.05, 0.15)))
-
-    txn = fn(*args).build_transaction({
-        "from": ACCOUNT_ADDRESS,
-        "nonce": nonce,
-        "gas": 200000,
-        "gasPrice": gas_price,
-    })
-
-    signed_txn = w3.eth.account.sign_transaction(txn, private_key=os.getenv("PRIVATE_KEY"))
-    tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
-    return tx_hash.hex()
\ No newline at end of file
+
+_w3 = None
+_w3_lock = threading.Lock()
+
+def get_w3():
+    """进程内共享的 Web3 连接（带连接池的 HTTP 会话），第一次调用时才创建"""
+    global _w3
+    with _w3_lock:
+        if _w3 is None and CHAIN_BACKEND != "rpc":
+            from backend.localchain import shared_chain
+            _w3 = shared_chain(CHAIN_BACKEND).w3
+        elif _w3 is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from web3 import Web3
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _w3 = Web3(Web3.HTTPProvider(RPC_URL, request_kwargs={"timeout": RPC_TIMEOUT},
+                                         session=session))
+    return _w3
+
+def account_address():
+    """.env 里的 ACCOUNT_ADDRESS（校验和格式）；未配置时（本地基准测试等）为 None"""
+    addr = os.getenv("ACCOUNT_ADDRESS")
+    if not addr:
+        return None
+    from eth_utils import to_checksum_address
+    return to_checksum_address(addr)
+
+def signer():
+    """发交易用的 (地址, 私钥)：本地链后端用部署账户（合约 owner），否则取 .env"""
+    if CHAIN_BACKEND != "rpc":
+        from backend.localchain import shared_chain
+        chain = shared_chain(CHAIN_BACKEND)
+        return chain.owner, chain.keys[0]
+    return account_address(), PRIVATE_KEY
+
+def __getattr__(name):
+    # 兼容旧用法 `from backend.web3_api import w3, ACCOUNT_ADDRESS`：访问时才连接
+    if name == "w3":
+        return get_w3()
+    if name == "ACCOUNT_ADDRESS":
+        return account_address()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+DEFAULT_GAS = 200000
+# 价格更新：后发的覆盖先发的，上链顺序必须与提交顺序一致（见 TxPipeline / AccountPool）
+PRICE_FUNCTIONS = ("setPrice", "setPrices")
+GAS_PRICE_BUMP = 1.10   # 在链上 gas price 基础上加价 10%
+REPLACE_BUMP = 1.125    # 替换交易至少加价 12.5%（节点一般要求 >= 10%）
+
+def is_price_update(call):
+    """call 是否为 setPrice / setPrices 合约调用"""
+    return getattr(call, "fn_name", None) in PRICE_FUNCTIONS
+
+# ---------- nonce / gas price ----------
+
+class NonceManager:
+    """本地 nonce 计数：只在启动和 resync() 时查一次链上的 pending nonce"""
+
+    def __init__(self, web3, address):
+        self.w3 = web3
+        self.address = address
+        self._lock = threading.Lock()
+        self.chain_id = web3.eth.chain_id
+        self.resync()
+
+    def resync(self):
+        with self._lock:
+            self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+
+    def take(self):
+        with self._lock:
+            n = self._next
+            self._next += 1
+            return n
+
+class GasPriceCache:
+    """gas price 缓存 ttl 秒，避免每笔交易都查一次"""
+
+    def __init__(self, web3, ttl=5.0, bump=GAS_PRICE_BUMP):
+        self.w3 = web3
+        self.ttl = ttl
+        self.bump = bump
+        self._value = None
+        self._at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is None or now - self._at > self.ttl:
+            self._value = int(self.w3.eth.gas_price * self.bump)
+            self._at = now
+        return self._value
+
+# ---------- 异步提交流水线 ----------
+
+class PendingTx:
+    __slots__ = ("call", "gas", "key", "nonce", "gas_price", "hash", "hashes", "raw", "sent_at",
+                 "submitted_at", "attempts")
+
+    def __init__(self, call, gas, key=None):
+        self.call = call
+        self.gas = gas
+        self.key = key    # 同一 key 的交易后发覆盖先发（价格更新为 "price"）
+        self.nonce = None
+        self.gas_price = None
+        self.hash = None
+        self.hashes = []  # 同一 nonce 下发出过的所有版本（加价替换时任何一版都可能上链）
+        self.raw = None
+        self.sent_at = 0.0
+        self.submitted_at = time.monotonic()  # 首次提交时间（sent_at 在重发时会刷新）
+        self.attempts = 0
+
+class TxPipeline:
+    """
+    异步交易流水线：本地 nonce + 缓存的 gas price，submit() 签名广播后立即返回；
+    最多 window 笔未确认交易在途，满了才等待。后台线程按新区块批量确认回执：
+      - nonce 已被别的交易占用（被替换）而回执不是我们的 -> 同一 key 已有更新的交易时丢弃，
+        否则换新 nonce 重发（价格更新的 key 为 "price"：旧价格不会在新价格之后上链）；
+      - 超过 recheck_after 秒未上链且节点里查不到（被丢弃）-> 原样重新广播；
+      - 超过 stuck_after 秒仍在交易池 -> 同 nonce 加价替换。
+
+        pipe = TxPipeline(get_w3(), account_address(), PRIVATE_KEY, window=16)
+        pipe.submit(contract.functions.setPrice(p))
+        ...
+        pipe.flush()
+    call 可以是合约函数调用，也可以是交易 dict（如 {"to": addr, "value": 1}）。
+    """
+
+    def __init__(self, web3, address, private_key, window=16, gas=DEFAULT_GAS,
+                 gas_ttl=5.0, poll_interval=0.2, recheck_after=12.0, stuck_after=60.0,
+                 max_attempts=5):
+        self.w3 = web3
+        self.address = address
+        self.private_key = private_key
+        self.window = max(int(window), 1)
+        self.gas = gas
+        self.poll_interval = poll_interval
+        self.recheck_after = recheck_after
+        self.stuck_after = stuck_after
+        self.max_attempts = max_attempts
+        self.nonces = NonceManager(web3, address)
+        self.gas_price = GasPriceCache(web3, gas_ttl)
+
+        self.inflight = deque()   # 按 nonce 递增
+        self.receipts = []        # 已确认回执（按确认顺序）
+        self.failed = []          # (PendingTx, 原因)
+        self.latencies = []       # 每笔已确认交易从提交到确认的秒数
+        self.sent = self.confirmed = self.resubmitted = self.reverted = self.superseded = 0
+        self._latest = {}         # key -> 最近提交的 PendingTx
+
+        self.chain_id = web3.eth.chain_id
+        self._cv = threading.Condition()
+        self._rpc = threading.Lock()   # provider 调用串行化
+        self._poller = threading.Lock()  # 同一时间只有一个线程在确认
+        self._last_block = -1
+        self._closed = False
+        self._thread = threading.Thread(target=self._confirm_loop, daemon=True)
+        self._thread.start()
+
+    # ----- 发送 -----
+
+    def _sign_and_send(self, tx):
+        params = {"from": self.address, "nonce": tx.nonce, "gas": tx.gas,
+                  "gasPrice": tx.gas_price, "chainId": self.chain_id}
+        if isinstance(tx.call, dict):
+            txn = {**tx.call, **params}
+        else:
+            txn = tx.call.build_transaction(params)
+        signed = self.w3.eth.account.sign_transaction(txn, private_key=self.private_key)
+        tx.raw = signed.raw_transaction
+        tx.hash = self.w3.eth.send_raw_transaction(tx.raw)
+        tx.hashes.append(tx.hash)
+        tx.sent_at = time.monotonic()
+        tx.attempts += 1
+
+    def submit(self, call, gas=None, key=None):
+        """
+        签名并广播，返回交易哈希；在途交易已满 window 笔时等待最早的确认。
+        gas 为本笔的 gas 上限（默认用构造时的 gas）。key 相同的交易后发覆盖先发，
+        不给时 setPrice / setPrices 自动归为 "price"。
+        """
+        while len(self.inflight) >= self.window:
+            # 反正要等，就由提交方自己确认，不等后台线程的下一轮
+            if not self.poll(block=True):
+                with self._cv:
+                    self._cv.wait(self.poll_interval)
+        if key is None and is_price_update(call):
+            key = "price"
+        tx = PendingTx(call, gas or self.gas, key)
+        tx.nonce = self.nonces.take()
+        tx.gas_price = self.gas_price.get()
+        with self._rpc:
+            try:
+                self._sign_and_send(tx)
+            except Exception as e:
+                # 没发出去的 nonce 不能留空洞，否则后面的交易都会卡住
+                self.nonces.resync()
+                if "nonce" not in str(e).lower():
+                    raise
+                # 本地 nonce 落后于链上（有别的程序用同一账户发了交易）：同步后再发一次
+                tx.nonce = self.nonces.take()
+                self._sign_and_send(tx)
+        with self._cv:
+            self._enqueue(tx)
+            if key is not None:
+                self._latest[key] = tx
+            self.sent += 1
+        return tx.hash
+
+    def _enqueue(self, tx):
+        """按 nonce 插入 inflight（调用方持有 _cv）"""
+        i = len(self.inflight)
+        while i and self.inflight[i - 1].nonce > tx.nonce:
+            i -= 1
+        self.inflight.insert(i, tx)
+
+    # ----- 确认 -----
+
+    def poll(self, block=False):
+        """有新区块时批量确认在途交易；返回本次确认的笔数（另一个线程正在确认时返回 0）"""
+        if not self._poller.acquire(blocking=block):
+            return 0
+        try:
+            return self._poll()
+        finally:
+            self._poller.release()
+
+    def _poll(self):
+        with self._rpc:
+            block = self.w3.eth.block_number
+            stale = block == self._last_block
+            self._last_block = block
+            if stale and not self._stuck():
+                return 0
+            # 一次查询就知道哪些 nonce 已上链；更高 nonce 的交易不必逐笔查回执
+            mined_nonce = self.w3.eth.get_transaction_count(self.address, "latest")
+        done = 0
+        with self._cv:
+            pending = list(self.inflight)
+        for tx in pending:
+            if tx.nonce >= mined_nonce:
+                self._check_pending(tx)
+                continue
+            receipt = self._receipt(tx)
+            if receipt is None:
+                self._resubmit(tx)  # nonce 已被另一笔交易消耗
+                continue
+            with self._cv:
+                self.inflight.remove(tx)
+                self.receipts.append(receipt)
+                self.latencies.append(time.monotonic() - tx.submitted_at)
+                self.confirmed += 1
+                if receipt.status == 0:
+                    self.reverted += 1
+                done += 1
+        if done:
+            with self._cv:
+                self._cv.notify_all()
+        return done
+
+    def _receipt(self, tx):
+        from web3.exceptions import TransactionNotFound
+        for h in reversed(tx.hashes):
+            try:
+                with self._rpc:
+                    return self.w3.eth.get_transaction_receipt(h)
+            except TransactionNotFound:
+                pass
+        return None
+
+    def _stuck(self):
+        return bool(self.inflight) and \
+            time.monotonic() - self.inflight[0].sent_at > self.recheck_after
+
+    def _give_up(self, tx):
+        if tx.attempts < self.max_attempts:
+            return False
+        with self._cv:
+            self.inflight.remove(tx)
+            self.failed.append((tx, "max attempts"))
+            self._cv.notify_all()
+        return True
+
+    def _resubmit(self, tx):
+        """
+        被替换（原 nonce 已被别的交易消耗）：同一 key 之后已提交过更新的交易就直接丢弃，
+        否则用新 nonce 重发，并按新 nonce 移到 inflight 里对应的位置。
+        """
+        if tx.key is not None and self._latest.get(tx.key) is not tx:
+            with self._cv:
+                self.inflight.remove(tx)
+                self.superseded += 1
+                self._cv.notify_all()
+            return
+        if self._give_up(tx):
+            return
+        with self._rpc:
+            tx.nonce = self.nonces.take()
+            tx.gas_price = self.gas_price.get()
+            tx.hashes = []
+            try:
+                self._sign_and_send(tx)
+            except Exception:
+                self.nonces.resync()
+                raise
+        with self._cv:
+            self.inflight.remove(tx)
+            self._enqueue(tx)
+        self.resubmitted += 1
+
+    def _check_pending(self, tx):
+        """
+        未上链的交易超过 recheck_after 秒才检查：节点里查不到（被丢弃）就原样重新广播，
+        超过 stuck_after 秒仍在交易池就同 nonce 加价替换。
+        """
+        from web3.exceptions import TransactionNotFound
+        age = time.monotonic() - tx.sent_at
+        if age < self.recheck_after or self._give_up(tx):
+            return
+        with self._rpc:
+            try:
+                self.w3.eth.get_transaction(tx.hash)
+            except TransactionNotFound:
+                self.w3.eth.send_raw_transaction(tx.raw)
+                tx.sent_at = time.monotonic()
+                tx.attempts += 1
+                self.resubmitted += 1
+                return
+            if age > self.stuck_after:
+                tx.gas_price = max(int(tx.gas_price * REPLACE_BUMP), self.gas_price.get())
+                self._sign_and_send(tx)
+                self.resubmitted += 1
+
+    def _confirm_loop(self):
+        while not self._closed:
+            if self.inflight:
+                try:
+                    self.poll()
+                except Exception as e:  # 确认线程不能因为一次 RPC 失败而退出
+                    print(f"⚠️ 回执确认失败: {e}")
+            time.sleep(self.poll_interval)
+
+    def flush(self, timeout=None):
+        """等待所有在途交易确认（或放弃）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            while self.inflight:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"{len(self.inflight)} 笔交易未确认")
+                self._cv.wait(self.poll_interval)
+        return self.receipts
+
+    def close(self):
+        self.flush()
+        self._closed = True
+        self._thread.join()
+
+    def stats(self):
+        return {"sent": self.sent, "confirmed": self.confirmed, "inflight": len(self.inflight),
+                "resubmitted": self.resubmitted, "superseded": self.superseded,
+                "reverted": self.reverted, "failed": len(self.failed)}
+
+# ---------- 多账户并发 ----------
+
+class AccountPool:
+    """
+    多个签名账户，每个账户一条独立的 nonce 通道（各自一个 TxPipeline）。
+
+    - 调度：在健康的通道里选在途交易最少的，平局时轮转，保证各通道负载均衡；
+    - actor 亲和：同一个 actor（例如同一个持有人）固定走同一条通道，保持其交易顺序；
+    - 价格更新（setPrice / setPrices）只走 price_lane 这一条通道：不同账户的 nonce 互不约束，
+      分散到多条通道后上链顺序就不再固定，链上价格可能倒退；这条通道出错时直接抛出，不换通道；
+    - 故障隔离：某条通道发送出错就暂停 cooldown 秒，其间的交易改走其他通道，
+      一条通道卡住的交易也不会占用其他通道的窗口。
+
+        pool = AccountPool(get_w3(), keys, window=16)
+        pool.submit(contract.functions.mint(holder, amount), actor=holder)
+        pool.close()
+    合约里 owner 以外的账户需要先 setOperator 授权（见 contracts/AlgoStableV2.sol）。
+    """
+
+    def __init__(self, web3, private_keys, window=16, cooldown=30.0, price_lane=0, **pipeline_kw):
+        if not private_keys:
+            raise ValueError("至少需要一个账户私钥")
+        if not 0 <= price_lane < len(private_keys):
+            raise ValueError(f"price_lane 超出范围: {price_lane}")
+        self.w3 = web3
+        self.cooldown = cooldown
+        self.price_lane = price_lane
+        self.lanes = [TxPipeline(web3, web3.eth.account.from_key(k).address, k, window=window,
+                                 **pipeline_kw) for k in private_keys]
+        self.addresses = [lane.address for lane in self.lanes]
+        self.errors = [0] * len(self.lanes)
+        self._paused_until = [0.0] * len(self.lanes)
+        self._rr = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def _healthy(self, now):
+        return [i for i, t in enumerate(self._paused_until) if t <= now]
+
+    def _pick(self, actor, exclude):
+        now = time.monotonic()
+        healthy = [i for i in self._healthy(now) if i not in exclude]
+        if not healthy:
+            # 全部暂停时退而求其次，用暂停最早结束的通道
+            healthy = sorted((i for i in range(len(self.lanes)) if i not in exclude),
+                             key=lambda i: self._paused_until[i])[:1]
+        if not healthy:
+            return None
+        if actor is not None:
+            home = zlib.crc32(str(actor).encode()) % len(self.lanes)
+            if home in healthy:
+                return home
+        with self._lock:
+            n = len(self.lanes)
+            order = sorted(healthy, key=lambda i: (len(self.lanes[i].inflight), (i - self._rr) % n))
+            self._rr = (order[0] + 1) % n
+        return order[0]
+
+    def submit(self, call, actor=None, gas=None):
+        """
+        选一条通道提交，返回交易哈希；通道出错时换一条重试，全部失败才抛出。
+        价格更新固定走 price_lane，保证按提交顺序上链。
+        """
+        if is_price_update(call):
+            i = self.price_lane
+            try:
+                return self.lanes[i].submit(call, gas=gas)
+            except Exception:
+                self.errors[i] += 1
+                raise
+        tried = set()
+        while True:
+            i = self._pick(actor, tried)
+            if i is None:
+                raise RuntimeError(f"所有 {len(self.lanes)} 个账户都提交失败")
+            try:
+                return self.lanes[i].submit(call, gas=gas)
+            except Exception as e:
+                tried.add(i)
+                self.errors[i] += 1
+                self._paused_until[i] = time.monotonic() + self.cooldown
+                print(f"⚠️ 账户 {self.addresses[i]} 提交失败，暂停 {self.cooldown:.0f}s: {e}")
+
+    def flush(self, timeout=None):
+        return [r for lane in self.lanes for r in lane.flush(timeout)]
+
+    def close(self):
+        for lane in self.lanes:
+            lane.close()
+
+    def stats(self):
+        lanes = [{**lane.stats(), "errors": err} for lane, err in zip(self.lanes, self.errors)]
+        total = {k: sum(l[k] for l in lanes) for k in lanes[0]}
+        return {"total": total, "lanes": lanes}
+
+# ---------- 批量价格更新 ----------
+
+BATCH_BASE_GAS = 80000      # setPrices 的固定开销上限（交易基础费 + 两次 SSTORE + 事件）
+BATCH_GAS_PER_STEP = 2000   # 每步：calldata 32 字节 + 事件数据 32 字节 + 循环
+
+def pack_price(step, price_wei):
+    """(step, price) -> setPrices 的一个元素：(step << 128) | price"""
+    if not 0 <= price_wei < 1 << 128:
+        raise ValueError(f"价格超出 uint128: {price_wei}")
+    return (int(step) << 128) | int(price_wei)
+
+def unpack_prices(packed):
+    """PricesUpdated 事件里的数组 -> [(step, price_wei)]"""
+    mask = (1 << 128) - 1
+    return [(x >> 128, x & mask) for x in packed]
+
+class PriceBatcher:
+    """
+    攒批的价格提交：add() 累积 (step, price)，攒满 max_steps 步或距上次发送超过
+    max_delay 秒时调用一次 setPrices。有 pipeline 时经流水线提交，否则用 send_txn。
+    用完调用 flush() 发出剩余的步。
+
+    合约要求步号跨批次递增（大于链上的 priceStep），而每次模拟都从第 1 步开始：
+    写入链上的步号是 step_base + step，step_base 默认取构造时合约当前的 priceStep。
+    """
+
+    def __init__(self, contract, pipeline=None, max_steps=64, max_delay=2.0, step_base=None):
+        self.contract = contract
+        self.pipeline = pipeline
+        self.max_steps = max(int(max_steps), 1)
+        self.max_delay = max_delay
+        if step_base is None:
+            step_base = contract.functions.priceStep().call()
+        self.step_base = int(step_base)
+        self._buf = []
+        self._since = time.monotonic()
+        self.batches = 0
+        self.steps = 0
+
+    def add(self, step, price_wei):
+        self._buf.append(pack_price(self.step_base + step, price_wei))
+        if len(self._buf) >= self.max_steps or time.monotonic() - self._since >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if not self._buf:
+            return None
+        packed, self._buf = self._buf, []
+        gas = BATCH_BASE_GAS + BATCH_GAS_PER_STEP * len(packed)
+        if self.pipeline is not None:
+            tx_hash = self.pipeline.submit(self.contract.functions.setPrices(packed), gas=gas)
+        else:
+            tx_hash = send_txn(self.contract.functions.setPrices, self.contract, packed, gas=gas)
+        self._since = time.monotonic()
+        self.batches += 1
+        self.steps += len(packed)
+        return tx_hash
+
+# ---------- 单笔发送（兼容旧接口） ----------
+
+_nonces = None
+_gas_price = None
+
+def send_txn(fn, contract, *args, gas=DEFAULT_GAS):
+    """签名并广播一笔交易，返回哈希；nonce 本地维护、gas price 缓存，不再每笔查两次链"""
+    global _nonces, _gas_price
+    w3 = get_w3()
+    if _nonces is None:
+        _nonces = NonceManager(w3, signer()[0])
+        _gas_price = GasPriceCache(w3)
+
+    def send(nonce):
+        txn = fn(*args).build_transaction({
+            "from": _nonces.address,
+            "nonce": nonce,
+            "gas": gas,
+            "gasPrice": _gas_price.get(),
+            "chainId": _nonces.chain_id,
+        })
+        signed_txn = w3.eth.account.sign_transaction(txn, private_key=signer()[1])
+        return w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+
+    try:
+        tx_hash = send(_nonces.take())
+    except Exception as e:
+        # 与 TxPipeline.submit 相同：没发出去的 nonce 不能留空洞
+        _nonces.resync()
+        if "nonce" not in str(e).lower():
+            raise
+        tx_hash = send(_nonces.take())
+    return tx_hash.hex()
@@ -0,0 +1,36 @@
+# benchmarks/_chain.py
+"""
+基准测试共用的本地链工具：连接 RPC（例如 anvil）或进程内的 eth-tester，编译并部署 AlgoStableV2。
+"""
+from web3 import Web3
+
+from backend.localchain import TESTER_KEYS, compile_contracts, dev_keys
+
+def connect(rpc=None):
+    """返回 (w3, 私钥列表)；不给 rpc 时用进程内的 eth-tester（自动出块）"""
+    if rpc:
+        w3 = Web3(Web3.HTTPProvider(rpc))
+        if not w3.is_connected():
+            raise SystemExit(f"连不上 {rpc}（先启动 anvil --block-time 1）")
+        return w3, dev_keys()
+    from web3 import EthereumTesterProvider
+    return Web3(EthereumTesterProvider()), TESTER_KEYS
+
+def compile_stable():
+    """编译 contracts/AlgoStableV2.sol，返回 (abi, bytecode)；需要 py-solc-x"""
+    return compile_contracts(["AlgoStableV2.sol"])["AlgoStableV2"]
+
+def deploy_stable(w3, key):
+    """部署 AlgoStableV2（lunaToken 随便填一个地址，setPrice 用不到），返回合约对象"""
+    abi, bytecode = compile_stable()
+    acct = w3.eth.account.from_key(key)
+    factory = w3.eth.contract(abi=abi, bytecode=bytecode)
+    txn = factory.constructor(acct.address).build_transaction({
+        "from": acct.address,
+        "nonce": w3.eth.get_transaction_count(acct.address, "pending"),
+        "gas": 3_000_000,
+        "gasPrice": w3.eth.gas_price,
+    })
+    signed = w3.eth.account.sign_transaction(txn, private_key=key)
+    receipt = w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(signed.raw_transaction))
+    return w3.eth.contract(address=receipt.contractAddress, abi=abi)
@@ -0,0 +1,60 @@
+# benchmarks/onchain_accounts.py
+"""
+多账户并发吞吐：AccountPool 把交易分到 N 个签名账户（各自的 nonce 通道），
+比较账户数增加时的每秒交易数。
+
+    anvil --block-time 1 &
+    python -m benchmarks.onchain_accounts --rpc http://127.0.0.1:8545 --accounts 1,2,4,8 --n 400
+
+--mode mint 模拟很多持有人各自 mint（需要 py-solc-x 编译合约，并给每个账户 setOperator）；
+默认 --mode transfer 发普通转账。不给 --rpc 时用进程内的 eth-tester（每笔立即出块，只做冒烟测试）。
+"""
+import argparse
+import time
+
+from benchmarks._chain import connect, deploy_stable
+from backend.web3_api import AccountPool, TxPipeline
+
+def authorize(w3, contract, owner_key, addresses):
+    owner = w3.eth.account.from_key(owner_key).address
+    pipe = TxPipeline(w3, owner, owner_key, window=len(addresses))
+    for addr in addresses:
+        if addr != owner:
+            pipe.submit(contract.functions.setOperator(addr, True))
+    pipe.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="AccountPool 吞吐 vs 账户数")
+    ap.add_argument("--rpc", default=None)
+    ap.add_argument("--accounts", default="1,2,4", help="账户数，逗号分隔")
+    ap.add_argument("--n", type=int, default=100, help="每轮提交的交易数")
+    ap.add_argument("--holders", type=int, default=50, help="mint 模式下的持有人数")
+    ap.add_argument("--window", type=int, default=16, help="每个账户的在途窗口")
+    ap.add_argument("--mode", choices=("transfer", "mint"), default="transfer")
+    args = ap.parse_args(argv)
+
+    w3, keys = connect(args.rpc)
+    counts = [int(x) for x in args.accounts.split(",")]
+    if max(counts) > len(keys):
+        raise SystemExit(f"最多 {len(keys)} 个预充值账户")
+    holders = [w3.eth.account.create().address for _ in range(args.holders)]
+    if args.mode == "mint":
+        contract = deploy_stable(w3, keys[0])
+        authorize(w3, contract, keys[0], [w3.eth.account.from_key(k).address for k in keys])
+        make_call = lambda i: contract.functions.mint(holders[i % len(holders)], 10**18)
+    else:
+        make_call = lambda i: {"to": holders[i % len(holders)], "value": 1}
+
+    print(f"{'accounts':>8} {'tx':>5} {'seconds':>8} {'tx/s':>8}  per-lane confirmed")
+    for n_acc in counts:
+        pool = AccountPool(w3, keys[:n_acc], window=args.window, poll_interval=0.05)
+        t0 = time.perf_counter()
+        for i in range(args.n):
+            pool.submit(make_call(i), actor=holders[i % len(holders)])
+        pool.close()
+        dt = time.perf_counter() - t0
+        lanes = [lane["confirmed"] for lane in pool.stats()["lanes"]]
+        print(f"{n_acc:>8} {args.n:>5} {dt:>8.2f} {args.n / dt:>8.1f}  {lanes}")
+
+if __name__ == "__main__":
+    main()
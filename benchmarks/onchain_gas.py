@@ -0,0 +1,58 @@
+# benchmarks/onchain_gas.py
+"""
+每步 gas：逐步 setPrice 与不同批大小的 setPrices 对比（价格来自 Terra 预设的一段真实轨迹）。
+
+    python -m benchmarks.onchain_gas --steps 256 --batches 8,32,128
+    python -m benchmarks.onchain_gas --rpc http://127.0.0.1:8545
+
+需要 py-solc-x（编译 contracts/AlgoStableV2.sol）；不给 --rpc 时用进程内的 eth-tester。
+"""
+import argparse
+
+from benchmarks._chain import connect, deploy_stable
+from backend.presets import get_preset
+from backend.rng import NoiseStream
+from backend.runner import iter_simulation
+from backend.web3_api import PriceBatcher, TxPipeline
+
+def trajectory_prices(n_steps, seed=0):
+    return [(step, int(s["ust_price"] * 1e18))
+            for step, s in iter_simulation(get_preset("terra"), n_steps, rng=NoiseStream(seed))]
+
+def run(w3, key, contract, prices, batch):
+    address = w3.eth.account.from_key(key).address
+    pipe = TxPipeline(w3, address, key, window=16, poll_interval=0.05)
+    if batch <= 1:
+        for _, p in prices:
+            pipe.submit(contract.functions.setPrice(p))
+    else:
+        batcher = PriceBatcher(contract, pipe, max_steps=batch, max_delay=float("inf"))
+        for step, p in prices:
+            batcher.add(step, p)
+        batcher.flush()
+    receipts = pipe.flush()
+    pipe.close()
+    assert contract.functions.price().call() == prices[-1][1]
+    return sum(r.gasUsed for r in receipts), len(receipts)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="setPrice vs setPrices 每步 gas")
+    ap.add_argument("--rpc", default=None)
+    ap.add_argument("--steps", type=int, default=256)
+    ap.add_argument("--batches", default="8,32,128", help="批大小，逗号分隔（1 为逐步 setPrice）")
+    args = ap.parse_args(argv)
+
+    w3, keys = connect(args.rpc)
+    contract = deploy_stable(w3, keys[0])
+    prices = trajectory_prices(args.steps)
+
+    print(f"{'batch':>6} {'txs':>5} {'gas total':>12} {'gas/step':>9} {'vs single':>9}")
+    base = None
+    for batch in [1, *(int(x) for x in args.batches.split(","))]:
+        gas, txs = run(w3, keys[0], contract, prices, batch)
+        per_step = gas / len(prices)
+        base = base or per_step
+        print(f"{batch:>6} {txs:>5} {gas:>12,} {per_step:>9,.0f} {per_step / base:>8.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# benchmarks/onchain_loop.py
+"""
+链上模式端到端：在本地链（backend/localchain.py）上跑完整的模拟循环，
+报告每秒确认交易数、每步循环耗时和单笔交易从提交到确认的延迟。
+
+    python -m benchmarks.onchain_loop --backend tester --steps 200 --windows 1,16 --batches 1,16
+    python -m benchmarks.onchain_loop --backend anvil --block-time 1 --mirror-supply
+
+--mirror-supply 时每步除价格外还把 UST 供应量变化发成 mint / redeem。
+"""
+import argparse
+
+from backend.localchain import BACKENDS, LocalChain, run_onchain
+from backend.presets import PRESETS, load_scenario
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="本地链上的链上模式端到端基准")
+    ap.add_argument("--backend", choices=BACKENDS, default="tester")
+    ap.add_argument("--block-time", type=float, default=None, help="anvil 出块间隔（秒）")
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="terra")
+    ap.add_argument("--steps", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--windows", default="1,16", help="在途窗口大小，逗号分隔")
+    ap.add_argument("--batches", default="1", help="每笔 setPrices 的步数，逗号分隔")
+    ap.add_argument("--mirror-supply", action="store_true")
+    args = ap.parse_args(argv)
+
+    with LocalChain.start(args.backend, block_time=args.block_time) as chain:
+        print(f"{'window':>6} {'batch':>5} {'steps':>5} {'tx':>5} {'seconds':>8} {'tx/s':>7} "
+              f"{'steps/s':>8} {'step ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+        for window in (int(x) for x in args.windows.split(",")):
+            for batch in (int(x) for x in args.batches.split(",")):
+                _, st = run_onchain(chain, load_scenario(args.preset), args.steps, args.seed,
+                                    window=window, batch=batch, mirror_supply=args.mirror_supply)
+                print(f"{window:>6} {batch:>5} {st['steps']:>5} {st['confirmed']:>5} "
+                      f"{st['seconds']:>8.2f} {st['tx_per_s']:>7.1f} {st['steps_per_s']:>8.1f} "
+                      f"{st['step_ms']:>8.2f} {st['latency_p50_ms']:>7.0f} "
+                      f"{st['latency_p95_ms']:>7.0f}")
+
+if __name__ == "__main__":
+    main()
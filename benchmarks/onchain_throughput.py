@@ -0,0 +1,45 @@
+# benchmarks/onchain_throughput.py
+"""
+链上提交吞吐：同一账户用 TxPipeline 连续提交 setPrice，比较不同在途窗口下的每秒更新数。
+
+    anvil --block-time 1 &
+    python -m benchmarks.onchain_throughput --rpc http://127.0.0.1:8545 --n 200 --windows 1,4,16,64
+
+不给 --rpc 时用进程内的 eth-tester：它每笔交易立刻出块，只能检查流水线是否正确，
+看不出窗口的作用。--transfer 改为发普通转账（不需要编译合约）。
+"""
+import argparse
+import time
+
+from benchmarks._chain import connect, deploy_stable
+from backend.web3_api import TxPipeline
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="TxPipeline 吞吐 vs 在途窗口")
+    ap.add_argument("--rpc", default=None, help="本地开发链 RPC（默认进程内 eth-tester）")
+    ap.add_argument("--n", type=int, default=100, help="每个窗口提交的交易数")
+    ap.add_argument("--windows", default="1,4,16", help="在途窗口大小，逗号分隔")
+    ap.add_argument("--transfer", action="store_true", help="发普通转账而不是 setPrice")
+    args = ap.parse_args(argv)
+
+    w3, keys = connect(args.rpc)
+    key = keys[0]
+    address = w3.eth.account.from_key(key).address
+    if args.transfer:
+        make_call = lambda i: {"to": address, "value": 0}
+    else:
+        contract = deploy_stable(w3, key)
+        make_call = lambda i: contract.functions.setPrice(10**18 - i)
+
+    print(f"{'window':>6} {'tx':>5} {'seconds':>8} {'updates/s':>10}  stats")
+    for window in (int(x) for x in args.windows.split(",")):
+        pipe = TxPipeline(w3, address, key, window=window, poll_interval=0.05)
+        t0 = time.perf_counter()
+        for i in range(args.n):
+            pipe.submit(make_call(i))
+        pipe.close()
+        dt = time.perf_counter() - t0
+        print(f"{window:>6} {args.n:>5} {dt:>8.2f} {args.n / dt:>10.1f}  {pipe.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# benchmarks/suite.py
+"""
+离线基准套件（不需要链、不需要网络）：
+
+  - micro：bounded_impact_asym、cpmm_swap_x_for_y、单步 compute_new_state；
+  - macro：Terra 预设整段运行 500 / 10k / 1M 步，以及 1000 条路径的批量引擎；
+  - controller：本地模式的 simulate_step 循环；
+  - frontend：记录轨迹 -> DataFrame -> build_figure，以及前端回放用的增量仪表盘。
+
+    python -m benchmarks.suite run --out bench.json              # 全部（1M 步约半分钟）
+    python -m benchmarks.suite run --quick --filter 'micro|frontend'
+    python -m benchmarks.suite run --quick --baseline bench.json  # 跑完直接对比
+    python -m benchmarks.suite compare bench.json new.json --threshold 0.15
+
+结果 JSON：{"meta": {...}, "results": {名称: {"median_s", "min_s", "repeat", "number",
+"units", "unit", "per_unit_s"}}}，时间均为一次调用的秒数。
+compare 按 median 对比，变慢超过 threshold 的记为回归，有回归时退出码为 1。
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from backend.model import MODEL_VERSION
+
+# 名称 -> (setup, units, unit, slow)；setup() 返回一个无参的被测函数
+BENCHES: Dict[str, tuple] = {}
+
+def bench(name: str, units: int = 1, unit: str = "call", slow: bool = False):
+    def deco(setup: Callable[[], Callable[[], object]]):
+        BENCHES[name] = (setup, units, unit, slow)
+        return setup
+    return deco
+
+def _terra():
+    from backend.presets import get_preset
+    return get_preset("terra")
+
+def _states(n_steps: int, seed: int = 0):
+    from backend.rng import NoiseStream
+    from backend.runner import iter_simulation
+    return list(iter_simulation(_terra(), n_steps, rng=NoiseStream(seed)))
+
+# ---------- micro ----------
+
+@bench("micro.bounded_impact_asym")
+def _bounded_impact():
+    from backend.model import bounded_impact_asym
+    return lambda: bounded_impact_asym(0.98, -2.5e7, 4e8, 1.0, 0.02, 0.35)
+
+@bench("micro.cpmm_swap_x_for_y")
+def _cpmm():
+    from backend.model import cpmm_swap_x_for_y
+    return lambda: cpmm_swap_x_for_y(4e8, 5e6, 2.5e7, 0.003, 8.0)
+
+@bench("micro.compute_new_state", unit="step")
+def _step():
+    from backend.model import compute_new_state
+    from backend.rng import NoiseStream
+    step, state = _states(40)[-1]  # 冲击之后：赎回 / LFG / AMM 分支都在走
+    rng = NoiseStream(0)
+    # 重复推进同一个输入状态（只有预言机环形缓冲被原地写入，不影响每步的工作量）
+    return lambda: compute_new_state(state, step=step + 1, rng=rng)
+
+# ---------- macro ----------
+
+def _run(n_steps: int, fast: bool = True):
+    from backend.runner import run_simulation
+    return lambda: run_simulation(_terra(), n_steps, seed=0, fast=fast)
+
+bench("macro.terra_500", units=500, unit="step")(lambda: _run(500))
+bench("macro.terra_10k", units=10_000, unit="step")(lambda: _run(10_000))
+# 逐步调用 compute_new_state 的参照路径（快进内核的基线）
+bench("macro.terra_10k_stepwise", units=10_000, unit="step")(lambda: _run(10_000, fast=False))
+bench("macro.terra_1m", units=1_000_000, unit="step", slow=True)(lambda: _run(1_000_000))
+
+@bench("macro.ensemble_1000x500", units=500_000, unit="path-step")
+def _ensemble():
+    from backend.ensemble import run_ensemble
+    return lambda: run_ensemble(_terra(), 1000, 500, seed=0)
+
+# ---------- controller ----------
+
+@bench("controller.simulate_step_local_500", units=500, unit="step")
+def _simulate_step():
+    from backend.controller import simulate_step
+    from backend.rng import NoiseStream
+
+    def run():
+        state, rng = _terra(), NoiseStream(0)
+        # 本地模式每步打印一行，这也是它真实开销的一部分；输出丢进内存缓冲
+        with contextlib.redirect_stdout(io.StringIO()):
+            for step in range(1, 501):
+                state = simulate_step(state, None, step=step, rng=rng)
+        return state
+    return run
+
+# ---------- frontend 数据通路 ----------
+
+@bench("frontend.record_500", units=500, unit="step")
+def _record():
+    from backend.trajectory import TrajectoryRecorder
+    states, init = _states(500), _terra()
+
+    def run():
+        rec = TrajectoryRecorder(initial_state=init)
+        for step, s in states:
+            rec.append(step, s)
+        return rec
+    return run
+
+def _recorder(n_steps: int):
+    from backend.trajectory import TrajectoryRecorder
+    rec = TrajectoryRecorder(initial_state=_terra())
+    for step, s in _states(n_steps):
+        rec.append(step, s)
+    return rec
+
+@bench("frontend.frame_500")
+def _frame():
+    rec = _recorder(500)
+    return rec.frame
+
+@bench("frontend.build_figure_500")
+def _build_figure():
+    from frontend.dashboard import build_figure
+    df = _recorder(500).frame()
+    return lambda: build_figure(df)
+
+@bench("frontend.playback_500", units=63, unit="frame")
+def _playback():
+    # 与前端本地模式相同：预先算好的轨迹，每帧前进 8 步、增量重绘
+    from backend.trajectory import TrajectoryView
+    from frontend.dashboard import LiveDashboard
+    cols = _recorder(500).columns_dict()
+
+    def run():
+        view, dash = TrajectoryView(cols), LiveDashboard(points_per_trace=2000)
+        for cursor in range(8, 508, 8):
+            view.cursor = min(cursor, view.n_steps)
+            dash.update(view)
+    return run
+
+# ---------- 计时 ----------
+
+def _timed(fn: Callable[[], object]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.2,
+            budget: float = 10.0) -> Dict:
+    """
+    热身一次（惰性导入等一次性开销不计入）后估计耗时，凑够 min_time 秒为一组（number 次），
+    跑 repeat 组取 median / min；单次就很慢的基准按 budget 秒减少组数，热身那次也算一组。
+    """
+    first = _timed(fn)
+    slow = first * repeat > budget
+    if not slow:
+        first = _timed(fn)
+    number = max(1, math.ceil(min_time / first)) if first > 0 else 1000
+    samples = [first] if slow else []
+    repeat = max(1, min(repeat, int(budget / max(first * number, 1e-9))))
+    while len(samples) < repeat:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return {"median_s": statistics.median(samples), "min_s": min(samples),
+            "repeat": len(samples), "number": number}
+
+def _meta() -> Dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=os.path.dirname(__file__), timeout=5).stdout.strip()
+    except Exception:
+        rev = ""
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": rev or None,
+            "model_version": MODEL_VERSION, "python": platform.python_version(),
+            "numpy": np.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count()}
+
+def run_suite(pattern: Optional[str] = None, quick: bool = False, repeat: int = 5,
+              verbose: bool = True) -> Dict:
+    results, skipped = {}, {}
+    for name, (setup, units, unit, slow) in BENCHES.items():
+        if (pattern and not re.search(pattern, name)) or (quick and slow):
+            continue
+        try:
+            fn = setup()
+        except ImportError as e:  # 例如没装 plotly / pandas
+            skipped[name] = str(e)
+            if verbose:
+                print(f"{name:<36} skipped: {e}")
+            continue
+        r = measure(fn, repeat=repeat)
+        r.update(units=units, unit=unit, per_unit_s=r["median_s"] / units)
+        results[name] = r
+        if verbose:
+            print(f"{name:<36} {_fmt(r['median_s']):>10}  {_fmt(r['per_unit_s']):>10}/{unit}"
+                  f"  (min {_fmt(r['min_s'])}, {r['repeat']}x{r['number']})")
+    return {"meta": _meta(), "results": results, "skipped": skipped}
+
+def _fmt(sec: float) -> str:
+    for scale, suffix in ((1, "s"), (1e-3, "ms"), (1e-6, "µs")):
+        if sec >= scale:
+            return f"{sec / scale:.3g} {suffix}"
+    return f"{sec / 1e-9:.3g} ns"
+
+# ---------- 对比 ----------
+
+def compare(baseline: Dict, current: Dict, threshold: float = 0.15) -> Dict[str, list]:
+    """按 median 对比两份结果：{"regressed": [...], "improved": [...], "ok": [...], "missing": [...]}"""
+    base, cur = baseline["results"], current["results"]
+    out = {"regressed": [], "improved": [], "ok": [], "missing": sorted(set(base) - set(cur))}
+    for name in sorted(set(base) & set(cur)):
+        ratio = cur[name]["median_s"] / base[name]["median_s"]
+        kind = "regressed" if ratio > 1 + threshold else \
+            "improved" if ratio < 1 - threshold else "ok"
+        out[kind].append((name, ratio))
+    return out
+
+def print_comparison(diff: Dict[str, list], threshold: float) -> None:
+    print(f"{'benchmark':<36} {'ratio':>7}  (threshold ±{threshold:.0%})")
+    rows = [(n, r, k) for k in ("regressed", "improved", "ok") for n, r in diff[k]]
+    for name, ratio, kind in sorted(rows):
+        mark = {"regressed": "❌ slower", "improved": "✅ faster", "ok": ""}[kind]
+        print(f"{name:<36} {ratio:>7.2f}  {mark}")
+    for name in diff["missing"]:
+        print(f"{name:<36} {'-':>7}  not run")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="离线基准套件")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="运行基准")
+    r.add_argument("--filter", default=None, help="只运行名称匹配该正则的基准")
+    r.add_argument("--quick", action="store_true", help="跳过 slow（1M 步）")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--out", default=None, help="结果 JSON")
+    r.add_argument("--baseline", default=None, help="跑完后与该结果对比")
+    r.add_argument("--threshold", type=float, default=0.15)
+    r.add_argument("--list", action="store_true", help="只列出基准名称")
+    c = sub.add_parser("compare", help="对比两份结果")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.15)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run" and args.list:
+        for name, (_, units, unit, slow) in BENCHES.items():
+            print(f"{name:<36} {units} {unit}{'  (slow)' if slow else ''}")
+        return 0
+    if args.cmd == "run":
+        current = run_suite(args.filter, args.quick, args.repeat)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(current, f, indent=2)
+            print(f"✅ 结果已写入 {args.out}")
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+    diff = compare(baseline, current, args.threshold)
+    print_comparison(diff, args.threshold)
+    return 1 if diff["regressed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
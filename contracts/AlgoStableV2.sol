@@ -6,11 +6,16 @@ import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
 contract AlgoStableV2 is ERC20 {
     address public owner;
     uint256 public price; // 模拟稳定币当前价格（USD * 1e18）
+    uint256 public priceStep; // 当前 price 对应的步号（setPrices 写入；setPrice 视为下一步）
     ERC20 public lunaToken;
+    mapping(address => bool) public operators; // 除 owner 外可以提交价格 / mint / redeem 的账户
 
     event PriceUpdated(uint256 newPrice);
+    // 一批价格只发一个事件：packed[i] = (step << 128) | price，链下按步还原
+    event PricesUpdated(uint256 indexed lastStep, uint256[] packed);
     event Minted(address indexed user, uint256 ustAmount);
     event Redeemed(address indexed user, uint256 ustAmount, uint256 lunaMinted);
+    event OperatorSet(address indexed account, bool enabled);
 
     constructor(address lunaAddr) ERC20("AlgoStable", "UST") {
         owner = msg.sender;
@@ -23,20 +28,49 @@ contract AlgoStableV2 is ERC20 {
         _;
     }
 
-    // 后端更新价格（模拟外部市场变化）
-    function setPrice(uint256 newPrice) external onlyOwner {
+    modifier onlyOperator() {
+        require(msg.sender == owner || operators[msg.sender], "only operator");
+        _;
+    }
+
+    // 多账户并发提交：授权 / 撤销操作员账户
+    function setOperator(address account, bool enabled) external onlyOwner {
+        operators[account] = enabled;
+        emit OperatorSet(account, enabled);
+    }
+
+    // 后端更新价格（模拟外部市场变化）；不带步号，记为 priceStep 的下一步，
+    // 之后的 setPrices 仍须从更大的步号开始
+    function setPrice(uint256 newPrice) external onlyOperator {
         price = newPrice;
+        priceStep += 1;
         emit PriceUpdated(newPrice);
     }
 
+    // 批量更新价格：一笔交易写入多步，只落盘最后一个价格。
+    // 步号在批内、跨批次都必须递增（首步 > priceStep），重发或迟到的旧批次会被拒绝
+    function setPrices(uint256[] calldata packed) external onlyOperator {
+        uint256 n = packed.length;
+        require(n > 0, "empty batch");
+        uint256 prev = priceStep;
+        for (uint256 i = 0; i < n; ++i) {
+            uint256 step = packed[i] >> 128;
+            require(step > prev, "steps must increase");
+            prev = step;
+        }
+        price = packed[n - 1] & type(uint128).max;
+        priceStep = prev;
+        emit PricesUpdated(prev, packed);
+    }
+
     // 模拟 mint：用户存 LUNA，换 UST
-    function mint(address to, uint256 ustAmount) external onlyOwner {
+    function mint(address to, uint256 ustAmount) external onlyOperator {
         _mint(to, ustAmount);
         emit Minted(to, ustAmount);
     }
 
     // 模拟 redeem：销毁 UST，生成新的 LUNA
-    function redeem(address from, uint256 ustAmount, uint256 lunaToMint) external onlyOwner {
+    function redeem(address from, uint256 ustAmount, uint256 lunaToMint) external onlyOperator {
         _burn(from, ustAmount);
         emit Redeemed(from, ustAmount, lunaToMint);
     }
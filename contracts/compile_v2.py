@@ -1,26 +1,21 @@
-from solcx import compile_files, install_solc
 import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.solbuild import build  # 按源码哈希缓存编译产物，未变化时不再调用 solc
 
-# 1. 安装编译器
-install_solc("0.8.20")
+# 1. 编译（solc 未安装时自动安装；源码没变时直接读缓存）
+compiled = build(["AlgoStableV2.sol"])
 
-# 2. 编译文件
-compiled = compile_files(
-    ["AlgoStableV2.sol"],
-    output_values=["abi", "bin"],
-    solc_version="0.8.20",
-    import_remappings=["@openzeppelin=node_modules/@openzeppelin"]
-)
+# 2. 找到合约数据
+contract_id, contract_interface = "AlgoStableV2", compiled["AlgoStableV2"]
 
-# 3. 找到合约数据 (文件名:合约名)
-contract_id, contract_interface = list(compiled.items())[0]
-
-# 4. 导出 ABI 文件
+# 3. 导出 ABI 文件
 with open("../backend/AlgoStableV2_abi.json", "w") as f:
     json.dump(contract_interface["abi"], f)
 
 print("✅ 编译成功！ABI 已导出到 ../backend/AlgoStableV2_abi.json")
 
-# 5. 打印合约详情
+# 4. 打印合约详情
 print("Contract key:", contract_id)
 print("Bytecode size:", len(contract_interface["bin"]))
\ No newline at end of file
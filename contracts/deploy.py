@@ -1,11 +1,12 @@
 from web3 import Web3
-from solcx import compile_files, install_solc
 import os
 from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.solbuild import build  # 按源码哈希缓存编译产物，未变化时不再调用 solc
 
 print("✅ compile start")
 load_dotenv()
-install_solc("0.8.20")
 
 INFURA_URL = f"https://sepolia.infura.io/v3/{os.getenv('INFURA_KEY')}"
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
@@ -13,14 +14,10 @@ ACCOUNT_ADDRESS = os.getenv("ACCOUNT_ADDRESS")
 
 w3 = Web3(Web3.HTTPProvider(INFURA_URL))
 
-compiled = compile_files(
-    ["MyToken.sol", "AlgoStable.sol"],
-    solc_version="0.8.20",
-    import_remappings=["@openzeppelin=node_modules/@openzeppelin"]
-)
+compiled = build(["MyToken.sol", "AlgoStable.sol"])
 
-MyToken = compiled["MyToken.sol:MyToken"]
-AlgoStable = compiled["AlgoStable.sol:AlgoStable"]
+MyToken = compiled["MyToken"]
+AlgoStable = compiled["AlgoStable"]
 
 acct = w3.eth.account.from_key(PRIVATE_KEY)
 
@@ -1,7 +1,9 @@
 from web3 import Web3
 import os, json
-from solcx import compile_files
 from dotenv import load_dotenv
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.solbuild import build  # 按源码哈希缓存编译产物，未变化时不再调用 solc
 
 # 加载环境变量
 load_dotenv(".env")  # 如果 .env 在项目根目录，请注意路径
@@ -16,14 +18,8 @@ print("✅ 连接 Infura:", w3.is_connected())
 # 转换为 checksum 地址
 LUNA_ADDR = w3.to_checksum_address(LUNA_ADDR)
 ACCOUNT_ADDRESS = w3.to_checksum_address(ACCOUNT_ADDRESS)
-# 读取编译结果
-compiled = compile_files(
-    ["AlgoStableV2.sol"],
-    output_values=["abi", "bin"],
-    solc_version="0.8.20",
-    import_remappings=["@openzeppelin=node_modules/@openzeppelin"]
-)
-contract_id, contract_interface = list(compiled.items())[0]
+# 读取编译结果（有缓存时不调用 solc）
+contract_interface = build(["AlgoStableV2.sol"])["AlgoStableV2"]
 
 abi = contract_interface['abi']
 bytecode = contract_interface['bin']
@@ -0,0 +1,298 @@
+# frontend/dashboard.py
+"""
+4×2 Plotly dashboard.
+
+- build_figure(df): full rebuild from a DataFrame (smoothing + every point).
+- LiveDashboard: incremental mode for long runs. The figure is built once; each
+  update only consumes the steps recorded since the previous update, keeps the
+  rolling smoothing as a running window, and ships at most `points_per_trace`
+  min/max-decimated points per trace, so redraw cost stays flat as runs grow.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+SMOOTH_WINDOW = 5
+
+SUBPLOT_TITLES = (
+    "💎 LUNA Spot Price (CEX)",
+    "🟩 UST Spot Price (CEX)",
+    "🔥 LUNA Mint / Burn / Total Supply",
+    "💧 UST Mint / Burn / Total Supply",
+    "🏛️ AMM vs CEX: LUNA Price (USD)",
+    "🏦 LFG Reserve / Intervention & Price Spreads",
+    "🧮 AMM Pool Balances (UST & LUNA)",
+    "⚙️ AMM Constant Product k (relative) & UST Share",
+)
+
+# One entry per trace, in drawing order:
+# (column, trace name, row, col, secondary_y, kind, smoothed, style)
+TRACES = (
+    # Row 1: prices (smoothed + spline)
+    ("LUNA Price", "LUNA (CEX)", 1, 1, None, "line", True,
+     dict(line=dict(color="#1f77b4", width=2))),
+    ("UST Price", "UST (CEX)", 1, 2, None, "line", True,
+     dict(line=dict(color="#d62728", width=2))),
+    # Row 2: supply + mint/burn
+    ("LUNA Supply", "LUNA Supply", 2, 1, False, "line", False,
+     dict(line=dict(color="#7f7f7f", width=2))),
+    ("LUNA Minted", "LUNA Minted", 2, 1, True, "bar", False,
+     dict(marker_color="#2ca02c", opacity=0.6)),
+    ("LUNA Burned", "LUNA Burned", 2, 1, True, "bar", False,
+     dict(marker_color="#d62728", opacity=0.6)),
+    ("UST Supply", "UST Supply", 2, 2, False, "line", False,
+     dict(line=dict(color="#7f7f7f", width=2))),
+    ("UST Minted", "UST Minted", 2, 2, True, "bar", False,
+     dict(marker_color="#2ca02c", opacity=0.6)),
+    ("UST Burned", "UST Burned", 2, 2, True, "bar", False,
+     dict(marker_color="#d62728", opacity=0.6)),
+    # Row 3: AMM vs CEX + LFG
+    ("LUNA Price", "LUNA (CEX, USD)", 3, 1, None, "line", True,
+     dict(line=dict(color="#1f77b4", width=2))),
+    ("AMM LUNA Price (USD)", "LUNA (AMM, USD)", 3, 1, None, "line", True,
+     dict(line=dict(color="#ff7f0e", width=2, dash="dot"))),
+    ("Spread UST", "UST spread (CEX - 1)", 3, 2, False, "line", True,
+     dict(line=dict(color="#9467bd"))),
+    ("Spread LUNA", "LUNA spread (CEX - AMM)", 3, 2, False, "line", True,
+     dict(line=dict(color="#8c564b", dash="dot"))),
+    ("LFG Reserve", "LFG Reserve (USD)", 3, 2, True, "line", False,
+     dict(line=dict(color="#2ca02c", width=3))),
+    ("LFG Spent", "LFG spent this step (USD)", 3, 2, True, "bar", False,
+     dict(marker_color="#17becf", opacity=0.5)),
+    # Row 4: pool balances + k / share / slippage
+    ("Pool UST", "Pool UST", 4, 1, False, "line", False,
+     dict(line=dict(color="#1f9a4b"))),
+    ("Pool LUNA", "Pool LUNA", 4, 1, True, "line", False,
+     dict(line=dict(color="#e377c2", dash="dot"))),
+    ("Pool K Rel", "k / k0", 4, 2, True, "line", False,
+     dict(line=dict(color="#ff7f0e", width=2))),
+    ("Pool UST Share", "UST share (0–1)", 4, 2, False, "line", False,
+     dict(line=dict(color="#1f77b4"))),
+    ("Slippage", "Slippage (this step)", 4, 2, False, "bar", False,
+     dict(marker_color="#d62728", opacity=0.35)),
+)
+
+def _empty_figure() -> go.Figure:
+    return make_subplots(
+        rows=4,
+        cols=2,
+        subplot_titles=SUBPLOT_TITLES,
+        specs=[
+            [{}, {}],
+            [{"secondary_y": True}, {"secondary_y": True}],
+            [{}, {"secondary_y": True}],
+            [{"secondary_y": True}, {"secondary_y": True}],
+        ],
+        vertical_spacing=0.11,
+        horizontal_spacing=0.08,
+    )
+
+def _make_trace(name, kind, style, x, y):
+    if kind == "bar":
+        return go.Bar(x=x, y=y, name=name, **style)
+    return go.Scatter(x=x, y=y, mode="lines", name=name, line_shape="spline", **style)
+
+def _add_trace(fig, spec, x, y):
+    _, name, row, col, secondary_y, kind, _, style = spec
+    kw = {} if secondary_y is None else {"secondary_y": secondary_y}
+    fig.add_trace(_make_trace(name, kind, style, x, y), row=row, col=col, **kw)
+
+def _style_axes(fig: go.Figure) -> None:
+    for r in [1, 2, 3, 4]:
+        fig.update_xaxes(title_text="Step", row=r, col=1)
+        fig.update_xaxes(title_text="Step", row=r, col=2)
+
+    fig.update_yaxes(title_text="USD", row=1, col=1)
+    fig.update_yaxes(title_text="USD", row=1, col=2)
+    fig.update_yaxes(title_text="Supply", row=2, col=1, secondary_y=False)
+    fig.update_yaxes(title_text="Mint / Burn", row=2, col=1, secondary_y=True)
+    fig.update_yaxes(title_text="Supply", row=2, col=2, secondary_y=False)
+    fig.update_yaxes(title_text="Mint / Burn", row=2, col=2, secondary_y=True)
+    fig.update_yaxes(title_text="USD", row=3, col=1)
+    fig.update_yaxes(title_text="Spread (USD)", row=3, col=2, secondary_y=False)
+    fig.update_yaxes(title_text="LFG (USD)", row=3, col=2, secondary_y=True)
+    fig.update_yaxes(title_text="Pool UST", row=4, col=1, secondary_y=False)
+    fig.update_yaxes(title_text="Pool LUNA", row=4, col=1, secondary_y=True)
+    fig.update_yaxes(title_text="Share / Slippage", row=4, col=2, secondary_y=False)
+    fig.update_yaxes(title_text="k (relative)", row=4, col=2, secondary_y=True)
+
+    fig.update_layout(
+        height=1280,
+        showlegend=True,
+        legend_tracegroupgap=8,
+        margin=dict(l=20, r=20, t=60, b=20),
+        template="plotly_white",
+    )
+
+# ================= Full rebuild =================
+def build_figure(df: pd.DataFrame) -> go.Figure:
+    # --- Simple smoothing (rolling mean) ---
+    def smooth(s, window=SMOOTH_WINDOW):
+        return s.rolling(window=window, min_periods=1, center=True).mean()
+
+    fig = _empty_figure()
+    for spec in TRACES:
+        column, smoothed = spec[0], spec[6]
+        if column not in df:
+            continue
+        y = smooth(df[column]) if smoothed else df[column]
+        _add_trace(fig, spec, df["Step"], y)
+    _style_axes(fig)
+    return fig
+
+# ================= Incremental mode =================
+class MinMaxDecimator:
+    """
+    Shape-preserving streaming decimation. Samples are grouped into buckets of
+    `width` steps; each bucket keeps its min and max point ("minmax", for lines)
+    or only its max point ("max", for bars). When the bucket count exceeds the
+    budget, neighbouring buckets are merged and the width doubles, so memory and
+    output size stay bounded while every extreme remains visible.
+    """
+
+    def __init__(self, budget: int = 2000, mode: str = "minmax"):
+        self.mode = mode
+        self.max_buckets = max(budget // 2 if mode == "minmax" else budget, 2)
+        self.width = 1
+        self._lo_x = np.empty(0); self._lo_y = np.empty(0)
+        self._hi_x = np.empty(0); self._hi_y = np.empty(0)
+        self._pend_x = np.empty(0); self._pend_y = np.empty(0)
+
+    def extend(self, x: np.ndarray, y: np.ndarray) -> None:
+        x = np.concatenate([self._pend_x, np.asarray(x, dtype=np.float64)])
+        y = np.concatenate([self._pend_y, np.asarray(y, dtype=np.float64)])
+        w = self.width
+        k = len(x) // w
+        if k:
+            X = x[:k * w].reshape(k, w); Y = y[:k * w].reshape(k, w)
+            rows = np.arange(k)
+            Yf = np.where(np.isnan(Y), -np.inf, Y)
+            hi = Yf.argmax(axis=1)
+            self._hi_x = np.concatenate([self._hi_x, X[rows, hi]])
+            self._hi_y = np.concatenate([self._hi_y, Y[rows, hi]])
+            if self.mode == "minmax":
+                lo = np.where(np.isnan(Y), np.inf, Y).argmin(axis=1)
+                self._lo_x = np.concatenate([self._lo_x, X[rows, lo]])
+                self._lo_y = np.concatenate([self._lo_y, Y[rows, lo]])
+        self._pend_x = x[k * w:]; self._pend_y = y[k * w:]
+        while len(self._hi_x) > self.max_buckets:
+            self._merge()
+
+    def _merge(self) -> None:
+        m = len(self._hi_x) // 2 * 2
+        tail = slice(m, None)
+
+        def pairs(a):
+            return a[:m].reshape(-1, 2)
+
+        hx, hy = pairs(self._hi_x), pairs(self._hi_y)
+        pick = np.where(np.isnan(hy[:, 1]) | (hy[:, 0] >= hy[:, 1]), 0, 1)
+        r = np.arange(len(pick))
+        self._hi_x = np.concatenate([hx[r, pick], self._hi_x[tail]])
+        self._hi_y = np.concatenate([hy[r, pick], self._hi_y[tail]])
+        if self.mode == "minmax":
+            lx, ly = pairs(self._lo_x), pairs(self._lo_y)
+            pick = np.where(np.isnan(ly[:, 1]) | (ly[:, 0] <= ly[:, 1]), 0, 1)
+            self._lo_x = np.concatenate([lx[r, pick], self._lo_x[tail]])
+            self._lo_y = np.concatenate([ly[r, pick], self._lo_y[tail]])
+        self.width *= 2
+
+    def points(self):
+        """Decimated (x, y) in step order, followed by the not-yet-bucketed tail."""
+        if self.mode == "minmax":
+            first_lo = self._lo_x <= self._hi_x
+            ax = np.where(first_lo, self._lo_x, self._hi_x)
+            ay = np.where(first_lo, self._lo_y, self._hi_y)
+            bx = np.where(first_lo, self._hi_x, self._lo_x)
+            by = np.where(first_lo, self._hi_y, self._lo_y)
+            xs = np.stack([ax, bx], axis=1).ravel()
+            ys = np.stack([ay, by], axis=1).ravel()
+            same = np.repeat(ax == bx, 2)
+            same[::2] = False  # min and max on the same sample: emit it once
+            xs, ys = xs[~same], ys[~same]
+        else:
+            xs, ys = self._hi_x, self._hi_y
+        return np.concatenate([xs, self._pend_x]), np.concatenate([ys, self._pend_y])
+
+class RunningSmoother:
+    """
+    Centered rolling mean (same as pandas rolling(window, min_periods=1,
+    center=True)), computed only for new samples. Points whose window is
+    complete are final; the last (window - 1)//2 points are provisional and are
+    recomputed on every read. Like pandas, an even window reaches one sample
+    further back than forward.
+    """
+
+    def __init__(self, window: int = SMOOTH_WINDOW):
+        self.back = window // 2
+        self.ahead = (window - 1) // 2
+        self.done = 0  # number of finalised points
+
+    def _window_mean(self, raw: np.ndarray, start: int, stop: int) -> np.ndarray:
+        n = len(raw)
+        lo = max(start - self.back, 0)
+        hi = min(stop + self.ahead, n)
+        c = np.concatenate([[0.0], np.cumsum(raw[lo:hi])])
+        idx = np.arange(start, stop)
+        a = np.maximum(idx - self.back, 0) - lo
+        b = np.minimum(idx + self.ahead + 1, n) - lo
+        return (c[b] - c[a]) / (b - a)
+
+    def advance(self, raw: np.ndarray) -> np.ndarray:
+        """Newly finalised smoothed values since the previous call."""
+        ready = max(len(raw) - self.ahead, 0)
+        out = self._window_mean(raw, self.done, ready) if ready > self.done else np.empty(0)
+        self.done = max(ready, self.done)
+        return out
+
+    def tail(self, raw: np.ndarray) -> np.ndarray:
+        return self._window_mean(raw, self.done, len(raw))
+
+class LiveDashboard:
+    """Incrementally updated dashboard fed from a TrajectoryRecorder."""
+
+    def __init__(self, points_per_trace: int = 2000, smooth_window: int = SMOOTH_WINDOW):
+        self.fig = _empty_figure()
+        self.specs: List[tuple] = list(TRACES)
+        for spec in self.specs:
+            _add_trace(self.fig, spec, [], [])
+        _style_axes(self.fig)
+        self._seen = 0
+        self._dec = [MinMaxDecimator(points_per_trace, "max" if s[5] == "bar" else "minmax")
+                     for s in self.specs]
+        self._smooth: Dict[int, RunningSmoother] = {
+            i: RunningSmoother(smooth_window) for i, s in enumerate(self.specs) if s[6]
+        }
+
+    def update(self, recorder) -> go.Figure:
+        n = len(recorder)
+        steps = recorder.column("Step")
+        new_x = steps[self._seen:n]
+        raw_cache: Dict[str, np.ndarray] = {}
+        for i, spec in enumerate(self.specs):
+            column = spec[0]
+            dec = self._dec[i]
+            sm = self._smooth.get(i)
+            if sm is None:
+                dec.extend(new_x, recorder.column(column, start=self._seen))
+                x, y = dec.points()
+            else:
+                # smoothing needs a few samples of left context; the recorder
+                # columns are views, so this does not copy the history
+                if column not in raw_cache:
+                    raw_cache[column] = recorder.column(column)
+                raw = raw_cache[column]
+                first = sm.done
+                v = sm.advance(raw)
+                if len(v):
+                    dec.extend(steps[first:first + len(v)], v)
+                x, y = dec.points()
+                x = np.concatenate([x, steps[sm.done:n]])
+                y = np.concatenate([y, sm.tail(raw)])
+            self.fig.data[i].x = x
+            self.fig.data[i].y = y
+        self._seen = n
+        return self.fig
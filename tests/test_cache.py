@@ -0,0 +1,62 @@
+# tests/test_cache.py
+"""轨迹缓存：命中截取、从较短条目续跑都与直接计算逐位相同。"""
+import numpy as np
+
+from backend.cache import TrajectoryCache
+from backend.presets import get_preset
+
+def assert_same_columns(a, b):
+    assert a.keys() == b.keys()
+    for k in a:
+        np.testing.assert_array_equal(a[k], b[k], err_msg=k)
+
+def test_partial_hit_resumes_like_fresh_run(tmp_path):
+    init = get_preset("terra")
+    fresh = TrajectoryCache(str(tmp_path / "fresh")).run(init, 300, seed=7)
+
+    cache = TrajectoryCache(str(tmp_path / "resume"))
+    cache.run(init, 120, seed=7)
+    resumed = cache.run(init, 300, seed=7)
+    assert (cache.misses, cache.partial_hits) == (1, 1)
+    assert_same_columns(resumed.raw_columns(), fresh.raw_columns())
+
+def test_hit_returns_prefix(tmp_path):
+    init = get_preset("terra")
+    cache = TrajectoryCache(str(tmp_path))
+    full = cache.run(init, 200, seed=3)
+    short = cache.run(init, 80, seed=3)
+    assert cache.hits == 1
+    assert_same_columns(short.raw_columns(),
+                        {k: v[:80] for k, v in full.raw_columns().items()})
+
+def test_key_depends_on_seed_and_params(tmp_path):
+    init = get_preset("terra")
+    cache = TrajectoryCache(str(tmp_path))
+    cache.run(init, 50, seed=1)
+    cache.run(init, 50, seed=2)
+    cache.run({**init, "params": {**init["params"].as_dict(), "redeem_alpha": 0.05}}, 50, seed=1)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+def test_store_does_not_walk_below_limit(tmp_path, monkeypatch):
+    cache = TrajectoryCache(str(tmp_path))
+    walks = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: walks.append(1) or entries())
+    for i in range(40):
+        cache.memo(f"k{i}", lambda: {"x": 1.0})
+    assert len(walks) == 1  # 只在第一次写入时遍历一次
+    assert cache._total == cache.size()
+
+def test_evicts_once_over_limit(tmp_path):
+    init = get_preset("terra")
+    cache = TrajectoryCache(str(tmp_path))
+    cache.run(init, 100, seed=1)
+    one = cache.size()
+    cache.max_bytes = int(2.5 * one)
+    for seed in range(2, 8):
+        cache.run(init, 100, seed=seed)
+        assert cache.size() <= cache.max_bytes
+        assert cache._total == cache.size()
+    assert cache.run(init, 100, seed=7) and cache.hits == 1  # 最新的条目保留
+    cache.run(init, 100, seed=1)
+    assert cache.misses == 8  # 最旧的条目已被淘汰
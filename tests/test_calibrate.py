@@ -0,0 +1,38 @@
+# tests/test_calibrate.py
+"""校准：锚点校验、按锚点步取值。"""
+import numpy as np
+import pytest
+
+from backend.calibrate import calibrate, evaluate, parse_anchors, simulate_at
+from backend.ensemble import run_ensemble
+from backend.presets import get_preset
+
+def test_parse_anchors_sorted():
+    assert parse_anchors(["200=0.3", "120=0.9"]) == [(120, 0.9), (200, 0.3)]
+
+@pytest.mark.parametrize("item", ["0=1.0", "-5=0.5"])
+def test_parse_anchors_rejects_steps_before_first(item):
+    with pytest.raises(ValueError):
+        parse_anchors(["120=0.9", item])
+
+def test_calibrate_rejects_series_before_first_step():
+    with pytest.raises(ValueError):
+        calibrate([(0, 1.0), (50, 0.9)], {"redeem_alpha": (0.02, 0.08)}, workers=1,
+                  verbose=False)
+
+def test_simulate_at_fills_every_anchor():
+    init = get_preset("terra")
+    steps = [30, 10, 30, 75]
+    sim = simulate_at(init, steps, n_paths=4, seed=2)
+    ref = run_ensemble(init, 4, 75, seed=2)
+    assert not np.isnan(sim).any()
+    np.testing.assert_array_equal(sim[:, 0], sim[:, 2])
+    np.testing.assert_array_equal(sim[:, 3], ref["ust_price"])
+    with pytest.raises(ValueError):
+        simulate_at(init, [0, 10], n_paths=2)
+
+def test_evaluate_zero_at_own_trajectory():
+    init = get_preset("terra")
+    sim = simulate_at(init, [40, 80], n_paths=8, seed=1)
+    anchors = list(zip([40, 80], np.median(sim, axis=0).tolist()))
+    assert evaluate(init, {}, anchors, n_paths=8, seed=1) == 0.0
@@ -0,0 +1,70 @@
+# tests/test_controller.py
+"""链上模式的发布路径：deadband 策略与攒批同时使用时，链上价格始终在 deadband 以内。"""
+import pytest
+
+pytest.importorskip("web3")
+
+from backend.controller import simulate_step
+from backend.model import fork_state
+from backend.presets import get_preset
+from backend.publish import DeadbandPolicy
+from backend.rng import NoiseStream
+from backend.web3_api import PriceBatcher, unpack_prices
+
+class FakeCall:
+    def __init__(self, fn_name, args):
+        self.fn_name, self.args = fn_name, args
+
+class FakeFunctions:
+    def setPrices(self, packed):
+        return FakeCall("setPrices", (packed,))
+
+    def setPrice(self, price):
+        return FakeCall("setPrice", (price,))
+
+class FakeContract:
+    functions = FakeFunctions()
+
+class Chain:
+    """记录提交的交易，按提交顺序得出链上价格（pipeline.submit 的替身）"""
+
+    def __init__(self):
+        self.price = None
+        self.txs = 0
+
+    def submit(self, call, gas=None, key=None):
+        self.txs += 1
+        if call.fn_name == "setPrices":
+            self.price = unpack_prices(call.args[0])[-1][1] / 1e18
+        else:
+            self.price = call.args[0] / 1e18
+
+def run(policy, max_steps, n_steps=300):
+    chain, contract = Chain(), FakeContract()
+    batcher = PriceBatcher(contract, chain, max_steps=max_steps, max_delay=float("inf"),
+                           step_base=0)
+    state, rng = fork_state(get_preset("terra")), NoiseStream(7)
+    worst = 0.0
+    for step in range(1, n_steps + 1):
+        state = simulate_step(state, contract, step=step, use_onchain=True, rng=rng,
+                              pipeline=chain, batcher=batcher, policy=policy)
+        dev = float("inf") if chain.price is None else \
+            abs(state["ust_price"] - chain.price) / chain.price
+        worst = max(worst, dev)
+    return worst, chain, batcher
+
+def test_deadband_bound_holds_with_batcher():
+    policy = DeadbandPolicy(deadband=0.005, heartbeat=50)
+    worst, chain, batcher = run(policy, max_steps=32)
+    # 链上价格（wei 取整）与模拟价格的偏差不超过 deadband
+    assert worst <= policy.deadband + 1e-15
+    assert chain.txs == policy.sent == batcher.steps
+
+def test_batcher_without_policy_still_batches():
+    chain, contract = Chain(), FakeContract()
+    batcher = PriceBatcher(contract, chain, max_steps=16, max_delay=float("inf"), step_base=0)
+    state, rng = fork_state(get_preset("terra")), NoiseStream(7)
+    for step in range(1, 65):
+        state = simulate_step(state, contract, step=step, use_onchain=True, rng=rng,
+                              pipeline=chain, batcher=batcher)
+    assert chain.txs == batcher.batches == 4
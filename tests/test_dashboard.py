@@ -0,0 +1,61 @@
+# tests/test_dashboard.py
+"""增量看板：RunningSmoother 与 pandas 居中滚动均值一致；MinMaxDecimator 点数有界且保留极值。"""
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("plotly")
+
+from frontend.dashboard import MinMaxDecimator, RunningSmoother
+
+def batches(n, seed=0):
+    """把 0..n 切成长短不一的增量（模拟每次刷新新到的步数）"""
+    rng = np.random.default_rng(seed)
+    cuts = np.cumsum(rng.integers(1, 40, size=n))
+    return [0] + [int(c) for c in cuts[cuts < n]] + [n]
+
+@pytest.mark.parametrize("window", [1, 4, 5])
+def test_running_smoother_matches_pandas(window):
+    raw = np.random.default_rng(1).normal(size=500).cumsum()
+    sm = RunningSmoother(window)
+    expected = pd.Series(raw).rolling(window, min_periods=1, center=True).mean().to_numpy()
+    done = []
+    for stop in batches(len(raw))[1:]:
+        done.append(sm.advance(raw[:stop]))
+        got = np.concatenate(done + [sm.tail(raw[:stop])])
+        ref = pd.Series(raw[:stop]).rolling(window, min_periods=1, center=True).mean()
+        np.testing.assert_allclose(got, ref.to_numpy(), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(np.concatenate(done), expected[:len(raw) - (window - 1) // 2],
+                               rtol=1e-9, atol=1e-12)
+
+@pytest.mark.parametrize("mode", ["minmax", "max"])
+def test_decimator_bounded_and_keeps_extremes(mode):
+    n, budget = 20000, 200
+    x = np.arange(1, n + 1, dtype=float)
+    y = np.random.default_rng(2).normal(size=n).cumsum()
+    y[12345] = 1e6                  # 一个尖峰
+    y[777] = -1e6
+    dec = MinMaxDecimator(budget, mode)
+    edges = batches(n, seed=3)
+    for a, b in zip(edges, edges[1:]):
+        dec.extend(x[a:b], y[a:b])
+        px, py = dec.points()
+        assert len(px) <= budget + dec.width  # 分桶部分不超预算，尾部不足一桶
+        assert np.all(np.diff(px) > 0)
+        np.testing.assert_array_equal(py, y[px.astype(int) - 1])  # 只输出真实样本
+    px, py = dec.points()
+    assert py.max() == 1e6
+    if mode == "minmax":
+        assert py.min() == -1e6
+    assert dec.width > 1
+
+def test_decimator_short_series_is_lossless():
+    dec = MinMaxDecimator(budget=100)
+    x = np.arange(30.0)
+    y = np.sin(x)
+    dec.extend(x[:10], y[:10])
+    dec.extend(x[10:], y[10:])
+    px, py = dec.points()
+    assert dec.width == 1
+    np.testing.assert_array_equal(px, x)
+    np.testing.assert_array_equal(py, y)
@@ -0,0 +1,42 @@
+# tests/test_events.py
+"""外部事件表：按触发步（step + latency）累加净流量，next_step 跳过零流量步，未知类型只警告。"""
+import pytest
+
+from backend.events import EventSchedule, compile_events
+
+EVENTS = [
+    {"step": 10, "type": "ust_sell", "usd": 5.0},
+    {"step": 10, "type": "ust_buy", "usd": 2.0},
+    {"step": 20, "type": "luna_buy", "usd": 3.0, "latency": 5},
+    {"step": 30, "type": "luna_sell", "usd": 4.0},
+    {"step": 30, "type": "luna_buy", "usd": 4.0},   # 同一步相互抵消
+]
+
+def test_flows_accumulate_at_trigger_step():
+    sched = EventSchedule(EVENTS)
+    assert sched.flows(10) == (-3.0, 0.0)
+    assert sched.flows(20) == (0.0, 0.0)
+    assert sched.flows(25) == (0.0, 3.0)
+    assert sched.flows(30) == (0.0, 0.0)
+    assert len(sched) == len(EVENTS)
+
+def test_next_step():
+    sched = EventSchedule(EVENTS)
+    assert sched.steps == (10, 25)
+    assert sched.next_step(1) == 10
+    assert sched.next_step(10) == 10
+    assert sched.next_step(11) == 25
+    assert sched.next_step(26) is None
+    assert EventSchedule().next_step(1) is None
+
+def test_unknown_event_type_warns_and_has_no_flow():
+    with pytest.warns(UserWarning, match="忽略未知事件类型 'ust_dump'"):
+        sched = EventSchedule(EVENTS + [{"step": 40, "type": "ust_dump", "usd": 9.0}])
+    assert sched.flows(40) == (0.0, 0.0)
+    assert sched.next_step(26) is None
+    assert len(sched) == len(EVENTS) + 1  # 原样保留，便于导出场景
+
+def test_compile_events_reuses_schedule():
+    sched = EventSchedule(EVENTS)
+    assert compile_events(sched) is sched
+    assert compile_events(None).steps == ()
@@ -0,0 +1,53 @@
+# tests/test_profiling.py
+"""分阶段计时：打开计时器不改变结果；关闭时走的版本里没有任何计时语句。"""
+import types
+
+from backend import model
+from backend.model import compute_new_state, fork_state
+from backend.presets import get_preset
+from backend.profiling import PHASES, profile
+from backend.rng import NoiseStream
+from backend.runner import run_simulation
+from backend.trajectory import STATE_METRICS
+
+N_STEPS = 300
+
+def stepped(init, seed):
+    state, rng = fork_state(init), NoiseStream(seed)
+    for step in range(1, N_STEPS + 1):
+        state = compute_new_state(state, step=step, rng=rng)
+    return state, rng
+
+def test_profiled_run_matches_unprofiled():
+    init = get_preset("terra")
+    plain, rng_a = stepped(init, 3)
+    with profile() as prof:
+        timed, rng_b = stepped(init, 3)
+    for k in STATE_METRICS:
+        assert timed[k] == plain[k], k
+    assert timed["luna_price_hist"].tolist() == plain["luna_price_hist"].tolist()
+    assert rng_a.position == rng_b.position
+    assert prof.steps == N_STEPS
+    assert all(prof.time_ns[p] > 0 for p in PHASES)
+    assert prof.counts["event_impact"] == len(init["ext_events"])
+
+def test_profiled_run_simulation_matches_fast_path():
+    # 打开计时器时 run_simulation 退回逐步推进，结果仍与快进内核逐位相同
+    init = get_preset("terra")
+    fast = run_simulation(init, N_STEPS, seed=8)
+    with profile():
+        timed = run_simulation(init, N_STEPS, seed=8)
+    for k in STATE_METRICS:
+        assert timed[k] == fast[k], k
+
+def code_names(code):
+    names = set(code.co_names) | set(code.co_varnames) | set(code.co_freevars)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            names |= code_names(c)
+    return names
+
+def test_default_path_has_no_profiling():
+    P = model.compile_params()
+    assert not code_names(P.kernel.__code__) & {"lap", "hit"}
+    assert not code_names(model._compute_new_state.__code__) & {"lap", "hit", "begin", "end"}
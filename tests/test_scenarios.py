@@ -0,0 +1,39 @@
+# tests/test_scenarios.py
+"""情景树：每个叶子与单独从第 1 步运行该变体逐位相同。"""
+import numpy as np
+
+from backend.presets import get_preset
+from backend.rng import NoiseStream
+from backend.runner import iter_simulation
+from backend.scenarios import run_tree
+from backend.trajectory import STATE_METRICS
+
+N_STEPS = 200
+SEED = 7
+
+def variants(base_events):
+    return {
+        "base": base_events,
+        "bigger_110": [dict(ev, usd=ev["usd"] * 2) if ev["step"] == 110 else ev
+                       for ev in base_events],
+        "late_sell": base_events + [{"step": 150, "type": "ust_sell", "usd": 5e8}],
+        "early_buy": base_events + [{"step": 30, "type": "ust_buy", "usd": 1e8}],
+    }
+
+def standalone(init, events):
+    rows = list(iter_simulation({**init, "ext_events": events}, N_STEPS, rng=NoiseStream(SEED)))
+    return {m: np.array([s[m] for _, s in rows]) for m in STATE_METRICS}, rows[-1][1]
+
+def test_leaves_match_standalone_runs():
+    init = get_preset("terra")
+    var = variants(init["ext_events"])
+    tree = run_tree(init, var, N_STEPS, seed=SEED, workers=1)
+    assert tree.steps_simulated < tree.steps_naive
+    for name, events in var.items():
+        ref, ref_final = standalone(init, events)
+        traj = tree.trajectory(name)
+        for m in STATE_METRICS:
+            np.testing.assert_array_equal(traj[m], ref[m], err_msg=f"{name} {m}")
+        final = tree.final_state(name)
+        for m in STATE_METRICS:
+            assert final[m] == ref_final[m], (name, m)
@@ -0,0 +1,76 @@
+# tests/test_snapshot.py
+"""快照 / 检查点：恢复、续跑、分叉与不中断的运行逐位相同。"""
+import numpy as np
+
+from backend.presets import get_preset
+from backend.runner import iter_simulation, run_simulation
+from backend.snapshot import Checkpoints, SnapshotContext, restore_snapshot, take_snapshot
+from backend.rng import NoiseStream
+from backend.trajectory import STATE_METRICS
+
+def assert_same_state(a, b):
+    for k in STATE_METRICS:
+        assert a[k] == b[k], k
+
+def states_by_step(state, n_steps, seed):
+    return {step: dict(s) for step, s in iter_simulation(state, n_steps, rng=NoiseStream(seed))}
+
+def test_snapshot_roundtrip_resume():
+    init = get_preset("terra")
+    ref = states_by_step(init, 200, 4)
+
+    rng = NoiseStream(4)
+    state = None
+    for step, state in iter_simulation(init, 120, rng=rng):
+        pass
+    rec = take_snapshot(state, 120, rng)
+    restored, at, rng2 = restore_snapshot(rec, SnapshotContext.from_state(init, rng))
+    assert at == 120 and rng2.position == rng.position
+    for step, s in iter_simulation(restored, 80, start_step=121, rng=rng2):
+        assert_same_state(s, ref[step])
+
+def test_checkpoint_restore_between_records():
+    init = get_preset("terra")
+    ref = states_by_step(init, 300, 9)
+    ck = Checkpoints(every=25)
+    final = run_simulation(init, 300, seed=9, checkpoints=ck)
+    assert_same_state(final, ref[300])
+    for step in (1, 25, 137, 299):
+        state, rng = ck.restore(step)
+        assert_same_state(state, ref[step])
+        for s_step, s in iter_simulation(state, 300 - step, start_step=step + 1, rng=rng):
+            assert_same_state(s, ref[s_step])
+
+def test_checkpoint_save_load(tmp_path):
+    init = get_preset("terra")
+    ref = states_by_step(init, 250, 2)
+    ck = Checkpoints(every=50)
+    run_simulation(init, 150, seed=2, checkpoints=ck)
+    path = str(tmp_path / "ck.npz")
+    ck.save(path)
+    loaded = Checkpoints.load(path)
+    np.testing.assert_array_equal(loaded.steps, ck.steps)
+
+    state, rng = loaded.restore()
+    final = run_simulation(state, 100, start_step=151, rng=rng)
+    assert_same_state(final, ref[250])
+
+def test_fork_without_changes_matches_original():
+    init = get_preset("terra")
+    ref = states_by_step(init, 200, 6)
+    ck = Checkpoints(every=40)
+    run_simulation(init, 200, seed=6, checkpoints=ck)
+    state, rng = ck.fork(90)
+    final = run_simulation(state, 110, start_step=91, rng=rng)
+    assert_same_state(final, ref[200])
+
+def test_fork_with_new_params_diverges():
+    init = get_preset("terra")
+    ref = states_by_step(init, 200, 6)
+    ck = Checkpoints(every=40)
+    run_simulation(init, 200, seed=6, checkpoints=ck)
+    state, rng = ck.fork(59, params={"max_redeem_usd_frac": 0.06})
+    assert_same_state(state, ref[59])
+    assert state["params"].max_redeem_usd_frac == 0.06
+    after = run_simulation(state, 5, start_step=60, rng=rng)
+    assert after["ust_supply"] != ref[64]["ust_supply"]
@@ -0,0 +1,52 @@
+# tests/test_stopping.py
+"""停止条件：在已记录的轨迹上 scan() 找到的停止点与逐步调用 StopWhen 的结果一致。"""
+import numpy as np
+import pytest
+
+from backend.presets import get_preset
+from backend.rng import NoiseStream
+from backend.runner import iter_simulation
+from backend.stopping import StopWhen
+
+N_STEPS = 400
+FIELDS = ("ust_price", "luna_price", "lfg_reserve_usd", "pool_k_rel")
+
+def recorded(seed):
+    """不设停止条件跑完整段，返回步号、逐步字段和参数"""
+    init = get_preset("terra")
+    rows = list(iter_simulation(init, N_STEPS, rng=NoiseStream(seed)))
+    steps = np.array([s for s, _ in rows])
+    series = {k: np.array([st[k] for _, st in rows]) for k in FIELDS}
+    return steps, series, rows[-1][1]["params"]
+
+def stepwise(stop, seed):
+    for _ in iter_simulation(get_preset("terra"), N_STEPS, rng=NoiseStream(seed), stop=stop):
+        pass
+    return stop.step, stop.reason
+
+@pytest.mark.parametrize("conditions", [("collapsed",), ("lfg_empty",), ("pool_dust",),
+                                        ("ust_floor", "lfg_empty"), ("luna_floor",)])
+@pytest.mark.parametrize("patience", [1, 5])
+def test_scan_matches_stepwise(conditions, patience):
+    steps, series, params = recorded(1)
+    expected = stepwise(StopWhen(*conditions, patience=patience), 1)
+    stop = StopWhen(*conditions, patience=patience)
+    i = stop.scan(steps, series, params)
+    assert (stop.step, stop.reason) == expected
+    if expected[0] is None:
+        assert i is None
+    else:
+        assert steps[i] == expected[0]
+
+def test_scan_patience_needs_consecutive_hits():
+    def flag(step, state):
+        return state["x"] > 0
+    steps = np.arange(1, 11)
+    series = {"x": np.array([1, 1, 0, 1, 1, 1, 0, 1, 1, 1], dtype=float)}
+    stop = StopWhen(flag, patience=3)
+    assert stop.scan(steps, series, None) == 5
+    assert (stop.step, stop.reason) == (6, "flag")
+    assert StopWhen(flag, patience=4).scan(steps, series, None) is None
+    # 再次 scan 时先清掉上一次的结果
+    stop.scan(steps, {"x": np.zeros(10)}, None)
+    assert (stop.step, stop.reason) == (None, None)
@@ -0,0 +1,53 @@
+# tests/test_sweep.py
+"""参数扫描：网格 / 随机 / 拉丁超立方设计，取值按参数类型转换，命令行网格支持非数值参数。"""
+import csv
+
+import numpy as np
+import pytest
+
+from backend.sweep import _cast, grid_design, lhs_design, main, random_design
+
+BOUNDS = {"redeem_alpha": (0.02, 0.08), "oracle_delay": (0, 10)}
+
+def test_grid_design_is_cartesian_product():
+    design = grid_design({"redeem_alpha": [0.02, 0.04], "oracle_mode": ["spot", "twap", "median"]})
+    assert design == [{"redeem_alpha": a, "oracle_mode": m}
+                      for a in (0.02, 0.04) for m in ("spot", "twap", "median")]
+    with pytest.raises(ValueError):
+        grid_design({"no_such_param": [1]})
+
+@pytest.mark.parametrize("design", [random_design, lhs_design])
+def test_sampled_designs_within_bounds_and_seeded(design):
+    points = design(BOUNDS, 32, seed=3)
+    assert len(points) == 32
+    for p in points:
+        assert 0.02 <= p["redeem_alpha"] <= 0.08
+        assert 0 <= p["oracle_delay"] <= 10 and isinstance(p["oracle_delay"], int)
+    assert design(BOUNDS, 32, seed=3) == points
+    assert design(BOUNDS, 32, seed=4) != points
+
+@pytest.mark.parametrize("n", [1, 7, 50])
+def test_lhs_one_point_per_stratum(n):
+    bounds = {"redeem_alpha": (0.0, 1.0), "bankrun_t0": (100.0, 200.0)}
+    points = lhs_design(bounds, n, seed=0)
+    for k, (lo, hi) in bounds.items():
+        strata = np.floor((np.array([p[k] for p in points]) - lo) / (hi - lo) * n)
+        assert sorted(strata.astype(int).tolist()) == list(range(n)), k
+
+def test_cast_follows_param_type():
+    assert _cast("oracle_mode", " twap") == "twap"
+    assert _cast("oracle_delay", "7.6") == 8 and isinstance(_cast("oracle_delay", 3.0), int)
+    assert _cast("redeem_alpha", "0.05") == 0.05
+
+def test_grid_cli_accepts_non_numeric_params(tmp_path):
+    out = tmp_path / "sweep.csv"
+    main(["--grid", "oracle_mode=spot,median", "--grid", "oracle_window=1,3",
+          "--steps", "30", "--paths", "2", "--workers", "1", "--out", str(out)])
+    with open(out, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["oracle_mode"], r["oracle_window"]) for r in rows] == \
+        [("spot", "1"), ("spot", "3"), ("median", "1"), ("median", "3")]
+
+def test_sampled_designs_reject_non_numeric_params():
+    with pytest.raises(ValueError):
+        lhs_design({"oracle_mode": (0.0, 1.0)}, 4)
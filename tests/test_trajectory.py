@@ -0,0 +1,71 @@
+# tests/test_trajectory.py
+"""分块写出：ChunkedWriter 跨块读回不丢行，命令行 --every / --chunk 的抽行与分块。"""
+import numpy as np
+import pytest
+
+from backend.cli import main
+from backend.presets import get_preset
+from backend.rng import NoiseStream
+from backend.runner import iter_simulation
+from backend.trajectory import ChunkedWriter, read_trajectory
+
+N_STEPS = 95
+METRICS = ["ust_price", "luna_price", "lfg_reserve_usd"]
+
+def formats():
+    yield ".npz"
+    for fmt in (".parquet", ".arrow"):
+        yield pytest.param(fmt, marks=pytest.mark.skipif(
+            not _has_pyarrow(), reason="需要 pyarrow"))
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@pytest.mark.parametrize("fmt", list(formats()))
+@pytest.mark.parametrize("n_rows,chunk,n_chunks", [(10, 4, 3), (8, 4, 2), (3, 16, 1), (0, 4, 0)])
+def test_chunked_writer_round_trip(tmp_path, fmt, n_rows, chunk, n_chunks):
+    path = str(tmp_path / f"traj{fmt}")
+    with ChunkedWriter(path, METRICS, chunk) as w:
+        for i in range(n_rows):
+            w.append(i + 1, {m: float(i) * (j + 1) for j, m in enumerate(METRICS)})
+    assert (w.rows, w.chunks) == (n_rows, n_chunks)
+    if not n_rows:
+        return
+    data = read_trajectory(path)
+    assert set(data) == {"step", *METRICS}
+    assert data["step"].tolist() == list(range(1, n_rows + 1))
+    for j, m in enumerate(METRICS):
+        assert data[m].tolist() == [float(i) * (j + 1) for i in range(n_rows)]
+
+def test_chunked_writer_rejects_unknown_format_and_metric(tmp_path):
+    with pytest.raises(ValueError):
+        ChunkedWriter(str(tmp_path / "traj.csv"), METRICS)
+    with pytest.raises(ValueError):
+        ChunkedWriter(str(tmp_path / "traj.npz"), ["no_such_metric"])
+
+@pytest.mark.parametrize("extra", [[], ["--no-fast"]])
+def test_cli_every_and_chunk(tmp_path, capsys, extra):
+    out = tmp_path / "run.npz"
+    main(["--steps", str(N_STEPS), "--seed", "4", "--out", str(out),
+          "--metrics", ",".join(METRICS), "--every", "10", "--chunk", "4"] + extra)
+    assert "10 行 / 3 块" in capsys.readouterr().out
+    data = read_trajectory(str(out))
+    # 每 10 步一行，最后一步总是写出
+    assert data["step"].tolist() == list(range(10, N_STEPS, 10)) + [N_STEPS]
+    full = {s: st for s, st in iter_simulation(get_preset("terra"), N_STEPS, rng=NoiseStream(4))}
+    for m in METRICS:
+        assert data[m].tolist() == [full[s][m] for s in data["step"]], m
+
+def test_cli_cached_every_matches_uncached(tmp_path, capsys):
+    args = ["--steps", str(N_STEPS), "--seed", "4", "--metrics", ",".join(METRICS),
+            "--every", "10", "--chunk", "4"]
+    main(args + ["--out", str(tmp_path / "plain.npz")])
+    main(args + ["--out", str(tmp_path / "cached.npz"), "--cache-dir", str(tmp_path / "cache")])
+    plain = read_trajectory(str(tmp_path / "plain.npz"))
+    cached = read_trajectory(str(tmp_path / "cached.npz"))
+    for k in ["step"] + METRICS:
+        assert np.array_equal(cached[k], plain[k]), k
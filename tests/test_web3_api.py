@@ -0,0 +1,126 @@
+# tests/test_web3_api.py
+"""
+交易流水线（eth-tester，每笔交易自动出块）：nonce 同步、被替换交易的重发 / 丢弃、在途窗口，
+以及 send_txn 在构建失败后复用 nonce。用普通转账代替合约调用，不需要编译合约。
+"""
+import pytest
+
+pytest.importorskip("eth_tester")
+pytest.importorskip("web3")
+pytest.importorskip("dotenv")
+
+from web3 import EthereumTesterProvider, Web3
+
+from backend import web3_api
+from backend.localchain import TESTER_KEYS
+from backend.web3_api import PendingTx, TxPipeline
+
+@pytest.fixture
+def w3():
+    return Web3(EthereumTesterProvider())
+
+@pytest.fixture
+def owner(w3):
+    return w3.eth.account.from_key(TESTER_KEYS[0])
+
+@pytest.fixture
+def to(w3):
+    return w3.eth.account.from_key(TESTER_KEYS[1]).address
+
+@pytest.fixture
+def pipe(w3, owner):
+    p = TxPipeline(w3, owner.address, TESTER_KEYS[0], window=4, poll_interval=0.01,
+                   recheck_after=0.05)
+    yield p
+    p.close()
+
+def transfer(to, value=1):
+    return {"to": to, "value": value}
+
+def send_external(w3, owner, to, value=1):
+    """绕过流水线，用同一账户直接发一笔（占掉流水线本地记录的下一个 nonce）"""
+    txn = {"from": owner.address, "to": to, "value": value, "gas": 21000,
+           "nonce": w3.eth.get_transaction_count(owner.address, "pending"),
+           "gasPrice": w3.eth.gas_price, "chainId": w3.eth.chain_id}
+    return w3.eth.send_raw_transaction(owner.sign_transaction(txn).raw_transaction)
+
+def inject_replaced(pipe, call, key=None):
+    """一笔已在途、但它的 nonce 被别的交易消耗掉的交易（回执永远查不到）"""
+    tx = PendingTx(call, pipe.gas, key)
+    tx.nonce = pipe.nonces.take()
+    tx.gas_price = pipe.gas_price.get()
+    tx.sent_at = 0.0
+    return tx
+
+def confirmed_nonces(w3, pipe):
+    return [w3.eth.get_transaction(r.transactionHash).nonce for r in pipe.receipts]
+
+def test_resyncs_after_nonce_taken_externally(w3, owner, to, pipe):
+    send_external(w3, owner, to)  # 流水线本地的 nonce 已落后
+    pipe.submit(transfer(to))
+    pipe.flush(timeout=10)
+    assert pipe.stats()["confirmed"] == 1 and not pipe.failed
+    assert confirmed_nonces(w3, pipe) == [1]
+    assert pipe.nonces.take() == w3.eth.get_transaction_count(owner.address, "pending")
+
+def test_replaced_old_price_is_dropped_as_superseded(w3, owner, to, pipe):
+    old = inject_replaced(pipe, transfer(to, 1), key="price")
+    send_external(w3, owner, to)           # 消耗掉 old 的 nonce
+    pipe.submit(transfer(to, 2), key="price")  # 之后提交的新价格
+    with pipe._cv:
+        pipe._enqueue(old)
+    pipe.flush(timeout=10)
+    st = pipe.stats()
+    assert st["superseded"] == 1 and st["resubmitted"] == 0 and st["confirmed"] == 1
+    assert [w3.eth.get_transaction(r.transactionHash).value for r in pipe.receipts] == [2]
+
+def test_replaced_latest_tx_is_resent_in_nonce_order(w3, owner, to, pipe):
+    # 最新的价格被替换：换新 nonce 重发，并且排在之前提交、nonce 更小的交易之后
+    price = inject_replaced(pipe, transfer(to, 5), key="price")
+    send_external(w3, owner, to)
+    with pipe._cv:
+        pipe._enqueue(price)
+        pipe._latest["price"] = price
+    pipe.submit(transfer(to, 7))
+    pipe.flush(timeout=10)
+    st = pipe.stats()
+    assert st["resubmitted"] == 1 and st["superseded"] == 0 and st["confirmed"] == 2
+    assert price.nonce == 2
+    assert sorted(confirmed_nonces(w3, pipe)) == [1, 2]
+
+def test_inflight_window(w3, owner, to):
+    pipe = TxPipeline(w3, owner.address, TESTER_KEYS[0], window=2, poll_interval=0.01)
+    try:
+        for i in range(6):
+            pipe.submit(transfer(to, i + 1))
+            assert len(pipe.inflight) <= 2
+            nonces = [tx.nonce for tx in pipe.inflight]
+            assert nonces == sorted(nonces)
+        pipe.flush(timeout=10)
+    finally:
+        pipe.close()
+    assert sorted(confirmed_nonces(w3, pipe)) == list(range(6))
+
+class FlakyCall:
+    """fail=True 时 build_transaction 抛错（例如估算 / 编码失败），否则构建一笔转账"""
+
+    def __init__(self, to, fail):
+        self.to, self.fail = to, fail
+
+    def build_transaction(self, params):
+        if self.fail:
+            raise ValueError("build failed")
+        return {"to": self.to, "value": 1, **params}
+
+def test_send_txn_reuses_nonce_after_failed_build(w3, owner, to, monkeypatch):
+    monkeypatch.setattr(web3_api, "get_w3", lambda: w3)
+    monkeypatch.setattr(web3_api, "signer", lambda: (owner.address, TESTER_KEYS[0]))
+    monkeypatch.setattr(web3_api, "_nonces", None)
+    monkeypatch.setattr(web3_api, "_gas_price", None)
+
+    web3_api.send_txn(lambda: FlakyCall(to, False), None, gas=21000)
+    with pytest.raises(ValueError):
+        web3_api.send_txn(lambda: FlakyCall(to, True), None, gas=21000)
+    tx_hash = web3_api.send_txn(lambda: FlakyCall(to, False), None, gas=21000)
+    assert w3.eth.get_transaction(tx_hash).nonce == 1  # 没有留下 nonce 空洞
+    assert w3.eth.get_transaction_count(owner.address, "latest") == 2